@@ -7,6 +7,8 @@ from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+from shared.principal_cache import PrincipalCache, watch_user_changes
+
 from .database import get_session
 from .models import User
 from .schemas import UserCreate, UserOut, UserLogin
@@ -21,6 +23,10 @@ SECRET_KEY = "supersecretkey"  # ⚠️ Вынеси в .env позже
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# проверенные токены -> User: повторные запросы с тем же токеном не ходят в БД
+principal_cache = PrincipalCache()
+watch_user_changes(principal_cache, User)
+
 # 🔐 Утилиты
 def get_password_hash(password: str) -> str:
     # hashing can fail if the native backend is missing or broken inside the container;
@@ -122,6 +128,9 @@ async def get_current_user(
     token: str = Depends(oauth2_scheme),
     session: AsyncSession = Depends(get_session)
 ):
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -134,6 +143,7 @@ async def get_current_user(
     user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(status_code=401, detail="Пользователь не найден")
+    principal_cache.put(token, email, user, payload.get("exp"))
     return user
 
 
@@ -149,6 +159,9 @@ async def get_user_from_request(request, session: AsyncSession):
         token = request.cookies.get('vf_token')
     if not token:
         return None
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get('sub')
@@ -158,6 +171,8 @@ async def get_user_from_request(request, session: AsyncSession):
         return None
     result = await session.execute(select(User).where(User.email == email))
     user = result.scalar_one_or_none()
+    if user is not None:
+        principal_cache.put(token, email, user, payload.get("exp"))
     return user
 
 @router.get("/me")
@@ -1,17 +1,172 @@
 # app/cart.py
+from decimal import Decimal
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
+from sqlalchemy import Integer, column, delete, exists, select, func, literal, true, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager, selectinload
 from typing import List
 
+from shared.cart_ops import fold_ops
+
 from .database import get_session
-from .models import CartItem, Product, User
-from .schemas import CartItemOut, CartItemCreate
+from .models import CartItem, CartVersion, Product, User
+from .schemas import CartItemOut, CartItemCreate, CartPatch, CartState, CartSummary, ProductOut
 from .auth import get_current_user
 
 router = APIRouter(prefix="/api/cart", tags=["cart"])
 
+
+def bump_version_stmt(user_id: int):
+    """+1 к версии корзины (строка версии заодно сериализует изменения одного пользователя)."""
+    ins = pg_insert(CartVersion).values(user_id=user_id, version=1)
+    return ins.on_conflict_do_update(
+        index_elements=[CartVersion.user_id], set_={"version": CartVersion.version + 1},
+    ).returning(CartVersion.version)
+
+
+def _with_bump(stmt, changed_cte, user_id: int):
+    # версия растёт в том же запросе, если изменяющий CTE затронул хоть одну строку
+    ins = pg_insert(CartVersion).from_select(
+        ["user_id", "version"],
+        select(literal(user_id), literal(1)).where(exists(select(changed_cte.c.id))),
+    )
+    bump = ins.on_conflict_do_update(
+        index_elements=[CartVersion.user_id], set_={"version": CartVersion.version + 1},
+    ).cte("bump")
+    return stmt.add_cte(bump)
+
+
+def upsert_item_stmt(user_id: int, product_id: int, quantity: int, increment: bool = True):
+    """Один запрос: INSERT ... ON CONFLICT по uq_cart_user_product с проверкой остатка.
+
+    Возвращает строку товара и (id, quantity) позиции; позиция NULL — остатка
+    не хватило, строк нет — товара нет.
+    """
+    stock = select(Product.stock).where(Product.id == product_id).scalar_subquery()
+    ins = pg_insert(CartItem).from_select(
+        ["user_id", "product_id", "quantity"],
+        select(literal(user_id), Product.id, literal(quantity))
+        .where(Product.id == product_id, Product.stock >= quantity),
+    )
+    new_qty = CartItem.quantity + ins.excluded.quantity if increment else ins.excluded.quantity
+    up = (
+        ins.on_conflict_do_update(
+            constraint="uq_cart_user_product",
+            set_={"quantity": new_qty},
+            where=new_qty <= stock,
+        )
+        .returning(CartItem.id, CartItem.quantity)
+        .cte("up")
+    )
+    stmt = select(Product, up.c.id, up.c.quantity).outerjoin(up, true()).where(Product.id == product_id)
+    return _with_bump(stmt, up, user_id)
+
+
+def update_item_stmt(user_id: int, item_id: int, quantity: int):
+    """Один запрос: UPDATE позиции с проверкой остатка + строка товара."""
+    up = (
+        update(CartItem)
+        .where(
+            CartItem.id == item_id,
+            CartItem.user_id == user_id,
+            Product.id == CartItem.product_id,
+            Product.stock >= quantity,
+        )
+        .values(quantity=quantity)
+        .returning(CartItem.id, CartItem.quantity)
+        .cte("up")
+    )
+    stmt = (
+        select(Product, up.c.id, up.c.quantity)
+        .join(CartItem, CartItem.product_id == Product.id)
+        .outerjoin(up, true())
+        .where(CartItem.id == item_id, CartItem.user_id == user_id)
+    )
+    return _with_bump(stmt, up, user_id)
+
+
+def _upsert_many_stmt(user_id: int, rows: list, increment: bool):
+    v = values(column("product_id", Integer), column("quantity", Integer), name="v").data(rows)
+    ins = pg_insert(CartItem).from_select(
+        ["user_id", "product_id", "quantity"],
+        # join с products: неизвестные (удалённые) товары просто пропускаются
+        select(literal(user_id), v.c.product_id, v.c.quantity).select_from(v)
+        .join(Product, Product.id == v.c.product_id),
+    )
+    new_qty = CartItem.quantity + ins.excluded.quantity if increment else ins.excluded.quantity
+    return ins.on_conflict_do_update(constraint="uq_cart_user_product", set_={"quantity": new_qty})
+
+
+async def apply_cart_plan(session: AsyncSession, user_id: int, plan: dict, replace: bool = False) -> list:
+    """Применить план в текущей транзакции; вернуть id товаров, которым не хватило остатка."""
+    sets = [(pid, q) for pid, (absolute, q) in plan.items() if absolute and q > 0]
+    adds = [(pid, q) for pid, (absolute, q) in plan.items() if not absolute and q > 0]
+    removes = [pid for pid, (absolute, q) in plan.items() if absolute and q <= 0]
+
+    if replace:
+        keep = [pid for pid, _ in sets]
+        await session.execute(delete(CartItem).where(CartItem.user_id == user_id, CartItem.product_id.not_in(keep)))
+    elif removes:
+        await session.execute(delete(CartItem).where(CartItem.user_id == user_id, CartItem.product_id.in_(removes)))
+    if sets:
+        await session.execute(_upsert_many_stmt(user_id, sets, increment=False))
+    if adds:
+        await session.execute(_upsert_many_stmt(user_id, adds, increment=True))
+
+    touched = [pid for pid, _ in sets + adds]
+    if not touched:
+        return []
+    res = await session.execute(
+        select(CartItem.product_id)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id, CartItem.product_id.in_(touched), CartItem.quantity > Product.stock)
+    )
+    return sorted(res.scalars().all())
+
+
+def cart_summary_stmt(user_id: int):
+    """Позиции с товарами и итоги (штуки, сумма в Numeric) одним запросом — оконными SUM."""
+    return (
+        select(
+            CartItem,
+            func.sum(CartItem.quantity).over().label("count"),
+            func.sum(Product.price * CartItem.quantity).over().label("total"),
+        )
+        .join(CartItem.product)
+        .options(contains_eager(CartItem.product))
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id.desc())
+    )
+
+
+async def load_cart_summary(session: AsyncSession, user_id: int) -> CartSummary:
+    rows = (await session.execute(cart_summary_stmt(user_id))).all()
+    return CartSummary(
+        items=[CartItemOut.model_validate(row.CartItem) for row in rows],
+        count=rows[0].count if rows else 0,
+        total=rows[0].total if rows else Decimal("0.00"),
+    )
+
+
+async def load_cart_state(session: AsyncSession, user_id: int, version: int) -> CartState:
+    summary = await load_cart_summary(session, user_id)
+    return CartState(**summary.model_dump(), version=version)
+
+
+def _item_out(user_id: int, row) -> CartItemOut:
+    product, item_id, quantity = row
+    if item_id is None:
+        raise HTTPException(status_code=400, detail="Недостаточно товара на складе")
+    return CartItemOut(
+        id=item_id,
+        product_id=product.id,
+        quantity=quantity,
+        user_id=user_id,
+        product=ProductOut.model_validate(product),
+    )
+
 @router.get("", response_model=List[CartItemOut])
 async def get_cart(
     session: AsyncSession = Depends(get_session),
@@ -25,6 +180,15 @@ async def get_cart(
     )
     return result.scalars().all()
 
+@router.get("/summary", response_model=CartSummary)
+async def get_cart_summary(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Корзина целиком с итогами — для бейджа и страницы оформления за один запрос."""
+    return await load_cart_summary(session, current_user.id)
+
+
 @router.get("/count")
 async def get_cart_count(
     session: AsyncSession = Depends(get_session),
@@ -35,50 +199,58 @@ async def get_cart_count(
     )
     return {"count": res.scalar_one()}
 
+@router.patch("", response_model=CartState)
+async def patch_cart(
+    payload: CartPatch,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Пакет операций add/set/remove или снимок корзины клиента — в одной транзакции."""
+    if payload.snapshot is not None:
+        plan = {it.product_id: (True, it.quantity) for it in payload.snapshot}
+    else:
+        if any(op.op == "add" and op.quantity <= 0 for op in payload.ops):
+            raise HTTPException(status_code=400, detail="Количество должно быть > 0")
+        plan = fold_ops(payload.ops)
+
+    # первым делом версия: строка блокируется до конца транзакции
+    version = (await session.execute(bump_version_stmt(current_user.id))).scalar_one()
+    if payload.base_version is not None and payload.base_version != version - 1:
+        await session.rollback()
+        # текущая версия сервера — чтобы клиент слил корзины и повторил на ней
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Корзина изменилась, обновите её", "version": version - 1},
+        )
+
+    over_stock = await apply_cart_plan(session, current_user.id, plan, replace=payload.snapshot is not None)
+    if over_stock:
+        await session.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Недостаточно товара на складе", "product_ids": over_stock},
+        )
+    state = await load_cart_state(session, current_user.id, version)
+    await session.commit()
+    return state
+
+
 @router.post("/add", response_model=CartItemOut, status_code=status.HTTP_201_CREATED)
 async def add_to_cart(
     payload: CartItemCreate,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    # Проверяем товар
-    prod_res = await session.execute(select(Product).where(Product.id == payload.product_id))
-    product = prod_res.scalar_one_or_none()
-    if not product:
-        raise HTTPException(status_code=404, detail="Товар не найден")
-
     if payload.quantity <= 0:
         raise HTTPException(status_code=400, detail="Количество должно быть > 0")
 
-    # Ищем существующую позицию корзины
-    ci_res = await session.execute(
-        select(CartItem).where(
-            CartItem.user_id == current_user.id,
-            CartItem.product_id == payload.product_id,
-        )
-    )
-    existing = ci_res.scalar_one_or_none()
-
-    # Контроль остатков
-    new_qty = (existing.quantity if existing else 0) + payload.quantity
-    if product.stock is not None and new_qty > product.stock:
-        raise HTTPException(status_code=400, detail="Недостаточно товара на складе")
-
-    if existing:
-        existing.quantity = new_qty
-        await session.commit()
-        # Гарантируем, что product уже загружен (без ленивых запросов при сериализации)
-        await session.refresh(existing, attribute_names=["product"])
-        return existing
-
-    item = CartItem(
-        user_id=current_user.id,
-        product_id=payload.product_id,
-        quantity=payload.quantity,
-    )
-    session.add(item)
+    row = (await session.execute(
+        upsert_item_stmt(current_user.id, payload.product_id, payload.quantity)
+    )).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    item = _item_out(current_user.id, row)
     await session.commit()
-    await session.refresh(item, attribute_names=["product"])
     return item
 
 @router.put("/{item_id}", response_model=CartItemOut)
@@ -88,53 +260,42 @@ async def update_cart_item(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    res = await session.execute(
-        select(CartItem)
-        .options(selectinload(CartItem.product))
-        .where(CartItem.id == item_id, CartItem.user_id == current_user.id)
-    )
-    item = res.scalar_one_or_none()
-    if not item:
-        raise HTTPException(status_code=404, detail="Позиция корзины не найдена")
-
     if payload.quantity <= 0:
         raise HTTPException(status_code=400, detail="Количество должно быть > 0")
 
-    # Контроль остатков
-    prod_res = await session.execute(select(Product).where(Product.id == item.product_id))
-    product = prod_res.scalar_one()
-    if product.stock is not None and payload.quantity > product.stock:
-        raise HTTPException(status_code=400, detail="Недостаточно товара на складе")
-
-    item.quantity = payload.quantity
+    row = (await session.execute(
+        update_item_stmt(current_user.id, item_id, payload.quantity)
+    )).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Позиция корзины не найдена")
+    item = _item_out(current_user.id, row)
     await session.commit()
-    await session.refresh(item, attribute_names=["product"])
     return item
 
-@router.delete("/{item_id}", status_code=204)
-async def remove_cart_item(
-    item_id: int,
+@router.delete("/clear", status_code=204)
+async def clear_cart(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    res = await session.execute(
-        select(CartItem).where(CartItem.id == item_id, CartItem.user_id == current_user.id)
-    )
-    item = res.scalar_one_or_none()
-    if not item:
-        raise HTTPException(status_code=404, detail="Позиция корзины не найдена")
-
-    await session.delete(item)
+    removed = delete(CartItem).where(CartItem.user_id == current_user.id).returning(CartItem.id).cte("removed")
+    await session.execute(_with_bump(select(func.count()).select_from(removed), removed, current_user.id))
     await session.commit()
     return
 
-@router.delete("/clear", status_code=204)
-async def clear_cart(
+@router.delete("/{item_id}", status_code=204)
+async def remove_cart_item(
+    item_id: int,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    result = await session.execute(select(CartItem).where(CartItem.user_id == current_user.id))
-    for it in result.scalars().all():
-        await session.delete(it)
+    removed = (
+        delete(CartItem)
+        .where(CartItem.id == item_id, CartItem.user_id == current_user.id)
+        .returning(CartItem.id)
+        .cte("removed")
+    )
+    res = await session.execute(_with_bump(select(removed.c.id), removed, current_user.id))
+    if res.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Позиция корзины не найдена")
     await session.commit()
     return
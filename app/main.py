@@ -8,6 +8,7 @@ import uvicorn
 from . import shop
 from . import auth, pages
 from .database import engine, Base
+from shared.order_read_model import backfill_shop_summaries, metadata as read_model_metadata
 from . import shop, cart, orders
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
@@ -79,6 +80,21 @@ async def on_startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+
+# модель чтения заказов — один раз, после таблиц монолита (хуки идут в порядке регистрации)
+@app.on_event("startup")
+async def bootstrap_order_read_model():
+    async with engine.begin() as conn:
+        await conn.run_sync(read_model_metadata.create_all)
+    # заказы, созданные до модели чтения, иначе не видны в истории и статистике
+    try:
+        async with engine.begin() as conn:
+            users = await backfill_shop_summaries(conn)
+        if users:
+            print(f"Order read model: backfilled orders of {users} users")
+    except Exception as e:
+        print(f"Order read model backfill failed: {e}")
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
 
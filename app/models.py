@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, ForeignKey, DateTime, func,
-    Numeric, CheckConstraint, UniqueConstraint, Index
+    Column, Integer, BigInteger, String, Text, ForeignKey, DateTime, func,
+    Numeric, CheckConstraint, UniqueConstraint, Index, ARRAY
 )
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -23,12 +23,14 @@ class Product(Base):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True, index=True)
+    sku = Column(String(64), unique=True, nullable=True)   # 🏷️ артикул поставщика (ключ импорта)
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     price = Column(Numeric(10, 2), nullable=False)         # 💰 точные деньги
     image_url = Column(String(255), nullable=True)
     category = Column(String(100), nullable=True)
     stock = Column(Integer, nullable=False, default=0)      # 📦 остаток на складе
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     cart_items = relationship("CartItem", back_populates="product", cascade="all, delete-orphan", passive_deletes=True)
     order_items = relationship("OrderItem", back_populates="product", cascade="all, delete-orphan", passive_deletes=True)
@@ -40,6 +42,22 @@ class Product(Base):
     )
 
 
+# 📈 История цен: одна строка на товар, точки хранятся дельтами в массивах
+# (время — int, цена — bigint: дельта в копейках у Numeric(10,2) не влезает в int4).
+# Точка i: at = first_at + sum(at_deltas[:i]), price = first_price + sum(price_deltas[:i]).
+# last_at/last_price — последняя точка, чтобы дописывать дельту без декодирования.
+class ProductPriceHistory(Base):
+    __tablename__ = "product_price_history"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    first_at = Column(BigInteger, nullable=False)       # unix-время, секунды
+    first_price = Column(BigInteger, nullable=False)    # в копейках (центах)
+    last_at = Column(BigInteger, nullable=False)
+    last_price = Column(BigInteger, nullable=False)
+    at_deltas = Column(ARRAY(Integer), nullable=False, server_default="{}")
+    price_deltas = Column(ARRAY(BigInteger), nullable=False, server_default="{}")
+
+
 class CartItem(Base):
     __tablename__ = "cart_items"
 
@@ -58,6 +76,14 @@ class CartItem(Base):
     )
 
 
+# 🔢 Версия корзины: растёт на каждое изменение, клиент сверяет по ней свою копию
+class CartVersion(Base):
+    __tablename__ = "cart_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
 class Order(Base):
     __tablename__ = "orders"
 
@@ -91,4 +117,5 @@ class OrderItem(Base):
     __table_args__ = (
         CheckConstraint("quantity > 0", name="ck_orderitem_quantity_pos"),
         CheckConstraint("price >= 0", name="ck_orderitem_price_nonneg"),
+        Index("ix_order_items_order", "order_id"),  # счётчик позиций и детали заказа
     )
@@ -1,66 +1,118 @@
 # app/orders.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Integer, column, delete, insert, select, tuple_, update, values
 from decimal import Decimal
-from typing import List
+from typing import List, Optional
+
+from shared.cursors import decode_cursor, encode_cursor
+from shared.order_read_model import (
+    SOURCE_SHOP, order_created_stmt, order_summaries, stats_out, user_stats_stmt,
+)
 
 from .database import get_session
 from .models import CartItem, Order, OrderItem, Product, User
 from .schemas import CartItemOut  # можно добавить Order схемы позже
 from .auth import get_current_user
+from .cart import bump_version_stmt
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
-# 🧾 История заказов текущего пользователя
-@router.get("", response_model=list[dict])
+ORDERS_PAGE_MAX = 100
+
+
+def order_history_stmt(user_id: int, limit: int, after: Optional[tuple] = None):
+    """Страница истории из модели чтения: один проход по ix_order_summaries_user_created."""
+    o = order_summaries.c
+    stmt = (
+        select(o.order_id.label("id"), o.status, o.created_at, o.amount.label("total_price"), o.items_count)
+        .where(o.source == SOURCE_SHOP, o.user_id == user_id)
+        .order_by(o.created_at.desc(), o.order_id.desc())
+        .limit(limit + 1)  # +1 — узнать, есть ли следующая страница
+    )
+    if after is not None:
+        created_at, order_id = after
+        # отдельное условие по created_at — граница диапазона для индекса
+        stmt = stmt.where(
+            o.created_at <= created_at,
+            tuple_(o.created_at, o.order_id) < tuple_(created_at, order_id),
+        )
+    return stmt
+
+
+# 🧾 История заказов текущего пользователя (постранично: next_cursor -> ?cursor=)
+@router.get("", response_model=dict)
 async def list_orders(
+    limit: int = Query(20, ge=1, le=ORDERS_PAGE_MAX),
+    cursor: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    from sqlalchemy.orm import selectinload
-    res = await session.execute(
-        select(Order)
-        .options(selectinload(Order.items))
-        .where(Order.user_id == current_user.id)
-        .order_by(Order.created_at.desc())
-    )
-    orders = res.scalars().all()
-
-    # простая выдача с суммой и количеством позиций
-    out = []
-    for o in orders:
-        out.append({
-            "id": o.id,
-            "status": o.status,
-            "created_at": o.created_at,
-            "total_price": str(o.total_price),  # Decimal -> str
-            "items_count": len(o.items),
-        })
-    return out
-
-# 📦 Детали одного заказа
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    rows = (await session.execute(order_history_stmt(current_user.id, limit, after))).all()
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    return {
+        "items": [
+            {
+                "id": r.id,
+                "status": r.status,
+                "created_at": r.created_at,
+                "total_price": str(r.total_price),  # Decimal -> str
+                "items_count": r.items_count,
+            }
+            for r in page
+        ],
+        "next_cursor": next_cursor,
+    }
+
+# 📊 Сводка по заказам пользователя (потрачено, число заказов, последний заказ)
+@router.get("/stats", response_model=dict)
+async def order_stats(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    row = (await session.execute(user_stats_stmt(current_user.id))).one_or_none()
+    return stats_out(row)
+
+# 📦 Детали одного заказа: заказ, позиции и названия товаров одним запросом
 @router.get("/{order_id}", response_model=dict)
 async def order_detail(
     order_id: int,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    res = await session.execute(select(Order).where(Order.id == order_id, Order.user_id == current_user.id))
-    order = res.scalar_one_or_none()
-    if not order:
+    rows = (await session.execute(
+        select(
+            Order.id, Order.status, Order.created_at, Order.total_price,
+            OrderItem.id.label("item_id"), OrderItem.product_id, OrderItem.quantity, OrderItem.price,
+            Product.name.label("product_name"),
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .where(Order.id == order_id, Order.user_id == current_user.id)
+        .order_by(OrderItem.id)
+    )).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="Заказ не найден")
 
-    items_data = []
-    for it in order.items:
-        items_data.append({
-            "id": it.id,
-            "product_id": it.product_id,
-            "product_name": it.product.name if it.product else None,
-            "quantity": it.quantity,
-            "price": str(it.price),
-            "line_total": str(Decimal(it.quantity) * it.price),
-        })
+    order = rows[0]
+    items_data = [
+        {
+            "id": r.item_id,
+            "product_id": r.product_id,
+            "product_name": r.product_name,
+            "quantity": r.quantity,
+            "price": str(r.price),
+            "line_total": str(Decimal(r.quantity) * r.price),
+        }
+        for r in rows
+        if r.item_id is not None
+    ]
 
     return {
         "id": order.id,
@@ -76,59 +128,62 @@ async def create_order(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    # 1) Берём корзину пользователя
-    cart_res = await session.execute(select(CartItem).where(CartItem.user_id == current_user.id))
-    cart_items = cart_res.scalars().all()
-    if not cart_items:
+    # 1) Корзина вместе с товарами одним запросом; строки товаров блокируем
+    #    в порядке id — параллельные оформления ждут друг друга, а не дедлочат
+    lines = (await session.execute(
+        select(Product.id, Product.name, Product.price, Product.stock, CartItem.quantity)
+        .join(CartItem, CartItem.product_id == Product.id)
+        .where(CartItem.user_id == current_user.id)
+        .order_by(Product.id)
+        .with_for_update(of=Product)
+    )).all()
+    if not lines:
         raise HTTPException(status_code=400, detail="Корзина пуста")
 
-    # 2) Проверяем наличие товара на складе
-    # и одновременно считаем сумму
+    # 2) Проверяем наличие на складе и считаем сумму
     total = Decimal("0.00")
-    products_map = {}  # product_id -> Product
-
-    for ci in cart_items:
-        prod_res = await session.execute(select(Product).where(Product.id == ci.product_id))
-        product = prod_res.scalar_one_or_none()
-        if not product:
-            raise HTTPException(status_code=400, detail=f"Товар ID {ci.product_id} не найден")
-        products_map[product.id] = product
-
-        if product.stock < ci.quantity:
-            raise HTTPException(status_code=400, detail=f"Недостаточно на складе: {product.name}")
-
-        line_total = (Decimal(product.price) * Decimal(ci.quantity))
-        total += line_total
+    for line in lines:
+        if line.stock < line.quantity:
+            raise HTTPException(status_code=400, detail=f"Недостаточно на складе: {line.name}")
+        total += Decimal(line.price) * Decimal(line.quantity)
 
     # 3) Создаём заказ
-    order = Order(user_id=current_user.id, status="pending", total_price=total)
-    session.add(order)
-    await session.flush()  # получим order.id
-
-    # 4) Создаём OrderItem'ы и уменьшаем stock
-    for ci in cart_items:
-        p = products_map[ci.product_id]
-        oi = OrderItem(
-            order_id=order.id,
-            product_id=p.id,
-            quantity=ci.quantity,
-            price=p.price,  # фиксируем цену на момент покупки
-        )
-        session.add(oi)
+    order_id, order_status, created_at = (await session.execute(
+        insert(Order)
+        .values(user_id=current_user.id, status="pending", total_price=total)
+        .returning(Order.id, Order.status, Order.created_at)
+    )).one()
+
+    # 4) Позиции одним многострочным INSERT (цена — на момент покупки)
+    await session.execute(insert(OrderItem).values([
+        {"order_id": order_id, "product_id": line.id, "quantity": line.quantity, "price": line.price}
+        for line in lines
+    ]))
+
+    # 5) Остатки одним UPDATE ... FROM (VALUES ...)
+    v = values(column("product_id", Integer), column("quantity", Integer), name="v").data(
+        [(line.id, line.quantity) for line in lines]
+    )
+    await session.execute(
+        update(Product)
+        .where(Product.id == v.c.product_id)
+        .values(stock=Product.stock - v.c.quantity)
+    )
 
-        # уменьшаем остатки
-        p.stock = p.stock - ci.quantity
+    # 6) Очищаем корзину одним DELETE (и двигаем её версию для клиентов)
+    await session.execute(delete(CartItem).where(CartItem.user_id == current_user.id))
+    await session.execute(bump_version_stmt(current_user.id))
 
-    # 5) Очищаем корзину
-    for ci in cart_items:
-        await session.delete(ci)
+    # 7) Модель чтения: сводка заказа и агрегаты пользователя
+    await session.execute(order_created_stmt(
+        SOURCE_SHOP, order_id, current_user.id, order_status, total, None, len(lines), created_at,
+    ))
 
     await session.commit()
-    await session.refresh(order)
 
     return {
         "message": "Заказ создан",
-        "order_id": order.id,
-        "total_price": str(order.total_price),
-        "status": order.status,
+        "order_id": order_id,
+        "total_price": str(total),
+        "status": order_status,
     }
@@ -4,6 +4,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from .database import get_session
 from .auth import get_user_from_request
+from shared.order_read_model import stats_out, user_stats_stmt
 import os
 import httpx
 import asyncio
@@ -91,6 +92,15 @@ async def profile_page(request: Request, session = Depends(get_session)):
             traceback.print_exc()
             orders = None
 
-    ctx = {"request": request, "user": user, "orders": orders}
+    # агрегаты из модели чтения: одна строка по первичному ключу
+    order_stats = None
+    if user is not None:
+        try:
+            row = (await session.execute(user_stats_stmt(user.id))).one_or_none()
+            order_stats = stats_out(row)
+        except Exception:
+            print(f"pages.profile_page: order stats unavailable for user {user.id}")
+
+    ctx = {"request": request, "user": user, "orders": orders, "order_stats": order_stats}
     return templates.TemplateResponse("profile.html", ctx)
 
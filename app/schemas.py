@@ -1,6 +1,9 @@
 # app/schemas.py
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from decimal import Decimal
+from pydantic import BaseModel, EmailStr, Field, computed_field
+from typing import Optional, List, Literal
+
+from shared.product_images import variant_url
 
 # 👤 Пользователь
 class UserBase(BaseModel):
@@ -36,6 +39,18 @@ class ProductCreate(ProductBase):
 class ProductOut(ProductBase):
     id: int
     stock: int
+
+    # миниатюра для сетки каталога — как в листинге products-service
+    @computed_field
+    @property
+    def image(self) -> Optional[str]:
+        return variant_url(self.image_url, "thumb", "jpg")
+
+    @computed_field
+    @property
+    def image_webp(self) -> Optional[str]:
+        return variant_url(self.image_url, "thumb", "webp")
+
     class Config:
         from_attributes = True
 
@@ -64,8 +79,27 @@ class CartAddRequest(BaseModel):
     quantity: int
 
 
-# 📊 Сводка корзины (единый формат ответа /api/cart)
+# 📊 Сводка корзины (GET /api/cart/summary); total — точная сумма, в JSON строкой
 class CartSummary(BaseModel):
     items: List[CartItemOut]
     count: int
-    total: float
+    total: Decimal
+
+
+# 🔁 Пакетное изменение корзины (PATCH /api/cart)
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    product_id: int
+    quantity: int = Field(1, ge=0)  # add: прибавка; set: итог (0 = удалить); remove: не нужен
+
+
+class CartPatch(BaseModel):
+    ops: List[CartOperation] = []
+    # полная корзина клиента (localStorage): сервер приводит свою к ней, ops игнорируются
+    snapshot: Optional[List[CartItemBase]] = None
+    # версия, на которой основана копия клиента; не совпала — 409
+    base_version: Optional[int] = None
+
+
+class CartState(CartSummary):
+    version: int
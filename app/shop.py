@@ -1,21 +1,107 @@
 # app/shop.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, text
+from datetime import datetime, timezone
+from decimal import Decimal
+from itertools import accumulate
+from typing import List, Optional
 
 from .database import get_session
-from .models import Product, User
+from .models import Product, ProductPriceHistory, User
 from .schemas import ProductOut, ProductCreate
 from .auth import get_current_user  # если нужно ограничивать создание товаров
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
+PRICE_HISTORY_MAX_IDS = 1000
+
+# 📈 Дописать точку в историю цен одним UPSERT (строка товара блокируется на время записи)
+_APPEND_PRICE_SQL = text("""
+    INSERT INTO product_price_history AS h
+        (product_id, first_at, first_price, last_at, last_price, at_deltas, price_deltas)
+    VALUES (:product_id, :at, :price, :at, :price, '{}', '{}')
+    ON CONFLICT (product_id) DO UPDATE SET
+        at_deltas = h.at_deltas || (EXCLUDED.last_at - h.last_at)::int,
+        price_deltas = h.price_deltas || (EXCLUDED.last_price - h.last_price)::bigint,
+        last_at = EXCLUDED.last_at,
+        last_price = EXCLUDED.last_price
+""")
+_SEED_PRICE_SQL = text("""
+    INSERT INTO product_price_history (product_id, first_at, first_price, last_at, last_price)
+    VALUES (:product_id, :at, :price, :at, :price)
+    ON CONFLICT (product_id) DO NOTHING
+""")
+
+
+def _cents(price) -> int:
+    return int((Decimal(str(price)) * 100).quantize(Decimal("1")))
+
+
+def _now_ts() -> int:
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+def _price_point(at, cents: int) -> dict:
+    return {"at": datetime.fromtimestamp(at, tz=timezone.utc), "price": str(Decimal(cents).scaleb(-2))}
+
+
+def _decode_history(h: ProductPriceHistory, since: Optional[datetime], until: Optional[datetime]) -> list:
+    lo = since.timestamp() if since else None
+    hi = until.timestamp() if until else None
+    points = []
+    in_effect = None  # цена, действовавшая на момент since
+    for at, cents in zip(accumulate(h.at_deltas, initial=h.first_at), accumulate(h.price_deltas, initial=h.first_price)):
+        if lo is not None and at < lo:
+            in_effect = cents
+            continue
+        if in_effect is not None:
+            # график с середины диапазона начинается с цены на момент since
+            if at > lo:
+                points.append(_price_point(lo, in_effect))
+            in_effect = None
+        if hi is not None and at > hi:
+            break
+        points.append(_price_point(at, cents))
+    if in_effect is not None:
+        points.append(_price_point(lo, in_effect))
+    return points
+
 @router.get("", response_model=List[ProductOut])
 async def list_products(session: AsyncSession = Depends(get_session)):
     result = await session.execute(select(Product).order_by(Product.id.desc()))
     return result.scalars().all()
 
+# 📈 История цен сразу для многих товаров (графики / аналитика)
+@router.get("/price-history")
+async def bulk_price_history(
+    ids: List[int] = Query(...),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    if len(ids) > PRICE_HISTORY_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Не больше {PRICE_HISTORY_MAX_IDS} товаров за запрос")
+    result = await session.execute(
+        select(ProductPriceHistory).where(ProductPriceHistory.product_id.in_(ids))
+    )
+    return {h.product_id: _decode_history(h, since, until) for h in result.scalars().all()}
+
+@router.get("/{product_id}/price-history")
+async def product_price_history(
+    product_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    history = await session.get(ProductPriceHistory, product_id)
+    if history is None:
+        product = await session.get(Product, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Товар не найден")
+        return {"product_id": product_id, "points": []}
+    return {"product_id": product_id, "points": _decode_history(history, since, until)}
+
 @router.get("/{product_id}", response_model=ProductOut)
 async def get_product(product_id: int, session: AsyncSession = Depends(get_session)):
     result = await session.execute(select(Product).where(Product.id == product_id))
@@ -40,6 +126,8 @@ async def create_product(
         stock=0,  # стартовый остаток; регулируйте через PUT
     )
     session.add(product)
+    await session.flush()  # нужен product.id для истории цен
+    await session.execute(_APPEND_PRICE_SQL, {"product_id": product.id, "at": _now_ts(), "price": _cents(product.price)})
     await session.commit()
     await session.refresh(product)
     return product
@@ -56,6 +144,12 @@ async def update_product(
     if not product:
         raise HTTPException(status_code=404, detail="Товар не найден")
 
+    if _cents(product.price) != _cents(payload.price):
+        now, params = _now_ts(), {"product_id": product.id}
+        # у товаров, созданных до истории цен, первой точкой будет прежняя цена
+        await session.execute(_SEED_PRICE_SQL, {**params, "at": now, "price": _cents(product.price)})
+        await session.execute(_APPEND_PRICE_SQL, {**params, "at": now, "price": _cents(payload.price)})
+
     product.name = payload.name
     product.description = payload.description
     product.price = payload.price
@@ -0,0 +1,71 @@
+"""Fill product_fitments from the free-text product names.
+
+Names like "Воздушный фильтр VAG (1.4/1.8/2.0 TSI)" are parsed with
+shared.fitment.parse_fitment; products that already have fitment rows are left
+untouched, so the script is safe to re-run. products-service rebuilds its
+fitment index on startup (or after a catalog import).
+
+Usage:
+    python scripts/backfill_fitments.py
+
+The script reads DATABASE_URL from the environment; default matches docker-compose.
+"""
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+# Ensure project root is on sys.path so we can import shared helpers
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from shared.fitment import parse_fitment
+
+
+DATABASE_URL = os.environ.get(
+    "DATABASE_URL",
+    "postgresql://postgres:postgres@db:5432/vag_force_db",
+)
+
+
+def main():
+    conn = psycopg2.connect(DATABASE_URL.replace("+asyncpg", ""))
+    # named cursor = server-side, the catalog is not loaded into memory at once
+    read = conn.cursor(name="backfill_fitments")
+    read.itersize = 5000
+    read.execute(
+        """
+        SELECT p.id, p.name FROM products p
+        WHERE NOT EXISTS (SELECT 1 FROM product_fitments f WHERE f.product_id = p.id)
+        ORDER BY p.id
+        """
+    )
+    write = conn.cursor()
+
+    products = inserted = 0
+    batch = []
+    for product_id, name in read:
+        rows = parse_fitment(name)
+        if rows:
+            products += 1
+        batch.extend((product_id, r["engine"], r["model"], r["year_from"], r["year_to"]) for r in rows)
+        if len(batch) >= 5000:
+            execute_values(write, "INSERT INTO product_fitments (product_id, engine, model, year_from, year_to) VALUES %s", batch)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        execute_values(write, "INSERT INTO product_fitments (product_id, engine, model, year_from, year_to) VALUES %s", batch)
+        inserted += len(batch)
+
+    conn.commit()
+    read.close()
+    write.close()
+    conn.close()
+    print(f"Fitment rows inserted: {inserted} for {products} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Build resized WebP/JPEG variants for product images that don't have them yet.
+
+Run after a catalog import (scripts/import_catalog.py or POST /api/products/import):
+for every product whose image_url is an external URL or a local file path, the
+source image is downloaded/read once, variants are written to PRODUCT_IMAGES_DIR
+(see shared/product_images.py) and image_url is switched to the hashed variant.
+
+Usage:
+    python scripts/build_image_variants.py
+    PRODUCT_IMAGES_DIR=services/products-service/media/products python scripts/build_image_variants.py
+
+The script reads DATABASE_URL from the environment; default matches docker-compose.
+"""
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import psycopg2
+
+# Ensure project root is on sys.path so we can import shared helpers
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from shared.product_images import MEDIA_URL, build_variants
+
+
+DATABASE_URL = os.environ.get(
+    "DATABASE_URL",
+    "postgresql://postgres:postgres@db:5432/vag_force_db",
+)
+
+
+def load_source(client: httpx.Client, image_url: str) -> bytes:
+    if image_url.startswith(("http://", "https://")):
+        r = client.get(image_url)
+        r.raise_for_status()
+        return r.content
+    return (ROOT / image_url.lstrip("/")).read_bytes()
+
+
+def main():
+    conn = psycopg2.connect(DATABASE_URL.replace("+asyncpg", ""))
+    conn.autocommit = True
+    cur = conn.cursor()
+    # только id/url — сами картинки обрабатываем по одной
+    cur.execute(
+        "SELECT id, image_url FROM products WHERE image_url IS NOT NULL AND image_url NOT LIKE %s ORDER BY id",
+        (MEDIA_URL + "/%",),
+    )
+    pending = cur.fetchall()
+    print(f"{len(pending)} products need image variants")
+
+    done = failed = 0
+    with httpx.Client(timeout=15.0, follow_redirects=True) as client:
+        for product_id, image_url in pending:
+            try:
+                new_url = build_variants(load_source(client, image_url))
+            except Exception as e:
+                failed += 1
+                print(f"  product {product_id}: {image_url}: {e}", file=sys.stderr)
+                continue
+            cur.execute("UPDATE products SET image_url = %s WHERE id = %s", (new_url, product_id))
+            done += 1
+
+    cur.close()
+    conn.close()
+    print(f"Image variants built: {done}, failed: {failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -124,6 +124,22 @@ def seed_products(conn):
     except Exception:
         pass
 
+    # sku (артикул поставщика) is the upsert key for scripts/import_catalog.py
+    try:
+        cur.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS sku VARCHAR(64)")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_products_sku ON products (sku)")
+        cur.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS category VARCHAR(100)")
+        cur.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS image_url VARCHAR(255)")
+        # mapped by the monolith model; products-service migration 0004 adds it with triggers
+        cur.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now()")
+        # price history created by older create_all runs had int4 price deltas
+        cur.execute(
+            "DO $$ BEGIN IF to_regclass('product_price_history') IS NOT NULL THEN "
+            "ALTER TABLE product_price_history ALTER COLUMN price_deltas TYPE bigint[]; END IF; END $$"
+        )
+    except Exception:
+        pass
+
     # ensure stock column exists and set a sensible default and NOT NULL constraint
     try:
         # Add column if missing (nullable)
@@ -0,0 +1,100 @@
+"""Import a supplier catalog (CSV or NDJSON) into the products table.
+
+The file is streamed and validated in chunks (see shared/catalog_import.py);
+each chunk is loaded with COPY into a temporary staging table and merged into
+`products` with a single INSERT ... ON CONFLICT (sku) DO UPDATE, then committed.
+Memory use does not depend on the size of the file.
+
+Usage:
+    python scripts/import_catalog.py supplier.csv
+    python scripts/import_catalog.py supplier.ndjson --format ndjson --chunk-size 10000
+
+The script reads DATABASE_URL from the environment; default matches docker-compose.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+
+# Ensure project root is on sys.path so we can import shared helpers
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from shared.catalog_import import (
+    CHUNK_SIZE, FORMATS, STAGING_COLUMNS, STAGING_DDL, STAGING_TABLE, UPSERT_SQL, iter_batches,
+)
+
+
+DATABASE_URL = os.environ.get(
+    "DATABASE_URL",
+    "postgresql://postgres:postgres@db:5432/vag_force_db",
+)
+
+
+def copy_rows(cur, rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="catalog file (CSV with header or NDJSON)")
+    parser.add_argument("--format", choices=FORMATS, help="default: by file extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    dsn = DATABASE_URL.replace("+asyncpg", "")
+
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute(STAGING_DDL)
+    conn.commit()
+
+    totals = {"rows": 0, "inserted": 0, "updated": 0, "rejected": 0}
+    started = time.monotonic()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as f:
+            for batch in iter_batches(f, fmt, args.chunk_size):
+                if batch.rows:
+                    copy_rows(cur, batch.rows)
+                    cur.execute(UPSERT_SQL)
+                    inserted, updated = cur.fetchone()
+                    totals["inserted"] += inserted
+                    totals["updated"] += updated
+                conn.commit()
+
+                totals["rows"] += len(batch.rows) + batch.rejected
+                totals["rejected"] += batch.rejected
+                for err in batch.errors:
+                    print(f"  line {err['line']}: {err['error']}", file=sys.stderr)
+                elapsed = time.monotonic() - started
+                print(
+                    f"line {batch.last_line}: {totals['rows']} rows, "
+                    f"{totals['inserted']} inserted, {totals['updated']} updated, "
+                    f"{totals['rejected']} rejected ({totals['rows'] / max(elapsed, 1e-6):.0f} rows/s)"
+                )
+    except Exception as e:
+        conn.rollback()
+        print(f"Import failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+    print("Import complete:", totals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Rebuild the order read model (shared/order_read_model.py) from the orders tables.
+
+Normally the read model is maintained incrementally by both orders
+implementations; run this after a backfill, a manual status fix in SQL, or
+to pick up orders created before the read model existed.
+
+Summaries of the given source are replaced in full, then user_order_stats is
+recomputed for every user from all summaries, in one transaction.
+
+Usage:
+    python scripts/rebuild_order_read_model.py --source shop     # monolith orders/order_items
+    python scripts/rebuild_order_read_model.py --source orders   # orders-service orders
+
+The script reads DATABASE_URL from the environment; default matches docker-compose.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from shared.order_read_model import SOURCE_ORDERS, SOURCE_SHOP, SPEND_STATUSES
+
+
+DATABASE_URL = os.environ.get(
+    "DATABASE_URL",
+    "postgresql://postgres:postgres@db:5432/vag_force_db",
+)
+
+SUMMARIES_SQL = {
+    SOURCE_SHOP: """
+        INSERT INTO order_summaries (source, order_id, user_id, status, amount, currency, items_count, created_at)
+        SELECT %(source)s, o.id, o.user_id, o.status, o.total_price, NULL,
+               (SELECT count(*) FROM order_items i WHERE i.order_id = o.id), o.created_at
+        FROM orders o
+        WHERE o.user_id IS NOT NULL
+    """,
+    SOURCE_ORDERS: """
+        INSERT INTO order_summaries (source, order_id, user_id, status, amount, currency, items_count, created_at)
+        SELECT %(source)s, o.id, o.user_id, o.status, coalesce(o.amount, 0), o.currency, 0, o.created_at
+        FROM orders o
+    """,
+}
+
+STATS_SQL = """
+    INSERT INTO user_order_stats (user_id, order_count, lifetime_spend,
+                                  last_order_source, last_order_id, last_order_at, last_order_status)
+    SELECT DISTINCT ON (user_id) user_id,
+           count(*) OVER w,
+           sum(CASE WHEN status = ANY(%(spend)s) THEN amount ELSE 0 END) OVER w,
+           source, order_id, created_at, status
+    FROM order_summaries
+    WINDOW w AS (PARTITION BY user_id)
+    ORDER BY user_id, created_at DESC, order_id DESC
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", choices=sorted(SUMMARIES_SQL), required=True)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(DATABASE_URL.replace("+asyncpg", ""))
+    cur = conn.cursor()
+    cur.execute("DELETE FROM order_summaries WHERE source = %s", (args.source,))
+    cur.execute(SUMMARIES_SQL[args.source], {"source": args.source})
+    summaries = cur.rowcount
+    cur.execute("DELETE FROM user_order_stats")
+    cur.execute(STATS_SQL, {"spend": list(SPEND_STATUSES)})
+    users = cur.rowcount
+    conn.commit()
+    cur.close()
+    conn.close()
+    print(f"Order summaries rebuilt: {summaries} ({args.source}); user stats: {users}")
+
+
+if __name__ == "__main__":
+    main()
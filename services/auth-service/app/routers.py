@@ -6,6 +6,7 @@ from shared.database import get_session
 from shared.auth_utils import (
     get_password_hash, verify_password, create_access_token, decode_access_token
 )
+from shared.principal_cache import PrincipalCache, watch_user_changes
 from shared.schemas import UserCreate, UserOut, UserLogin
 from .models import User
 
@@ -15,6 +16,10 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 # Формат: { email: {"password_hash": ..., "full_name": ...} }
 USERS_FALLBACK: dict = {}
 
+# проверенные токены -> User: повторные запросы с тем же токеном не ходят в БД
+principal_cache = PrincipalCache()
+watch_user_changes(principal_cache, User)
+
 
 # Регистрация пользователя
 @router.post("/register", response_model=UserOut, status_code=201)
@@ -98,6 +103,10 @@ from fastapi.security import OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
     payload = decode_access_token(token)
     if payload is None:
         raise HTTPException(status_code=401, detail="Невалидный токен")
@@ -110,6 +119,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSe
         result = await session.execute(select(User).where(User.email == email))
         user = result.scalar_one_or_none()
         if user is not None:
+            principal_cache.put(token, email, user, payload.get("exp"))
             return user
     except Exception:
         pass
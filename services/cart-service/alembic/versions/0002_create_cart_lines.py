@@ -0,0 +1,30 @@
+"""cart_lines: write-behind copy of the in-memory carts
+
+Revision ID: 0002_create_cart_lines
+Revises: 0001_create_cart_items
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002_create_cart_lines'
+down_revision = '0001_create_cart_items'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per (owner, product); the flusher rewrites an owner's rows as a whole.
+    op.create_table(
+        'cart_lines',
+        sa.Column('owner', sa.String(length=255), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('owner', 'product_id', name='pk_cart_lines'),
+        sa.CheckConstraint('quantity > 0', name='ck_cart_lines_quantity_pos'),
+    )
+
+
+def downgrade():
+    op.drop_table('cart_lines')
@@ -0,0 +1,29 @@
+"""cart_versions: version of the last flushed snapshot per owner
+
+Revision ID: 0003_create_cart_versions
+Revises: 0002_create_cart_lines
+Create Date: 2026-10-19 00:00:01.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003_create_cart_versions'
+down_revision = '0002_create_cart_lines'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Flushers from several processes may race on one owner; the one holding the
+    # older snapshot loses the conditional upsert and leaves cart_lines alone.
+    op.create_table(
+        'cart_versions',
+        sa.Column('owner', sa.String(length=255), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('owner', name='pk_cart_versions'),
+    )
+
+
+def downgrade():
+    op.drop_table('cart_versions')
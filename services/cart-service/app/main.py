@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import router as cart_router
+from .routers import flusher, router as cart_router, store
 
 app = FastAPI(title="cart-service")
 
@@ -21,6 +21,18 @@ async def health():
     return {"status": "ok"}
 
 
+@app.on_event("startup")
+async def on_startup():
+    flusher.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # последний сброс, чтобы изменения из памяти не потерялись при остановке
+    await flusher.stop()
+    await store.redis.aclose()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8003, reload=True)
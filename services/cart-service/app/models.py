@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, func
 from shared.database import Base
 
 
@@ -7,3 +7,22 @@ class CartItem(Base):
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
+
+
+# Строки корзин, сброшенные из хранилища в памяти (write-behind, app/store.py).
+# owner — subject токена: сервис не ходит за пользователем в БД.
+class CartLine(Base):
+    __tablename__ = "cart_lines"
+    owner = Column(String(255), primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+# Версия последнего сброшенного снимка корзины: сброс с меньшей версией —
+# устаревший (его обогнал другой процесс) и строки не переписывает.
+class CartVersion(Base):
+    __tablename__ = "cart_versions"
+    owner = Column(String(255), primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -1,15 +1,126 @@
-from fastapi import APIRouter, HTTPException
+"""Cart API поверх хранилища в памяти (app/store.py).
+
+Владелец корзины — subject JWT (email): токен проверяется подписью, без
+запроса к пользователям, так что ни чтение, ни запись корзины не ходят в
+основную БД. Цены и остатки здесь не известны — их сверяет оформление заказа.
+
+GET/PATCH /api/cart — тот же контракт, что у монолита (app/cart.py): пакет
+операций или снимок корзины клиента с `base_version`, при расхождении — 409
+с текущей версией. Страницы магазина синхронизируют корзину через него.
+"""
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from pydantic import BaseModel, Field
+
+from shared.auth_utils import decode_access_token
+from shared.cart_ops import fold_ops
+from .store import MAX_QUANTITY, CartConflict, CartFlusher, CartStore
 
 router = APIRouter(prefix="/api/cart", tags=["cart"])
 
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+store = CartStore()
+flusher = CartFlusher(store)
+
+
+class CartLineIn(BaseModel):
+    product_id: int
+    quantity: int = Field(1, ge=1, le=MAX_QUANTITY)
+
+
+class QuantityLineIn(BaseModel):
+    product_id: int
+    quantity: int = Field(..., ge=0)  # сверх MAX_QUANTITY обрезается в хранилище
+
+
+class QuantityIn(BaseModel):
+    quantity: int = Field(..., ge=0, le=MAX_QUANTITY)
+
+
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    product_id: int
+    quantity: int = Field(1, ge=0, le=MAX_QUANTITY)
+
+
+class CartPatch(BaseModel):
+    ops: List[CartOperation] = []
+    snapshot: Optional[List[QuantityLineIn]] = None
+    base_version: Optional[int] = None
+
+
+def current_owner(token: str = Depends(oauth2_scheme)) -> str:
+    payload = decode_access_token(token)
+    owner = payload.get("sub") if payload else None
+    if not owner:
+        raise HTTPException(status_code=401, detail="Невалидный токен")
+    return owner
+
+
+def items_out(items: dict) -> dict:
+    return {
+        "items": [{"product_id": pid, "quantity": qty} for pid, qty in sorted(items.items())],
+        "count": sum(items.values()),
+    }
+
+
+async def cart_out(owner: str) -> dict:
+    return items_out(await store.get(owner))
+
+
+@router.get("")
+async def get_cart(owner: str = Depends(current_owner)):
+    version, items = await store.state(owner)
+    return dict(items_out(items), version=version)
+
+
+@router.patch("")
+async def patch_cart(payload: CartPatch, owner: str = Depends(current_owner)):
+    """Пакет операций add/set/remove или снимок корзины клиента — одним изменением."""
+    if payload.snapshot is not None:
+        plan = {it.product_id: (True, it.quantity) for it in payload.snapshot}
+    else:
+        if any(op.op == "add" and op.quantity <= 0 for op in payload.ops):
+            raise HTTPException(status_code=400, detail="Количество должно быть > 0")
+        plan = fold_ops(payload.ops)
+    try:
+        version, items = await store.patch(
+            owner, plan, replace=payload.snapshot is not None, base_version=payload.base_version,
+        )
+    except CartConflict as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Корзина изменилась, обновите её", "version": e.version},
+        )
+    return dict(items_out(items), version=version)
+
 
 @router.get("/me")
-async def get_my_cart():
-    # placeholder: empty cart
-    return {"items": [], "total": 0}
+async def get_my_cart(owner: str = Depends(current_owner)):
+    return await cart_out(owner)
 
 
 @router.post("/add")
-async def add_to_cart(product_id: int, quantity: int = 1):
-    # placeholder: echo
+async def add_to_cart(payload: CartLineIn, owner: str = Depends(current_owner)):
+    quantity = await store.add(owner, payload.product_id, payload.quantity)
+    return {"product_id": payload.product_id, "quantity": quantity}
+
+
+@router.put("/items/{product_id}")
+async def set_quantity(product_id: int, payload: QuantityIn, owner: str = Depends(current_owner)):
+    quantity = await store.set(owner, product_id, payload.quantity)
     return {"product_id": product_id, "quantity": quantity}
+
+
+@router.delete("/items/{product_id}", status_code=204)
+async def remove_item(product_id: int, owner: str = Depends(current_owner)):
+    if not await store.remove(owner, product_id):
+        raise HTTPException(status_code=404, detail="Товара нет в корзине")
+
+
+@router.delete("/me", status_code=204)
+async def clear_cart(owner: str = Depends(current_owner)):
+    await store.clear(owner)
@@ -0,0 +1,366 @@
+"""Корзины в памяти: hash `cart:{owner}` product_id -> quantity на пользователя.
+
+Чтение и запись идут только сюда; Postgres (таблица `cart_lines`) обновляется
+фоном пачками (write-behind, `CartFlusher`). Изменённые владельцы копятся во
+множестве `cart:dirty`; флашер забирает их SPOP-ом и переписывает строки
+каждого целиком, поэтому повторные изменения между флашами схлопываются.
+
+Хранилище — Redis (CART_REDIS_URL) или `MemoryRedis`: процессная замена с тем
+же подмножеством команд для тестов и одиночного запуска без Redis. Корзина,
+которой ещё нет в хранилище (новый Redis, рестарт без Redis), один раз
+подгружается из `cart_lines`; признак загрузки — множество `cart:loaded`.
+Загрузку делает один запрос — взявший `SET NX` на `cart:loading:{owner}`;
+остальные ждут её окончания, иначе запоздавшая загрузка затёрла бы их
+изменения или вернула удалённую строку.
+
+Каждое изменение увеличивает версию корзины — поле `v` того же hash, так что
+HGETALL отдаёт строки и их версию одним снимком. Флашеры нескольких процессов
+могут сбрасывать одного владельца наперегонки; `persist_carts` пишет снимок,
+только если его версия больше сохранённой в `cart_versions`, и устаревший
+снимок не затирает свежий. Загрузка из Postgres восстанавливает и версию.
+
+Та же версия — `version` в PATCH /api/cart: изменения одного владельца идут
+под `SET NX` на `cart:writing:{owner}`, поэтому проверка `base_version` и
+применение пакета не перемежаются с чужими записями.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+import time
+import traceback
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from shared.database import async_session_maker
+from .models import CartLine, CartVersion
+
+REDIS_URL = os.getenv("CART_REDIS_URL")
+FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", "1.0"))
+FLUSH_BATCH_SIZE = int(os.getenv("CART_FLUSH_BATCH", "500"))
+INSERT_CHUNK = 5000  # 3 параметра на строку; лимит asyncpg — 32767
+MAX_QUANTITY = 999
+
+DIRTY_KEY = "cart:dirty"
+VERSION_FIELD = "v"  # поля товаров — числа, с ними не пересечётся
+LOADED_KEY = "cart:loaded"
+# блокировка загрузки истекает сама, если загрузивший процесс умер
+LOAD_LOCK_TTL = 10
+LOAD_WAIT = 0.02
+WRITE_LOCK_TTL = 10
+WRITE_WAIT = 0.005
+
+
+def cart_key(owner: str) -> str:
+    return f"cart:{owner}"
+
+
+def load_lock_key(owner: str) -> str:
+    return f"cart:loading:{owner}"
+
+
+def write_lock_key(owner: str) -> str:
+    return f"cart:writing:{owner}"
+
+
+class CartConflict(Exception):
+    """base_version пакета не совпала с текущей версией корзины."""
+
+    def __init__(self, version: int):
+        super().__init__(version)
+        self.version = version
+
+
+def split_version(raw: dict) -> tuple[int, dict]:
+    """Содержимое hash корзины -> (версия, product_id -> quantity)."""
+    items = {int(pid): int(qty) for pid, qty in raw.items() if pid != VERSION_FIELD}
+    return int(raw.get(VERSION_FIELD, 0)), items
+
+
+class MemoryRedis:
+    """Процессная замена Redis: hash- и set-команды, которыми пользуется CartStore."""
+
+    def __init__(self):
+        self._data: dict = {}
+        self._expires: dict = {}
+
+    async def set(self, key: str, value, nx: bool = False, ex: Optional[int] = None):
+        if self._expires.get(key, float("inf")) <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        if nx and key in self._data:
+            return None
+        self._data[key] = str(value)
+        if ex is not None:
+            self._expires[key] = time.monotonic() + ex
+        return True
+
+    async def hgetall(self, key: str) -> dict:
+        return dict(self._data.get(key, {}))
+
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        h = self._data.setdefault(key, {})
+        value = int(h.get(field, 0)) + amount
+        h[field] = str(value)
+        return value
+
+    async def hset(self, key: str, field: Optional[str] = None, value=None, mapping: Optional[dict] = None) -> int:
+        h = self._data.setdefault(key, {})
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        added = sum(1 for f in items if f not in h)
+        h.update({f: str(v) for f, v in items.items()})
+        return added
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        h = self._data.get(key, {})
+        removed = sum(1 for f in fields if h.pop(f, None) is not None)
+        if not h:
+            self._data.pop(key, None)
+        return removed
+
+    async def delete(self, *keys: str) -> int:
+        for k in keys:
+            self._expires.pop(k, None)
+        return sum(1 for k in keys if self._data.pop(k, None) is not None)
+
+    async def sadd(self, key: str, *members: str) -> int:
+        s = self._data.setdefault(key, set())
+        added = len(set(members) - s)
+        s.update(members)
+        return added
+
+    async def sismember(self, key: str, member: str) -> bool:
+        return member in self._data.get(key, ())
+
+    async def spop(self, key: str, count: Optional[int] = None):
+        s = self._data.get(key, set())
+        popped = [s.pop() for _ in range(min(count if count is not None else 1, len(s)))]
+        if not s:
+            self._data.pop(key, None)
+        return popped if count is not None else (popped[0] if popped else None)
+
+    async def aclose(self):
+        pass
+
+
+def make_redis():
+    if not REDIS_URL:
+        return MemoryRedis()
+    try:
+        import redis.asyncio as redis_asyncio
+    except ImportError as e:
+        raise RuntimeError("CART_REDIS_URL is set but the 'redis' package is not installed") from e
+    return redis_asyncio.from_url(REDIS_URL, decode_responses=True)
+
+
+async def load_persisted(owner: str) -> dict:
+    async with async_session_maker() as session:
+        res = await session.execute(
+            select(CartLine.product_id, CartLine.quantity).where(CartLine.owner == owner)
+        )
+        lines = {str(product_id): str(quantity) for product_id, quantity in res}
+        version = (await session.execute(
+            select(CartVersion.version).where(CartVersion.owner == owner)
+        )).scalar_one_or_none()
+    # версия продолжается с сохранённой, иначе новые снимки считались бы устаревшими
+    if version is not None:
+        lines[VERSION_FIELD] = str(version)
+    return lines
+
+
+class CartStore:
+    def __init__(self, redis=None, loader=load_persisted):
+        self.redis = redis if redis is not None else make_redis()
+        self._loader = loader
+
+    async def _ensure_loaded(self, owner: str):
+        while not await self.redis.sismember(LOADED_KEY, owner):
+            lock = load_lock_key(owner)
+            if not await self.redis.set(lock, "1", nx=True, ex=LOAD_LOCK_TTL):
+                await asyncio.sleep(LOAD_WAIT)
+                continue
+            try:
+                # могли загрузить, пока мы ждали блокировку
+                if not await self.redis.sismember(LOADED_KEY, owner):
+                    lines = await self._loader(owner)
+                    if lines:
+                        await self.redis.hset(cart_key(owner), mapping=lines)
+                    await self.redis.sadd(LOADED_KEY, owner)
+            finally:
+                await self.redis.delete(lock)
+            return
+
+    @asynccontextmanager
+    async def _writing(self, owner: str):
+        lock = write_lock_key(owner)
+        while not await self.redis.set(lock, "1", nx=True, ex=WRITE_LOCK_TTL):
+            await asyncio.sleep(WRITE_WAIT)
+        try:
+            yield
+        finally:
+            await self.redis.delete(lock)
+
+    async def _touched(self, owner: str) -> int:
+        version = await self.redis.hincrby(cart_key(owner), VERSION_FIELD, 1)
+        await self.redis.sadd(DIRTY_KEY, owner)
+        return version
+
+    async def get(self, owner: str) -> dict:
+        """product_id -> quantity."""
+        return (await self.state(owner))[1]
+
+    async def state(self, owner: str) -> tuple[int, dict]:
+        """(версия, product_id -> quantity) одним снимком."""
+        await self._ensure_loaded(owner)
+        return split_version(await self.redis.hgetall(cart_key(owner)))
+
+    async def patch(self, owner: str, plan: dict, replace: bool = False,
+                    base_version: Optional[int] = None) -> tuple[int, dict]:
+        """Применить план shared.cart_ops.fold_ops (или снимок при replace) как одно изменение."""
+        await self._ensure_loaded(owner)
+        async with self._writing(owner):
+            version, items = split_version(await self.redis.hgetall(cart_key(owner)))
+            if base_version is not None and base_version != version:
+                raise CartConflict(version)
+            new = {} if replace else dict(items)
+            for pid, (absolute, quantity) in plan.items():
+                quantity = quantity if absolute else new.get(pid, 0) + quantity
+                if quantity > 0:
+                    new[pid] = min(quantity, MAX_QUANTITY)
+                else:
+                    new.pop(pid, None)
+            gone = [str(pid) for pid in items if pid not in new]
+            if gone:
+                await self.redis.hdel(cart_key(owner), *gone)
+            changed = {str(pid): qty for pid, qty in new.items() if items.get(pid) != qty}
+            if changed:
+                await self.redis.hset(cart_key(owner), mapping=changed)
+            if gone or changed:
+                version = await self._touched(owner)
+            return version, new
+
+    async def add(self, owner: str, product_id: int, quantity: int) -> int:
+        await self._ensure_loaded(owner)
+        key, field = cart_key(owner), str(product_id)
+        async with self._writing(owner):
+            value = await self.redis.hincrby(key, field, quantity)
+            if value > MAX_QUANTITY:
+                value = MAX_QUANTITY
+                await self.redis.hset(key, field, value)
+            elif value <= 0:
+                value = 0
+                await self.redis.hdel(key, field)
+            await self._touched(owner)
+        return value
+
+    async def set(self, owner: str, product_id: int, quantity: int) -> int:
+        await self._ensure_loaded(owner)
+        quantity = min(quantity, MAX_QUANTITY)
+        async with self._writing(owner):
+            if quantity > 0:
+                await self.redis.hset(cart_key(owner), str(product_id), quantity)
+            else:
+                await self.redis.hdel(cart_key(owner), str(product_id))
+            await self._touched(owner)
+        return max(quantity, 0)
+
+    async def remove(self, owner: str, product_id: int) -> bool:
+        await self._ensure_loaded(owner)
+        async with self._writing(owner):
+            removed = await self.redis.hdel(cart_key(owner), str(product_id))
+            await self._touched(owner)
+        return bool(removed)
+
+    async def clear(self, owner: str):
+        # после загрузки: идущая параллельно загрузка не вернёт очищенные строки
+        await self._ensure_loaded(owner)
+        async with self._writing(owner):
+            # строки удаляются, версия остаётся — DEL сбросил бы её в 0
+            items = split_version(await self.redis.hgetall(cart_key(owner)))[1]
+            if items:
+                await self.redis.hdel(cart_key(owner), *map(str, items))
+            await self._touched(owner)
+
+
+def claim_versions_stmt(carts: dict):
+    """Поднять сохранённые версии до версий снимков; RETURNING — владельцы, чей снимок новее."""
+    # по порядку владельцев: встречные флаши блокируют строки в одном порядке, без дедлоков
+    ins = pg_insert(CartVersion).values(
+        [{"owner": owner, "version": carts[owner][0]} for owner in sorted(carts)]
+    )
+    return ins.on_conflict_do_update(
+        index_elements=[CartVersion.owner],
+        set_={"version": ins.excluded.version, "updated_at": func.now()},
+        where=CartVersion.version < ins.excluded.version,
+    ).returning(CartVersion.owner)
+
+
+async def persist_carts(carts: dict):
+    """Переписать строки владельцев одной транзакцией: DELETE по всем + многострочный INSERT.
+
+    carts — owner -> (версия, product_id -> quantity). Снимки не новее
+    сохранённых пропускаются: их уже обогнал флаш другого процесса.
+    """
+    async with async_session_maker() as session:
+        fresh = set((await session.execute(claim_versions_stmt(carts))).scalars())
+        rows = [
+            {"owner": owner, "product_id": pid, "quantity": qty}
+            for owner in fresh
+            for pid, qty in carts[owner][1].items()
+        ]
+        await session.execute(delete(CartLine).where(CartLine.owner.in_(list(fresh))))
+        for start in range(0, len(rows), INSERT_CHUNK):
+            await session.execute(pg_insert(CartLine).values(rows[start:start + INSERT_CHUNK]))
+        await session.commit()
+
+
+class CartFlusher:
+    """Фоновый сброс изменённых корзин в Postgres раз в FLUSH_INTERVAL."""
+
+    def __init__(self, store: CartStore, persist=persist_carts, interval: float = FLUSH_INTERVAL):
+        self._store = store
+        self._persist = persist
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def flush(self) -> int:
+        """Сбросить всё, что накопилось; вернуть число сброшенных корзин."""
+        flushed = 0
+        while True:
+            owners = await self._store.redis.spop(DIRTY_KEY, FLUSH_BATCH_SIZE)
+            if not owners:
+                return flushed
+            carts = {}
+            for owner in owners:
+                carts[owner] = split_version(await self._store.redis.hgetall(cart_key(owner)))
+            try:
+                await self._persist(carts)
+            except Exception:
+                # вернуть в очередь: следующий проход попробует снова
+                await self._store.redis.sadd(DIRTY_KEY, *owners)
+                raise
+            flushed += len(owners)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.flush()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            traceback.print_exc()
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List
 import os
 
 router = APIRouter(prefix="/api/inventory", tags=["inventory"])
@@ -35,6 +35,19 @@ async def get_item(product_id: int):
     return {"product_id": product_id, "quantity": qty}
 
 
+class InventoryQuery(BaseModel):
+    product_ids: List[int]
+
+
+@router.post("/items")
+async def get_items(payload: InventoryQuery):
+    """Batch availability; missing products get the same DEFAULT_QTY as /reserve."""
+    return {"items": [
+        {"product_id": pid, "quantity": INVENTORY.get(pid, DEFAULT_QTY)}
+        for pid in dict.fromkeys(payload.product_ids)
+    ]}
+
+
 @router.post("/reserve")
 async def reserve_item(item: InventoryItem):
     # Treat missing product ids as having DEFAULT_QTY for demo purposes.
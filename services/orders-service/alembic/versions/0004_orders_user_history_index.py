@@ -0,0 +1,27 @@
+"""covering index for per-user order history
+
+Revision ID: 0004_orders_user_history_index
+Revises: 0003_unique_idempotency
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+
+revision = '0004_orders_user_history_index'
+down_revision = '0003_unique_idempotency'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Key (user_id, created_at, id) matches the keyset order of GET /api/orders/user/{id};
+    # INCLUDE carries the listed columns so history pages are index-only scans.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_user_history "
+            "ON orders (user_id, created_at, id) INCLUDE (status, amount, currency)"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_orders_user_history")
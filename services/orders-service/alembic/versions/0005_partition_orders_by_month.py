@@ -0,0 +1,124 @@
+"""range-partition orders by month on created_at
+
+Revision ID: 0005_partition_orders_by_month
+Revises: 0004_orders_user_history_index
+Create Date: 2026-10-19 00:00:01.000000
+"""
+from alembic import op
+
+revision = '0005_partition_orders_by_month'
+down_revision = '0004_orders_user_history_index'
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, user_id, status, amount, currency, idempotency_key, created_at"
+
+# Monthly partitions orders_pYYYYMM from the oldest order up to 3 months ahead;
+# app/partitions.py keeps creating them from there on.
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    m date;
+    -- months are computed on UTC wall-clock timestamps (timestamp without time
+    -- zone), so the session TimeZone cannot shift the bounds; they must match
+    -- the UTC-midnight bounds app/partitions.py uses or CREATE fails as overlapping
+    first_month date := date_trunc('month', (coalesce((SELECT min(created_at) FROM orders_legacy), now()) AT TIME ZONE 'UTC'))::date;
+    last_month date := (date_trunc('month', (now() AT TIME ZONE 'UTC')) + interval '3 months')::date;
+BEGIN
+    FOR m IN SELECT generate_series(first_month::timestamp, last_month::timestamp, interval '1 month')::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L)',
+            'orders_p' || to_char(m, 'YYYYMM'),
+            m::text || ' 00:00:00+00',
+            (m + interval '1 month')::date::text || ' 00:00:00+00'
+        );
+    END LOOP;
+END $$;
+"""
+
+
+def upgrade():
+    # A unique index on a partitioned table must include the partition key, so
+    # idempotency keys move to their own table; checkout claims the key there.
+    op.execute(
+        """
+        CREATE TABLE order_idempotency_keys (
+            idempotency_key varchar(128) PRIMARY KEY,
+            created_at timestamptz NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO order_idempotency_keys (idempotency_key, created_at)
+        SELECT idempotency_key, min(created_at) FROM orders
+        WHERE idempotency_key IS NOT NULL
+        GROUP BY idempotency_key
+        """
+    )
+
+    # Swap in the partitioned table; the id sequence is kept, so ids continue.
+    op.execute("ALTER TABLE orders RENAME TO orders_legacy")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    op.execute(
+        """
+        CREATE TABLE orders (
+            id integer NOT NULL DEFAULT nextval('orders_id_seq'),
+            user_id integer NOT NULL,
+            status varchar(255) NOT NULL,
+            amount double precision,
+            currency varchar(10),
+            idempotency_key varchar(128),
+            created_at timestamptz NOT NULL DEFAULT now()
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute(CREATE_PARTITIONS)
+    op.execute(f"INSERT INTO orders ({COLUMNS}) SELECT {COLUMNS} FROM orders_legacy")
+    op.execute("DROP TABLE orders_legacy")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+
+    # Indexes on the parent are created on every partition, present and future.
+    op.execute("ALTER TABLE orders ADD CONSTRAINT orders_pkey PRIMARY KEY (id, created_at)")
+    op.execute(
+        "CREATE INDEX ix_orders_user_history ON orders (user_id, created_at, id) "
+        "INCLUDE (status, amount, currency)"
+    )
+    op.execute("CREATE INDEX ix_orders_idempotency_key ON orders (idempotency_key)")
+
+    # Target of ORDERS_ARCHIVE_MODE=move; detached partitions also land in this schema.
+    op.execute("CREATE SCHEMA IF NOT EXISTS archive")
+    op.execute("CREATE TABLE archive.orders (LIKE orders)")
+    op.execute("CREATE INDEX ix_archive_orders_user_created ON archive.orders (user_id, created_at)")
+
+
+def downgrade():
+    # Archived rows are not brought back; copy them into orders first if needed.
+    op.execute("DROP TABLE IF EXISTS archive.orders")
+    op.execute("ALTER TABLE orders RENAME TO orders_partitioned")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE orders_partitioned RENAME CONSTRAINT orders_pkey TO orders_partitioned_pkey")
+    op.execute("ALTER INDEX ix_orders_user_history RENAME TO ix_orders_user_history_partitioned")
+    op.execute(
+        """
+        CREATE TABLE orders (
+            id integer PRIMARY KEY DEFAULT nextval('orders_id_seq'),
+            user_id integer NOT NULL,
+            status varchar(255) NOT NULL,
+            amount double precision,
+            currency varchar(10),
+            idempotency_key varchar(128),
+            created_at timestamptz NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute(f"INSERT INTO orders ({COLUMNS}) SELECT {COLUMNS} FROM orders_partitioned")
+    op.execute("DROP TABLE orders_partitioned")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+    op.execute(
+        "CREATE INDEX ix_orders_user_history ON orders (user_id, created_at, id) "
+        "INCLUDE (status, amount, currency)"
+    )
+    op.execute("CREATE UNIQUE INDEX ux_orders_idempotency_key ON orders (idempotency_key)")
+    op.execute("DROP TABLE order_idempotency_keys")
@@ -0,0 +1,78 @@
+"""order read model: order_summaries + user_order_stats
+
+Revision ID: 0006_order_read_model
+Revises: 0005_partition_orders_by_month
+Create Date: 2026-10-19 00:00:02.000000
+"""
+from alembic import op
+
+revision = '0006_order_read_model'
+down_revision = '0005_partition_orders_by_month'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Same tables as shared/order_read_model.py. The monolith creates them with
+    # create_all on a shared database, hence IF NOT EXISTS.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS order_summaries (
+            source varchar(16) NOT NULL,
+            order_id bigint NOT NULL,
+            user_id integer NOT NULL,
+            status varchar(50) NOT NULL,
+            amount numeric(12, 2) NOT NULL DEFAULT 0,
+            currency varchar(10),
+            items_count integer NOT NULL DEFAULT 0,
+            created_at timestamptz NOT NULL,
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT pk_order_summaries PRIMARY KEY (source, order_id)
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_order_summaries_user_created "
+        "ON order_summaries (user_id, created_at, order_id)"
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_order_stats (
+            user_id integer PRIMARY KEY,
+            order_count integer NOT NULL DEFAULT 0,
+            lifetime_spend numeric(14, 2) NOT NULL DEFAULT 0,
+            last_order_source varchar(16),
+            last_order_id bigint,
+            last_order_at timestamptz,
+            last_order_status varchar(50),
+            updated_at timestamptz NOT NULL DEFAULT now()
+        )
+        """
+    )
+    # Existing orders; run scripts/rebuild_order_read_model.py --source shop for the monolith's.
+    op.execute(
+        """
+        INSERT INTO order_summaries (source, order_id, user_id, status, amount, currency, items_count, created_at)
+        SELECT 'orders', id, user_id, status, coalesce(amount, 0), currency, 0, created_at FROM orders
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO user_order_stats (user_id, order_count, lifetime_spend,
+                                      last_order_source, last_order_id, last_order_at, last_order_status)
+        SELECT DISTINCT ON (user_id) user_id,
+               count(*) OVER w,
+               sum(CASE WHEN status IN ('paid', 'shipped', 'delivered') THEN amount ELSE 0 END) OVER w,
+               source, order_id, created_at, status
+        FROM order_summaries
+        WINDOW w AS (PARTITION BY user_id)
+        ORDER BY user_id, created_at DESC, order_id DESC
+        ON CONFLICT (user_id) DO NOTHING
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS user_order_stats")
+    op.execute("DROP TABLE IF EXISTS order_summaries")
@@ -0,0 +1,50 @@
+"""NOTIFY order_status on order creation and status change
+
+Revision ID: 0007_order_status_notify
+Revises: 0006_order_read_model
+Create Date: 2026-10-19 00:00:03.000000
+"""
+from alembic import op
+
+revision = '0007_order_status_notify'
+down_revision = '0006_order_read_model'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # app/status_feed.py holds one LISTEN connection and fans the payloads out
+    # to per-user SSE streams. NOTIFY is delivered on commit, so rolled-back
+    # transitions are never pushed. The payload carries only what the profile
+    # page needs to update a row: no amounts leave the database this way.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION orders_notify_status() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify(
+                'order_status',
+                json_build_object(
+                    'order_id', NEW.id,
+                    'user_id', NEW.user_id,
+                    'status', NEW.status,
+                    'created_at', NEW.created_at
+                )::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    # A row trigger on the partitioned parent is cloned onto every partition, future ones included.
+    op.execute(
+        "CREATE TRIGGER orders_notify_status AFTER INSERT OR UPDATE OF status ON orders "
+        "FOR EACH ROW EXECUTE FUNCTION orders_notify_status()"
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS orders_notify_status ON orders")
+    op.execute("DROP FUNCTION IF EXISTS orders_notify_status()")
@@ -0,0 +1,31 @@
+"""order_lines: persist checkout line items
+
+Revision ID: 0008_order_lines
+Revises: 0007_order_status_notify
+Create Date: 2026-10-19 00:00:04.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008_order_lines'
+down_revision = '0007_order_status_notify'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # No FK: the partitioned orders table is keyed by (id, created_at).
+    op.create_table(
+        'order_lines',
+        sa.Column('id', sa.BigInteger(), primary_key=True),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.CheckConstraint('quantity > 0', name='ck_order_lines_quantity_pos'),
+    )
+    op.create_index('ix_order_lines_order', 'order_lines', ['order_id'])
+
+
+def downgrade():
+    op.drop_index('ix_order_lines_order', table_name='order_lines')
+    op.drop_table('order_lines')
@@ -1,7 +1,10 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import router as orders_router
+from .partitions import partition_maintenance_loop
+from .routers import router as orders_router, status_feed
 
 app = FastAPI(title="orders-service")
 
@@ -11,6 +14,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(orders_router)
@@ -21,6 +25,20 @@ async def health():
     return {"status": "ok"}
 
 
+@app.on_event("startup")
+async def on_startup():
+    # партиции наперёд и архивация старых месяцев (app/partitions.py)
+    app.state.partition_task = asyncio.create_task(partition_maintenance_loop())
+    # LISTEN order_status -> SSE /api/orders/user/{id}/events
+    status_feed.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.partition_task.cancel()
+    await status_feed.stop()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8004, reload=True)
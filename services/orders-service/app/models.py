@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import BigInteger, Column, Integer, String, Float, DateTime, Index
 from sqlalchemy.sql import func
 from shared.database import Base
 
 
+# orders разбита по месяцам created_at (миграция 0005, app/partitions.py):
+# created_at входит в первичный ключ, а UPDATE по (id, created_at) трогает одну партицию.
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True)
@@ -11,4 +13,31 @@ class Order(Base):
     amount = Column(Float, nullable=True)
     currency = Column(String(10), nullable=True)
     idempotency_key = Column(String(128), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, primary_key=True)
+
+    __table_args__ = (
+        # история пользователя: keyset по (created_at, id), index-only (миграция 0004)
+        Index(
+            "ix_orders_user_history", "user_id", "created_at", "id",
+            postgresql_include=["status", "amount", "currency"],
+        ),
+    )
+
+
+# Уникальность ключа идемпотентности: на секционированной orders уникальный
+# индекс обязан включать created_at, поэтому ключ «захватывается» здесь.
+class OrderIdempotencyKey(Base):
+    __tablename__ = "order_idempotency_keys"
+    idempotency_key = Column(String(128), primary_key=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# Позиции заказа из checkout (миграция 0008); без FK — у orders ключ (id, created_at).
+class OrderLine(Base):
+    __tablename__ = "order_lines"
+    id = Column(BigInteger, primary_key=True)
+    order_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_order_lines_order", "order_id"),)
@@ -0,0 +1,181 @@
+"""Месячные партиции `orders` (RANGE по created_at, миграция 0005) и архивация.
+
+Партиция месяца — `orders_pYYYYMM`. Фоновая задача раз в
+PARTITION_JOB_INTERVAL:
+
+* создаёт партиции на PARTITIONS_AHEAD месяцев вперёд — вставке всегда есть
+  куда лечь (DEFAULT-партиции нет: с ней нельзя DETACH ... CONCURRENTLY);
+* уводит партиции старше ORDERS_HOT_MONTHS из `orders`, так что запросы по
+  свежим заказам затрагивают одну-две партиции:
+  - `detach` (по умолчанию) — DETACH PARTITION CONCURRENTLY и перенос таблицы
+    в схему `archive` как есть, без перезаписи строк;
+  - `move` — строки переносятся в `archive.orders` пачками по
+    ARCHIVE_BATCH_SIZE (каждая пачка — своя транзакция), пустая партиция
+    отсоединяется и удаляется.
+
+На несколько реплик работает одна: задача берёт advisory-lock.
+Ключи идемпотентности остаются в `order_idempotency_keys` — повтор старого
+ключа не создаст заказ заново.
+"""
+import asyncio
+import os
+import re
+import traceback
+from datetime import date, datetime, timezone
+from typing import Optional
+
+import asyncpg
+
+from shared.database import DATABASE_URL
+
+PARTITIONS_AHEAD = int(os.getenv("ORDERS_PARTITIONS_AHEAD", "3"))
+HOT_MONTHS = int(os.getenv("ORDERS_HOT_MONTHS", "24"))
+ARCHIVE_MODE = os.getenv("ORDERS_ARCHIVE_MODE", "detach")
+ARCHIVE_BATCH_SIZE = int(os.getenv("ORDERS_ARCHIVE_BATCH", "5000"))
+PARTITION_JOB_INTERVAL = float(os.getenv("ORDERS_PARTITION_INTERVAL", str(6 * 3600)))
+ARCHIVE_SCHEMA = "archive"
+# произвольная константа для pg_try_advisory_lock
+LOCK_KEY = 0x0D5E_2045
+
+_NAME_RE = re.compile(r"^orders_p(\d{4})(\d{2})$")
+
+if ARCHIVE_MODE not in ("detach", "move"):
+    raise RuntimeError(f"ORDERS_ARCHIVE_MODE must be detach or move, got {ARCHIVE_MODE!r}")
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, months: int) -> date:
+    n = d.year * 12 + d.month - 1 + months
+    return date(n // 12, n % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"orders_p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    m = _NAME_RE.match(name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def create_partition_sql(month: date) -> str:
+    # границы — полночь UTC: партиции не зависят от TimeZone сессии
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF orders "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+        f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+def partitions_to_create(today: date, ahead: int = PARTITIONS_AHEAD) -> list:
+    first = month_start(today)
+    return [add_months(first, i) for i in range(ahead + 1)]
+
+
+def partitions_to_archive(names, today: date, hot_months: int = HOT_MONTHS) -> list:
+    """Имена партиций, целиком лежащих раньше границы горячих данных (старые первыми)."""
+    cutoff = add_months(month_start(today), -hot_months)
+    old = [(month, name) for name in names if (month := partition_month(name)) and month < cutoff]
+    return [name for _, name in sorted(old)]
+
+
+async def list_partitions(conn) -> list:
+    """(имя, detach_pending) для партиций orders.
+
+    detach_pending — прерванный DETACH ... CONCURRENTLY: партиция остаётся в
+    pg_inherits, и повторный CONCURRENTLY на ней падает; завершается FINALIZE.
+    """
+    rows = await conn.fetch(
+        """
+        SELECT c.relname, i.inhdetachpending
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'orders'::regclass
+        """
+    )
+    return [(r["relname"], r["inhdetachpending"]) for r in rows]
+
+
+async def ensure_partitions(conn, today: Optional[date] = None):
+    for month in partitions_to_create(today or datetime.now(timezone.utc).date()):
+        await conn.execute(create_partition_sql(month))
+
+
+def detach_sql(name: str, pending: bool = False) -> str:
+    # CONCURRENTLY не держит ACCESS EXCLUSIVE на orders; вне транзакции (asyncpg — autocommit)
+    return f"ALTER TABLE orders DETACH PARTITION {name} {'FINALIZE' if pending else 'CONCURRENTLY'}"
+
+
+async def detach_partition(conn, name: str, pending: bool = False):
+    await conn.execute(detach_sql(name, pending))
+    await conn.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+
+
+async def move_partition(conn, name: str, pending: bool = False, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    moved = 0
+    while True:
+        n = await conn.fetchval(
+            f"""
+            WITH batch AS (
+                DELETE FROM {name}
+                WHERE ctid = ANY (ARRAY(SELECT ctid FROM {name} LIMIT $1))
+                RETURNING *
+            ), ins AS (
+                INSERT INTO {ARCHIVE_SCHEMA}.orders SELECT * FROM batch RETURNING 1
+            )
+            SELECT count(*) FROM ins
+            """,
+            batch_size,
+        )
+        moved += n
+        if n < batch_size:
+            break
+    await conn.execute(detach_sql(name, pending))
+    await conn.execute(f"DROP TABLE {name}")
+    return moved
+
+
+async def archive_partitions(conn, today: Optional[date] = None) -> list:
+    today = today or datetime.now(timezone.utc).date()
+    partitions = await list_partitions(conn)
+    # недоотсоединённые — первыми и независимо от возраста: иначе каждый проход
+    # падал бы на них и архивация останавливалась навсегда
+    pending = sorted(name for name, is_pending in partitions if is_pending)
+    cold = partitions_to_archive([name for name, is_pending in partitions if not is_pending], today)
+    done = []
+    for name in pending + cold:
+        if ARCHIVE_MODE == "detach":
+            await detach_partition(conn, name, pending=name in pending)
+        else:
+            await move_partition(conn, name, pending=name in pending)
+        done.append(name)
+    return done
+
+
+async def run_partition_maintenance(dsn: str = DATABASE_URL) -> Optional[list]:
+    """Один проход; None — проход уже идёт на другой реплике."""
+    conn = await asyncpg.connect(dsn.replace("+asyncpg", ""))
+    try:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", LOCK_KEY):
+            return None
+        try:
+            await ensure_partitions(conn)
+            return await archive_partitions(conn)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", LOCK_KEY)
+    finally:
+        await conn.close()
+
+
+async def partition_maintenance_loop():
+    while True:
+        try:
+            archived = await run_partition_maintenance()
+            if archived:
+                print(f"orders-service: archived partitions {archived} ({ARCHIVE_MODE})")
+        except Exception:
+            traceback.print_exc()
+        await asyncio.sleep(PARTITION_JOB_INTERVAL)
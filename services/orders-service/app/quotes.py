@@ -0,0 +1,90 @@
+"""Котировка checkout: цены, наличие и итог корзины, подписанные на короткий срок.
+
+POST /api/orders/quote берёт цены из products-service (/api/products/batch) и
+остатки из inventory-service (/api/inventory/items) — по одному пакетному
+вызову на сервис, оба одновременно под общим дедлайном QUOTE_DEADLINE_SECONDS.
+
+Если все позиции есть в наличии, ответ содержит `quote` — токен
+`<claims>.<подпись>`: base64url JSON (user_id, позиции, итог, валюта, exp) и
+HMAC-SHA256 на QUOTE_SECRET (по умолчанию JWT_SECRET). checkout с действующим
+токеном не перепроверяет цены: итог берётся из подписанных claims. Токен
+чужого пользователя, другой корзины или с истёкшим exp отклоняется.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from decimal import Decimal
+from typing import Optional
+
+QUOTE_SECRET = os.getenv("QUOTE_SECRET") or os.getenv("JWT_SECRET", "supersecretkey")
+QUOTE_TTL_SECONDS = int(os.getenv("QUOTE_TTL_SECONDS", "300"))
+QUOTE_DEADLINE_SECONDS = float(os.getenv("QUOTE_DEADLINE_SECONDS", "2.0"))
+
+CENT = Decimal("0.01")
+
+
+class QuoteError(ValueError):
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(body: bytes) -> str:
+    return _b64encode(hmac.new(QUOTE_SECRET.encode(), body, hashlib.sha256).digest())
+
+
+def item_key(items) -> list:
+    """Позиции в каноническом виде [[product_id, quantity], ...]: повторы сложены, порядок по id."""
+    quantities: dict[int, int] = {}
+    for it in items:
+        quantities[it.product_id] = quantities.get(it.product_id, 0) + it.quantity
+    return [[pid, qty] for pid, qty in sorted(quantities.items())]
+
+
+def price_lines(key: list, prices: dict, stock: dict):
+    """Строки котировки, итог и флаг «всё в наличии» по ценам и остаткам из сервисов."""
+    lines, total, available = [], Decimal("0"), True
+    for pid, qty in key:
+        price = prices.get(pid)
+        ok = price is not None and qty > 0 and stock.get(pid, 0) >= qty
+        line_total = (price * qty).quantize(CENT) if price is not None else None
+        if line_total is not None:
+            total += line_total
+        available = available and ok
+        lines.append({
+            "product_id": pid, "quantity": qty, "unit_price": price,
+            "line_total": line_total, "available": ok,
+        })
+    return lines, total.quantize(CENT), available
+
+
+def sign_quote(user_id: int, key: list, total: Decimal, currency: str,
+               now: Optional[float] = None) -> tuple[str, int]:
+    exp = int(now if now is not None else time.time()) + QUOTE_TTL_SECONDS
+    claims = {"user_id": user_id, "items": key, "total": str(total), "currency": currency, "exp": exp}
+    body = json.dumps(claims, sort_keys=True, separators=(",", ":")).encode()
+    return f"{_b64encode(body)}.{_signature(body)}", exp
+
+
+def verify_quote(token: str, now: Optional[float] = None) -> dict:
+    try:
+        encoded, signature = token.split(".")
+        body = _b64decode(encoded)
+    except ValueError:
+        raise QuoteError("malformed quote")
+    # байты: compare_digest на str с не-ASCII бросает TypeError
+    if not hmac.compare_digest(signature.encode(), _signature(body).encode()):
+        raise QuoteError("invalid quote signature")
+    claims = json.loads(body)
+    if claims["exp"] <= (now if now is not None else time.time()):
+        raise QuoteError("quote expired")
+    return claims
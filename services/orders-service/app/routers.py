@@ -1,20 +1,32 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from pydantic import BaseModel
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from datetime import datetime, timezone
+from decimal import Decimal
 import httpx
 import os
 import asyncio
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text
+from sqlalchemy import JSON, Integer, cast, exists, func, insert, literal, select, text, tuple_, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 
+from shared.auth_utils import decode_access_token
+from shared.cursors import decode_cursor, encode_cursor
 from shared.database import get_session, async_session_maker
-from .models import Order
+from shared.order_read_model import SOURCE_ORDERS, order_created_stmt, stats_out, status_changed_stmt, user_stats_stmt
+from shared.streaming_export import EXPORT_FORMATS, export_response, iter_export
+from .models import Order, OrderIdempotencyKey, OrderLine
+from .partitions import ARCHIVE_SCHEMA
+from .quotes import QUOTE_DEADLINE_SECONDS, QuoteError, item_key, price_lines, sign_quote, verify_quote
+from .status_feed import StatusFeed, event_stream
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
+# one LISTEN connection per process, shared by all SSE clients (started in main)
+status_feed = StatusFeed()
+
 
 class OrderItem(BaseModel):
     product_id: int
@@ -28,6 +40,8 @@ class CheckoutPayload(BaseModel):
     currency: str = "USD"
     payment_method: str
     idempotency_key: str | None = None
+    # signed token from POST /api/orders/quote; amount must equal its total
+    quote: str | None = None
 
 
 class OrderOut(BaseModel):
@@ -39,6 +53,30 @@ class OrderOut(BaseModel):
     created_at: datetime
 
 
+class QuotePayload(BaseModel):
+    user_id: int
+    items: list[OrderItem]
+    currency: str = "USD"
+
+
+class QuoteLine(BaseModel):
+    product_id: int
+    quantity: int
+    unit_price: Decimal | None
+    line_total: Decimal | None
+    available: bool
+
+
+class QuoteOut(BaseModel):
+    items: list[QuoteLine]
+    total: Decimal
+    currency: str
+    available: bool
+    # present only when every line is available
+    quote: str | None = None
+    expires_at: datetime | None = None
+
+
 class OrderSummary(BaseModel):
     id: int
     status: str
@@ -47,11 +85,24 @@ class OrderSummary(BaseModel):
     created_at: datetime
 
 
+PRODUCTS_URL = os.getenv("PRODUCTS_URL", "http://products-service:8002")
 PAYMENTS_URL = os.getenv("PAYMENTS_URL", "http://payments-service:8005")
 INVENTORY_URL = os.getenv("INVENTORY_URL", "http://inventory-service:8008")
 NOTIFICATIONS_URL = os.getenv("NOTIFICATIONS_URL", "http://notifications-service:8007")
 
 
+async def set_order_status(session: AsyncSession, order: Order, new_status: str):
+    """Persist a status transition together with its read-model update."""
+    await session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.created_at == order.created_at)
+        .values(status=new_status)
+    )
+    await session.execute(status_changed_stmt(SOURCE_ORDERS, order.id, new_status))
+    await session.commit()
+    order.status = new_status
+
+
 @router.post("/checkout", response_model=OrderOut)
 async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get_session)):
     # Idempotency: if client provided idempotency_key and an order exists, return it
@@ -68,6 +119,21 @@ async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get
                 created_at=existing.created_at if hasattr(existing, 'created_at') else datetime.utcnow(),
             )
 
+    # A valid quote already priced the cart: check it belongs to this checkout
+    # instead of pricing the items again.
+    if payload.quote:
+        try:
+            claims = verify_quote(payload.quote)
+        except QuoteError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        if (
+            claims["user_id"] != payload.user_id
+            or claims["items"] != item_key(payload.items)
+            or claims["currency"] != payload.currency
+            or Decimal(claims["total"]) != Decimal(str(payload.amount)).quantize(Decimal("0.01"))
+        ):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="quote does not match this checkout")
+
     # Create order record with status 'pending' using atomic INSERT ... ON CONFLICT DO NOTHING
     insert_values = {
         "user_id": payload.user_id,
@@ -81,8 +147,8 @@ async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get
     # (they don't go through auth-service), so create a placeholder user record if missing.
     try:
         q_user = await session.execute(text("SELECT 1 FROM users WHERE id = :id"), {"id": payload.user_id})
-        exists = q_user.scalar_one_or_none()
-        if not exists:
+        user_exists = q_user.scalar_one_or_none()
+        if not user_exists:
             # Insert a minimal placeholder user; use ON CONFLICT DO NOTHING to be safe
             await session.execute(
                 text(
@@ -94,12 +160,27 @@ async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get
         # If anything goes wrong checking/creating the user, continue and let the order insert report an error
         pass
 
-    stmt = (
-        pg_insert(Order.__table__)
-        .values(**insert_values)
-        .returning(Order.id, Order.created_at)
-        .on_conflict_do_nothing(index_elements=["idempotency_key"])
-    )
+    stmt = pg_insert(Order.__table__).values(**insert_values).returning(Order.id, Order.created_at)
+    if payload.idempotency_key:
+        # Claim the key and insert the order in one statement; a concurrent request
+        # with the same key waits on the claim and then inserts nothing.
+        claim = (
+            pg_insert(OrderIdempotencyKey)
+            .values(idempotency_key=payload.idempotency_key)
+            .on_conflict_do_nothing()
+            .returning(OrderIdempotencyKey.idempotency_key)
+            .cte("claim")
+        )
+        stmt = (
+            pg_insert(Order.__table__)
+            .from_select(
+                list(insert_values),
+                select(*[cast(literal(v), Order.__table__.c[k].type) for k, v in insert_values.items()])
+                .where(exists(select(claim.c.idempotency_key))),
+            )
+            .returning(Order.id, Order.created_at)
+            .add_cte(claim)
+        )
 
     result = await session.execute(stmt)
     row = result.fetchone()
@@ -120,9 +201,44 @@ async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get
                     currency=existing.currency if existing.currency is not None else payload.currency,
                     created_at=existing.created_at if hasattr(existing, 'created_at') else datetime.utcnow(),
                 )
+            # The key stays claimed after its order was archived: ORDERS_ARCHIVE_MODE=move
+            # keeps the rows in archive.orders; detached partitions are not searched.
+            archived = (await session.execute(
+                text(
+                    f"SELECT id, user_id, status, amount, currency, created_at FROM {ARCHIVE_SCHEMA}.orders "
+                    "WHERE idempotency_key = :key LIMIT 1"
+                ),
+                {"key": payload.idempotency_key},
+            )).one_or_none()
+            if archived is not None:
+                return OrderOut(
+                    order_id=archived.id,
+                    user_id=archived.user_id,
+                    status=archived.status,
+                    amount=archived.amount if archived.amount is not None else payload.amount,
+                    currency=archived.currency if archived.currency is not None else payload.currency,
+                    created_at=archived.created_at,
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Idempotency key was already used by an order that has been archived",
+            )
         # if not found, raise a generic error
         raise HTTPException(status_code=500, detail="Failed to create or find idempotent order")
 
+    # Line items (one multi-row INSERT), read back by the batch lookup
+    if payload.items:
+        await session.execute(insert(OrderLine).values([
+            {"order_id": order_id, "product_id": it.product_id, "quantity": it.quantity}
+            for it in payload.items
+        ]))
+
+    # Read model: order summary + per-user aggregates, in the same transaction
+    await session.execute(order_created_stmt(
+        SOURCE_ORDERS, order_id, payload.user_id, "pending",
+        payload.amount, payload.currency, len(payload.items), created_at,
+    ))
+
     # Commit the insert so the idempotency key is visible to other transactions,
     # then load the ORM object for subsequent updates
     await session.commit()
@@ -163,17 +279,14 @@ async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get
         try:
             res = await post_with_retry(f"{INVENTORY_URL}/api/inventory/reserve", {"product_id": item.product_id, "quantity": item.quantity}, max_retries=2)
         except HTTPException as e:
-            order.status = "failed"
-            await session.commit()
+            await set_order_status(session, order, "failed")
             raise e
         if res.status_code != 200:
-            order.status = "failed"
-            await session.commit()
+            await set_order_status(session, order, "failed")
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inventory reservation failed")
         body = res.json()
         if not body.get("reserved"):
-            order.status = "failed"
-            await session.commit()
+            await set_order_status(session, order, "failed")
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inventory reservation failed")
 
     # Call payments-service synchronously
@@ -195,8 +308,7 @@ async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get
                 await post_with_retry(f"{INVENTORY_URL}/api/inventory/release", {"product_id": it.product_id, "quantity": it.quantity}, max_retries=2)
             except Exception:
                 pass
-        order.status = "failed"
-        await session.commit()
+        await set_order_status(session, order, "failed")
         raise e
 
     # If payment returned but with non-200 status, release and fail (no double-catch)
@@ -206,15 +318,13 @@ async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get
                 await post_with_retry(f"{INVENTORY_URL}/api/inventory/release", {"product_id": it.product_id, "quantity": it.quantity}, max_retries=2)
             except Exception:
                 pass
-        order.status = "failed"
-        await session.commit()
+        await set_order_status(session, order, "failed")
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Payment failed or payment service error")
 
     data = resp.json()
 
     # Payment succeeded: mark order paid
-    order.status = "paid"
-    await session.commit()
+    await set_order_status(session, order, "paid")
 
     # Send notification (best-effort)
     try:
@@ -234,6 +344,110 @@ async def checkout(payload: CheckoutPayload, session: AsyncSession = Depends(get
     )
 
 
+async def fetch_prices_and_stock(product_ids: list[int]) -> tuple[dict, dict]:
+    """One batch call to products-service and one to inventory-service, run concurrently."""
+    async with httpx.AsyncClient(timeout=QUOTE_DEADLINE_SECONDS) as client:
+        products_resp, stock_resp = await asyncio.gather(
+            client.post(f"{PRODUCTS_URL}/api/products/batch", json={"ids": product_ids}),
+            client.post(f"{INVENTORY_URL}/api/inventory/items", json={"product_ids": product_ids}),
+        )
+    if products_resp.status_code != 200 or stock_resp.status_code != 200:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Upstream service error")
+    prices = {p["id"]: Decimal(str(p["price"])) for p in products_resp.json()}
+    stock = {i["product_id"]: i["quantity"] for i in stock_resp.json()["items"]}
+    return prices, stock
+
+
+@router.post("/quote", response_model=QuoteOut)
+async def create_quote(payload: QuotePayload):
+    """Price and availability for the whole cart, signed for QUOTE_TTL_SECONDS when it can be ordered."""
+    key = item_key(payload.items)
+    if not key:
+        raise HTTPException(status_code=400, detail="no items")
+    try:
+        prices, stock = await asyncio.wait_for(
+            fetch_prices_and_stock([pid for pid, _ in key]), QUOTE_DEADLINE_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Quote deadline exceeded")
+    except httpx.RequestError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Upstream service unavailable")
+
+    lines, total, available = price_lines(key, prices, stock)
+    out = QuoteOut(items=lines, total=total, currency=payload.currency, available=available)
+    if available:
+        token, exp = sign_quote(payload.user_id, key, total, payload.currency)
+        out.quote, out.expires_at = token, datetime.fromtimestamp(exp, tz=timezone.utc)
+    return out
+
+
+LOOKUP_MAX_IDS = 5000
+
+
+class OrderLookup(BaseModel):
+    ids: list[int] = Field(..., max_length=LOOKUP_MAX_IDS)
+    include_items: bool = False
+
+
+def order_lookup_stmt(ids: list, include_items: bool = False):
+    """All requested orders in one `id = ANY(:ids)` query; items aggregated per order."""
+    columns = [Order.id, Order.user_id, Order.status, Order.amount, Order.currency, Order.created_at]
+    if include_items:
+        items = (
+            select(func.json_agg(
+                func.json_build_object("product_id", OrderLine.product_id, "quantity", OrderLine.quantity)
+            ))
+            .where(OrderLine.order_id == Order.id)
+            .scalar_subquery()
+        )
+        columns.append(func.coalesce(items, text("'[]'::json"), type_=JSON).label("items"))
+    return select(*columns).where(Order.id == func.any(cast(sorted(set(ids)), ARRAY(Integer)))).order_by(Order.id)
+
+
+def parse_ids(values: list[str]) -> list[int]:
+    try:
+        ids = [int(v) for value in values for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be integers")
+    if len(ids) > LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"at most {LOOKUP_MAX_IDS} ids per request")
+    return ids
+
+
+@router.get("")
+async def lookup_orders(ids: list[str] = Query(...), include_items: bool = False):
+    """Batch lookup: `?ids=1,2,3` (or repeated `ids=`), streamed as NDJSON; unknown ids are skipped."""
+    return StreamingResponse(
+        iter_export(order_lookup_stmt(parse_ids(ids), include_items), "ndjson"),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/lookup")
+async def lookup_orders_post(payload: OrderLookup):
+    """Same as GET /api/orders?ids= for id lists too long for a URL."""
+    return StreamingResponse(
+        iter_export(order_lookup_stmt(payload.ids, payload.include_items), "ndjson"),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/export")
+async def export_orders(format: str = "ndjson", user_id: Optional[int] = None, since: Optional[datetime] = None):
+    """Stream order history as NDJSON or CSV (optionally for one user / since a date)."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {EXPORT_FORMATS}")
+    stmt = select(
+        Order.id, Order.user_id, Order.status, Order.amount, Order.currency,
+        Order.idempotency_key, Order.created_at,
+    ).order_by(Order.id)
+    if user_id is not None:
+        stmt = stmt.where(Order.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(Order.created_at >= since)
+    return export_response(stmt, format, "orders")
+
+
 @router.get("/{order_id}")
 async def get_order(order_id: int, session: AsyncSession = Depends(get_session)):
     result = await session.execute(select(Order).where(Order.id == order_id))
@@ -243,18 +457,85 @@ async def get_order(order_id: int, session: AsyncSession = Depends(get_session))
     return {"order_id": order.id, "status": order.status}
 
 
+USER_ORDERS_PAGE = 50
+USER_ORDERS_PAGE_MAX = 200
+
+
+async def stream_owner(user_id: int, request: Request, token: Optional[str]) -> None:
+    """Allow the event stream only to the user the access token belongs to.
+
+    EventSource cannot send an Authorization header, so the token comes in the
+    `token` query parameter, or in the `vf_token` cookie on same-origin pages.
+    """
+    token = token or request.cookies.get("vf_token")
+    claims = decode_access_token(token) if token else None
+    email = claims.get("sub") if claims else None
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    # a short session of its own: a Depends() session would stay checked out for the whole stream
+    async with async_session_maker() as session:
+        owner_id = (await session.execute(
+            text("SELECT id FROM users WHERE email = :email"), {"email": email}
+        )).scalar_one_or_none()
+    if owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Not your orders")
+
+
+@router.get("/user/{user_id}/events")
+async def user_order_events(user_id: int, request: Request, token: Optional[str] = Query(None)):
+    """Server-sent events with the user's order status changes (`status`, `resync`)."""
+    await stream_owner(user_id, request, token)
+    return StreamingResponse(
+        event_stream(status_feed, user_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/user/{user_id}/stats")
+async def user_order_stats(user_id: int, session: AsyncSession = Depends(get_session)):
+    """Lifetime spend, order count and last order from the read model (one PK lookup)."""
+    row = (await session.execute(user_stats_stmt(user_id))).one_or_none()
+    return stats_out(row)
+
+
 @router.get("/user/{user_id}")
-async def list_user_orders(user_id: int, session: AsyncSession = Depends(get_session)):
-    """Return recent orders for a user (simple list)."""
-    q = await session.execute(select(Order).where(Order.user_id == user_id).order_by(Order.created_at.desc()).limit(50))
-    orders = q.scalars().all()
-    out = []
-    for o in orders:
-        out.append({
+async def list_user_orders(
+    user_id: int,
+    response: Response,
+    limit: int = Query(USER_ORDERS_PAGE, ge=1, le=USER_ORDERS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """Return a user's orders, newest first.
+
+    The body stays a plain list; when there are older orders the
+    `X-Next-Cursor` header carries the cursor for `?cursor=`. Only columns of
+    ix_orders_user_history are read, so pages are index-only scans.
+    """
+    stmt = (
+        select(Order.id, Order.status, Order.amount, Order.currency, Order.created_at)
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        try:
+            created_at, order_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        stmt = stmt.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
+    rows = (await session.execute(stmt)).all()
+    page = rows[:limit]
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(page[-1].created_at, page[-1].id)
+    return [
+        {
             "id": o.id,
             "status": o.status,
             "amount": float(o.amount) if o.amount is not None else 0.0,
             "currency": o.currency or 'USD',
             "created_at": o.created_at,
-        })
-    return out
+        }
+        for o in page
+    ]
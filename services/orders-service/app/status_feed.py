@@ -0,0 +1,129 @@
+"""Live order status feed: Postgres LISTEN/NOTIFY -> per-user server-sent events.
+
+The `orders_notify_status` trigger (migration 0007) sends every order creation
+and status change to the `order_status` channel. A single LISTEN connection per
+process receives them and puts each payload on the queues of that user's
+subscribers. Browsers connect with EventSource to
+GET /api/orders/user/{id}/events and get pushes instead of polling.
+
+A subscriber's queue is bounded. A slow client loses its oldest events rather
+than holding memory. After a lost listener connection, clients are sent a
+`resync` event and reload the list, since NOTIFYs sent while the connection
+was down are not replayed.
+"""
+import asyncio
+import json
+from typing import Optional
+
+import asyncpg
+
+from shared.database import DATABASE_URL
+
+CHANNEL = "order_status"
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15.0
+RECONNECT_DELAY = 5.0
+
+
+class StatusFeed:
+    def __init__(self, dsn: str = DATABASE_URL):
+        self._dsn = dsn.replace("+asyncpg", "")
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.listening = False
+
+    # --- subscribers --------------------------------------------------------
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(q) for q in self._subscribers.values())
+
+    def publish(self, user_id: int, event: str, data: dict):
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()  # drop the oldest event, keep the newest
+            queue.put_nowait((event, data))
+
+    def _broadcast(self, event: str, data: dict):
+        for user_id in list(self._subscribers):
+            self.publish(user_id, event, data)
+
+    # --- LISTEN -------------------------------------------------------------
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            data = json.loads(payload)
+            user_id = int(data["user_id"])
+        except (ValueError, KeyError, TypeError):
+            return
+        self.publish(user_id, "status", data)
+
+    async def _listen_loop(self):
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self._dsn)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda c: closed.set())
+                await conn.add_listener(CHANNEL, self._on_notify)
+                self.listening = True
+                if connected_before:
+                    # events may have been missed while disconnected
+                    self._broadcast("resync", {})
+                connected_before = True
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"orders-service: LISTEN {CHANNEL} failed: {e}")
+            finally:
+                self.listening = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def event_stream(feed: StatusFeed, user_id: int, is_disconnected):
+    """Yield SSE frames for one client until it disconnects."""
+    queue = feed.subscribe(user_id)
+    try:
+        # reconnect delay for EventSource, plus a first frame so proxies flush headers
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            yield sse_message(event, data)
+    finally:
+        feed.unsubscribe(user_id, queue)
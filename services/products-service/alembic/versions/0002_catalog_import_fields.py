@@ -0,0 +1,31 @@
+"""add sku/category/image_url/stock to products for catalog import
+
+Revision ID: 0002_catalog_import_fields
+Revises: 0001_create_products
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002_catalog_import_fields'
+down_revision = '0001_create_products'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The monolith (create_all) and scripts/db_seed.py may already have added some
+    # of these columns, so use IF NOT EXISTS instead of op.add_column.
+    op.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS description TEXT")
+    op.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS sku VARCHAR(64)")
+    op.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS category VARCHAR(100)")
+    op.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS image_url VARCHAR(255)")
+    op.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS stock INTEGER NOT NULL DEFAULT 0")
+    # ON CONFLICT (sku) in the import upsert needs a plain (non-partial) unique index
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_products_sku ON products (sku)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ux_products_sku")
+    for column in ('stock', 'image_url', 'category', 'sku', 'description'):
+        op.execute(f"ALTER TABLE products DROP COLUMN IF EXISTS {column}")
@@ -0,0 +1,31 @@
+"""create product_fitments table
+
+Revision ID: 0003_product_fitments
+Revises: 0002_catalog_import_fields
+Create Date: 2026-10-19 00:00:01.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003_product_fitments'
+down_revision = '0002_catalog_import_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_fitments',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('engine', sa.String(length=50), nullable=True),
+        sa.Column('model', sa.String(length=100), nullable=True),
+        sa.Column('year_from', sa.SmallInteger(), nullable=True),
+        sa.Column('year_to', sa.SmallInteger(), nullable=True),
+    )
+    op.create_index('ix_product_fitments_product_id', 'product_fitments', ['product_id'])
+
+
+def downgrade():
+    op.drop_index('ix_product_fitments_product_id', table_name='product_fitments')
+    op.drop_table('product_fitments')
@@ -0,0 +1,62 @@
+"""add products.updated_at and NOTIFY trigger for search index sync
+
+Revision ID: 0004_products_change_notify
+Revises: 0003_product_fitments
+Create Date: 2026-10-19 00:00:02.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004_products_change_notify'
+down_revision = '0003_product_fitments'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()")
+    # search-service polls `updated_at > watermark` when LISTEN is unavailable
+    op.create_index('ix_products_updated_at', 'products', ['updated_at'])
+
+    # Every writer (monolith, products-service, bulk import, db_seed) goes through
+    # these triggers, so the search index sees all changes.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION products_touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := now();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION products_notify_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'products_changed',
+                json_build_object('op', TG_OP, 'id', COALESCE(NEW.id, OLD.id))::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER products_touch_updated_at BEFORE UPDATE ON products "
+        "FOR EACH ROW EXECUTE FUNCTION products_touch_updated_at()"
+    )
+    op.execute(
+        "CREATE TRIGGER products_notify_change AFTER INSERT OR UPDATE OR DELETE ON products "
+        "FOR EACH ROW EXECUTE FUNCTION products_notify_change()"
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS products_notify_change ON products")
+    op.execute("DROP TRIGGER IF EXISTS products_touch_updated_at ON products")
+    op.execute("DROP FUNCTION IF EXISTS products_notify_change()")
+    op.execute("DROP FUNCTION IF EXISTS products_touch_updated_at()")
+    op.drop_index('ix_products_updated_at', table_name='products')
+    op.drop_column('products', 'updated_at')
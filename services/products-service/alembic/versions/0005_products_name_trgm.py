@@ -0,0 +1,33 @@
+"""pg_trgm GIN indexes on product name / sku for fuzzy search
+
+Revision ID: 0005_products_name_trgm
+Revises: 0004_products_change_notify
+Create Date: 2026-10-19 00:00:03.000000
+"""
+from alembic import op
+
+revision = '0005_products_name_trgm'
+down_revision = '0004_products_change_notify'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # search-service (SEARCH_FUZZY_BACKEND=pg_trgm) queries `:q <% lower(name)`;
+    # CONCURRENTLY keeps writes to products going while the index builds
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_name_trgm "
+            "ON products USING gin (lower(name) gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_sku_trgm "
+            "ON products USING gin (lower(sku) gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_products_sku_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_products_name_trgm")
@@ -0,0 +1,39 @@
+"""generated tsvector (russian) on products + GIN index for the postgres search backend
+
+Revision ID: 0006_products_search_tsv
+Revises: 0005_products_name_trgm
+Create Date: 2026-10-19 00:00:04.000000
+"""
+from alembic import op
+
+revision = '0006_products_search_tsv'
+down_revision = '0005_products_name_trgm'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Weights follow search-service FIELD_WEIGHTS: name/sku A, category B, description C.
+    # Adding a STORED column rewrites the table once; the column then stays in sync by itself.
+    op.execute(
+        """
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(sku, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(category, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+        ) STORED
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_search_tsv "
+            "ON products USING gin (search_tsv)"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_products_search_tsv")
+    op.execute("ALTER TABLE products DROP COLUMN IF EXISTS search_tsv")
@@ -0,0 +1,38 @@
+"""product_price_history (shared with the monolith) with bigint price deltas
+
+Revision ID: 0007_product_price_history
+Revises: 0006_products_search_tsv
+Create Date: 2026-10-19 00:00:05.000000
+"""
+from alembic import op
+
+revision = '0007_product_price_history'
+down_revision = '0006_products_search_tsv'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The monolith creates this table with create_all; bulk import appends to it
+    # too, so the service schema has to carry it as well.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS product_price_history (
+            product_id integer PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE,
+            first_at bigint NOT NULL,
+            first_price bigint NOT NULL,
+            last_at bigint NOT NULL,
+            last_price bigint NOT NULL,
+            at_deltas integer[] NOT NULL DEFAULT '{}',
+            price_deltas bigint[] NOT NULL DEFAULT '{}'
+        )
+        """
+    )
+    # Tables created earlier had integer[] price deltas; a price change above
+    # ~21.4M cents overflowed int4.
+    op.execute("ALTER TABLE product_price_history ALTER COLUMN price_deltas TYPE bigint[]")
+
+
+def downgrade():
+    # The table may predate this migration (monolith create_all), so only the type is reverted.
+    op.execute("ALTER TABLE product_price_history ALTER COLUMN price_deltas TYPE integer[]")
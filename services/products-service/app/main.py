@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import router as products_router
+from .routers import router as products_router, media_router, load_fitment_index
 
 app = FastAPI(title="products-service")
 
@@ -14,6 +14,7 @@ app.add_middleware(
 )
 
 app.include_router(products_router)
+app.include_router(media_router)
 
 
 @app.get("/health")
@@ -21,6 +22,18 @@ async def health():
     return {"status": "ok"}
 
 
+@app.on_event("startup")
+async def on_startup():
+    # Индекс применимости строится из БД; если БД ещё не готова — стартуем с пустым,
+    # он пересоберётся после ближайшего импорта каталога.
+    try:
+        await load_fitment_index()
+    except Exception:
+        import traceback
+        print("products-service: failed to build fitment index")
+        traceback.print_exc()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8002, reload=True)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Numeric, Text
+from sqlalchemy import Column, Integer, String, Numeric, Text, DateTime, ForeignKey, SmallInteger
+from sqlalchemy.sql import func
 from shared.database import Base
 
 
@@ -8,3 +9,23 @@ class Product(Base):
     name = Column(String, nullable=False)
     price = Column(Numeric, nullable=False)
     description = Column(Text, nullable=True)
+    # артикул поставщика — ключ для импорта прайс-листов
+    sku = Column(String(64), unique=True, nullable=True)
+    category = Column(String(100), nullable=True)
+    image_url = Column(String(255), nullable=True)
+    stock = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class ProductFitment(Base):
+    """Применимость: к какому двигателю / модели / годам подходит товар.
+
+    NULL в engine/model/годах означает «подходит к любому значению».
+    """
+    __tablename__ = "product_fitments"
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    engine = Column(String(50), nullable=True)
+    model = Column(String(100), nullable=True)
+    year_from = Column(SmallInteger, nullable=True)
+    year_to = Column(SmallInteger, nullable=True)
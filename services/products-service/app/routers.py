@@ -1,11 +1,70 @@
-from fastapi import APIRouter, HTTPException, Depends
+import io
+import json
+import tempfile
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Integer, cast, delete, func, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.database import get_session
-from .models import Product
+from shared.database import get_session, engine, async_session_maker
+from shared.catalog_import import (
+    FORMATS, STAGING_COLUMNS, STAGING_DDL, STAGING_TABLE, UPSERT_SQL, iter_batches,
+)
+from shared.streaming_export import EXPORT_FORMATS, export_response
+from shared.product_images import (
+    FILENAME_RE, MEDIA_ROOT, MEDIA_URL, ImagesUnavailable, build_variants, variant_url, variant_urls,
+)
+from shared.fitment import FitmentIndex
+from .models import Product, ProductFitment
 
 router = APIRouter(prefix="/api/products", tags=["products"])
+media_router = APIRouter(prefix=MEDIA_URL, tags=["media"])
+
+# тело запроса больше этого размера уходит из памяти во временный файл
+IMPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# bitmap-индекс применимости; строится на старте (main.on_startup) и после
+# импорта, точечно обновляется при изменении применимости товара
+fitment_index = FitmentIndex()
+
+
+class FitmentIn(BaseModel):
+    engine: Optional[str] = None
+    model: Optional[str] = None
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+
+
+async def load_fitment_index():
+    global fitment_index
+    index = FitmentIndex()
+    async with async_session_maker() as session:
+        rows_by_product = {}
+        res = await session.stream(
+            select(
+                ProductFitment.product_id, ProductFitment.engine, ProductFitment.model,
+                ProductFitment.year_from, ProductFitment.year_to,
+            ).execution_options(yield_per=5000)
+        )
+        async for r in res:
+            rows_by_product.setdefault(r.product_id, []).append(
+                {"engine": r.engine, "model": r.model, "year_from": r.year_from, "year_to": r.year_to}
+            )
+        res = await session.stream(select(Product.id, Product.category).execution_options(yield_per=5000))
+        products = [(product_id, category) async for product_id, category in res]
+    index.bulk_load(
+        (product_id, category, rows_by_product.get(product_id, ()))
+        for product_id, category in products
+    )
+    fitment_index = index
+    return index
 
 
 @router.get("/", summary="List products")
@@ -13,15 +72,209 @@ async def list_products(limit: int = 200, session: AsyncSession = Depends(get_se
     stmt = select(Product).limit(limit)
     res = await session.execute(stmt)
     products = res.scalars().all()
+    # в сетке каталога нужна только миниатюра
     return [
-        {"id": p.id, "name": p.name, "price": float(p.price), "description": (p.description or "")}
+        {
+            "id": p.id, "name": p.name, "price": float(p.price), "description": (p.description or ""),
+            "image": variant_url(p.image_url, "thumb", "jpg"),
+            "image_webp": variant_url(p.image_url, "thumb", "webp"),
+        }
         for p in products
     ]
 
 
+@router.post("/import", summary="Bulk import supplier catalog (CSV / NDJSON)")
+async def import_products(request: Request, format: str = "csv"):
+    """Импорт прайс-листа поставщика.
+
+    Тело запроса — CSV с заголовком или NDJSON (поля sku, name, price,
+    description, category, image_url, stock). Ответ — NDJSON-поток с прогрессом
+    по каждой пачке и итоговой строкой `{"done": true, ...}`.
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {FORMATS}")
+
+    # Сначала дочитываем тело (большие файлы — на диск), чтобы не держать прайс
+    # в памяти и не читать request параллельно со StreamingResponse.
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MAX_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    async def progress():
+        stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+        batches = iter_batches(stream, format)
+        totals = {"rows": 0, "inserted": 0, "updated": 0, "rejected": 0}
+        try:
+            # одно соединение на весь импорт: temp-таблица живёт в его сессии
+            async with engine.connect() as conn:
+                await conn.execute(text(STAGING_DDL))
+                raw = await conn.get_raw_connection()
+                while True:
+                    # разбор и валидация CPU-bound — не блокируем event loop
+                    batch = await run_in_threadpool(next, batches, None)
+                    if batch is None:
+                        break
+                    inserted = updated = 0
+                    if batch.rows:
+                        await raw.driver_connection.copy_records_to_table(
+                            STAGING_TABLE, records=batch.rows, columns=list(STAGING_COLUMNS)
+                        )
+                        res = await conn.execute(text(UPSERT_SQL))
+                        inserted, updated = res.one()
+                    await conn.commit()
+
+                    totals["rows"] += len(batch.rows) + batch.rejected
+                    totals["inserted"] += inserted
+                    totals["updated"] += updated
+                    totals["rejected"] += batch.rejected
+                    yield json.dumps({**totals, "line": batch.last_line, "errors": batch.errors}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            yield json.dumps({**totals, "done": False, "error": str(e)}, ensure_ascii=False) + "\n"
+            return
+        finally:
+            stream.close()
+        # новые товары и категории — пересобираем индекс применимости целиком
+        await load_fitment_index()
+        yield json.dumps({**totals, "done": True}) + "\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
+@router.get("/export", summary="Export the whole catalog (NDJSON / CSV)")
+async def export_products(format: str = "ndjson"):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {EXPORT_FORMATS}")
+    stmt = select(
+        Product.id, Product.sku, Product.name, Product.description, Product.price,
+        Product.category, Product.image_url, Product.stock,
+    ).order_by(Product.id)
+    return export_response(stmt, format, "products")
+
+
+@router.get("/fitment", summary="Find parts that fit a vehicle")
+async def find_by_fitment(
+    engine: Optional[List[str]] = Query(None),
+    model: Optional[List[str]] = Query(None),
+    year: Optional[List[int]] = Query(None),
+    category: Optional[List[str]] = Query(None),
+    limit: int = 100,
+    session: AsyncSession = Depends(get_session),
+):
+    """Например `?engine=2.0 TSI&category=brakes`; несколько значений одного поля — OR."""
+    filters = {"engine": engine, "model": model, "year": year, "category": category}
+    started = time.perf_counter()
+    count = fitment_index.count(**filters)
+    page = [int(pid) for pid in fitment_index.query(limit=limit, **filters)]
+    took_us = int((time.perf_counter() - started) * 1_000_000)
+
+    products = []
+    if page:
+        res = await session.execute(select(Product).where(Product.id.in_(page)).order_by(Product.id))
+        products = [
+            {"id": p.id, "name": p.name, "price": float(p.price), "category": p.category,
+             "image": variant_url(p.image_url, "thumb", "jpg")}
+            for p in res.scalars().all()
+        ]
+    return {"count": count, "took_us": took_us, "items": products}
+
+
+@router.get("/fitment/values", summary="Known fitment values with product counts")
+async def fitment_values(field: str = "engine"):
+    if field not in ("engine", "model", "year", "category"):
+        raise HTTPException(status_code=400, detail="Unknown field")
+    return fitment_index.values(field)
+
+
+class ProductBatch(BaseModel):
+    ids: List[int]
+
+
+@router.post("/batch", summary="Prices and stock for many products at once")
+async def get_products_batch(payload: ProductBatch, session: AsyncSession = Depends(get_session)):
+    """Один запрос `id = ANY(:ids)` вместо запроса на товар; неизвестные id пропускаются."""
+    if not payload.ids:
+        return []
+    res = await session.execute(
+        select(Product.id, Product.name, Product.price, Product.stock)
+        .where(Product.id == func.any(cast(list(set(payload.ids)), ARRAY(Integer))))
+    )
+    return [
+        {"id": pid, "name": name, "price": str(price), "stock": stock}
+        for pid, name, price, stock in res
+    ]
+
+
 @router.get("/{product_id}", summary="Get product by id")
 async def get_product(product_id: int, session: AsyncSession = Depends(get_session)):
     product = await session.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return {"id": product.id, "name": product.name, "price": float(product.price), "description": (product.description or "")}
+    return {
+        "id": product.id, "name": product.name, "price": float(product.price), "description": (product.description or ""),
+        "image_url": product.image_url,
+        "images": variant_urls(product.image_url),
+    }
+
+
+@router.post("/{product_id}/image", summary="Upload product image and build resized variants")
+async def upload_product_image(product_id: int, request: Request, session: AsyncSession = Depends(get_session)):
+    """Тело запроса — сам файл картинки (image/jpeg, image/png, image/webp ...)."""
+    product = await session.get(Product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    data = await request.body()
+    try:
+        image_url = await run_in_threadpool(build_variants, data)
+    except ImagesUnavailable:
+        raise HTTPException(status_code=503, detail="Image processing is not available")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    product.image_url = image_url
+    await session.commit()
+    return {"id": product.id, "image_url": image_url, "images": variant_urls(image_url)}
+
+
+@media_router.get("/{filename}", include_in_schema=False)
+async def product_image(filename: str):
+    # имя содержит хэш содержимого, поэтому файл по этому URL никогда не меняется
+    if not FILENAME_RE.match(filename):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = MEDIA_ROOT / filename
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+@router.get("/{product_id}/fitments", summary="Get product fitment rows")
+async def get_product_fitments(product_id: int, session: AsyncSession = Depends(get_session)):
+    res = await session.execute(
+        select(ProductFitment).where(ProductFitment.product_id == product_id).order_by(ProductFitment.id)
+    )
+    return [
+        {"engine": f.engine, "model": f.model, "year_from": f.year_from, "year_to": f.year_to}
+        for f in res.scalars().all()
+    ]
+
+
+@router.put("/{product_id}/fitments", summary="Replace product fitment rows")
+async def replace_product_fitments(
+    product_id: int,
+    payload: List[FitmentIn],
+    session: AsyncSession = Depends(get_session),
+):
+    product = await session.get(Product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    rows = [f.model_dump() for f in payload]
+    await session.execute(delete(ProductFitment).where(ProductFitment.product_id == product_id))
+    session.add_all([ProductFitment(product_id=product_id, **row) for row in rows])
+    # UPDATE товара шлёт NOTIFY (миграция 0004) — search-service перечитает фасеты применимости
+    product.updated_at = func.now()
+    await session.commit()
+
+    fitment_index.replace(product_id, product.category, rows)
+    return rows
@@ -0,0 +1,130 @@
+"""Фасеты поиска: категория, бренд, ценовой диапазон, применимость.
+
+Значения фасета хранятся плоскими парами (doc, код значения) — по сути
+doc-id массивы всех значений подряд. Число совпадений по всем значениям
+фасета считается за один векторный проход: маска найденных doc, выборка
+пар по ней и `np.bincount` по кодам. Пары только дописываются; заменённые
+и удалённые doc не попадают в маску, как и в BM25-постингах.
+
+Счёт «дизъюнктивный»: фасет считается с учётом всех фильтров, кроме своего,
+чтобы при выбранной категории были видны и соседние категории.
+"""
+import re
+from array import array
+from typing import Optional
+
+import numpy as np
+
+from .storage import as_numpy, encode_strings, to_array
+
+FACETS = ("category", "brand", "price", "engine", "model")
+FACET_LIMIT = 20
+
+# (нижняя граница включительно, подпись); верхняя — следующая граница
+PRICE_BANDS = ((0, "0-20"), (20, "20-50"), (50, "50-100"), (100, "100-250"), (250, "250-500"), (500, "500+"))
+_BAND_ORDER = {label: i for i, (_, label) in enumerate(PRICE_BANDS)}
+
+# отдельной колонки бренда нет — берём первое известное имя из названия
+BRANDS = (
+    "Volkswagen", "Audi", "Skoda", "Seat", "Cupra", "Porsche",
+    "Bosch", "Mann", "Mahle", "Febi", "Lemforder", "Sachs", "TRW", "Brembo", "ATE", "NGK",
+    "Valeo", "Gates", "INA", "SKF", "Hella", "Continental", "Castrol", "Liqui Moly", "VAG",
+)
+_BRAND_RE = re.compile(r"\b(%s)\b" % "|".join(re.escape(b) for b in BRANDS), re.IGNORECASE)
+_BRAND_CASE = {b.lower(): b for b in BRANDS}
+
+
+def price_band(price) -> Optional[str]:
+    if price is None:
+        return None
+    label = None
+    for low, band in PRICE_BANDS:
+        if float(price) >= low:
+            label = band
+    return label
+
+
+def detect_brand(name: Optional[str]) -> Optional[str]:
+    m = _BRAND_RE.search(name or "")
+    return _BRAND_CASE[m.group(1).lower()] if m else None
+
+
+def facet_values(product: dict) -> dict:
+    fitment = product.get("fitment") or ()
+    return {
+        "category": [product["category"]] if product.get("category") else [],
+        "brand": [b for b in [detect_brand(product.get("name"))] if b],
+        "price": [b for b in [price_band(product.get("price"))] if b],
+        "engine": sorted({engine for engine, _ in fitment if engine}),
+        "model": sorted({model for _, model in fitment if model}),
+    }
+
+
+class FacetStore:
+    fields = FACETS
+
+    def __init__(self):
+        self._codes_of = {f: {} for f in FACETS}       # значение -> код
+        self._labels = {f: [] for f in FACETS}         # код -> значение
+        self._pair_docs = {f: array("i") for f in FACETS}
+        self._pair_codes = {f: array("i") for f in FACETS}
+
+    def add(self, doc: int, product: dict):
+        for field, values in facet_values(product).items():
+            codes = self._codes_of[field]
+            for value in values:
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(self._labels[field])
+                    self._labels[field].append(value)
+                self._pair_docs[field].append(doc)
+                self._pair_codes[field].append(code)
+
+    def _pairs(self, field: str):
+        return as_numpy(self._pair_docs[field], "i"), as_numpy(self._pair_codes[field], "i")
+
+    def allowed(self, field: str, values: list, n_docs: int) -> np.ndarray:
+        """Булева маска по всем doc: у doc есть хотя бы одно из значений."""
+        mask = np.zeros(n_docs, dtype=bool)
+        codes = [self._codes_of[field][v] for v in values if v in self._codes_of[field]]
+        if codes:
+            docs, pair_codes = self._pairs(field)
+            mask[docs[np.isin(pair_codes, codes)]] = True
+        return mask
+
+    def count(self, field: str, docs: np.ndarray, n_docs: int) -> dict:
+        pair_docs, pair_codes = self._pairs(field)
+        if not len(docs) or not len(pair_docs):
+            return {}
+        hit = np.zeros(n_docs, dtype=bool)
+        hit[docs] = True
+        counts = np.bincount(pair_codes[hit[pair_docs]], minlength=len(self._labels[field]))
+        nonzero = np.flatnonzero(counts)
+        labels = self._labels[field]
+        if field == "price":
+            order = sorted(nonzero.tolist(), key=lambda c: _BAND_ORDER[labels[c]])
+        else:
+            order = nonzero[np.argsort(-counts[nonzero], kind="stable")][:FACET_LIMIT].tolist()
+        return {labels[c]: int(counts[c]) for c in order}
+
+    def to_sections(self, prefix: str) -> dict:
+        sections = {}
+        for f in FACETS:
+            sections[f"{prefix}.{f}.docs"] = as_numpy(self._pair_docs[f], "i")
+            sections[f"{prefix}.{f}.codes"] = as_numpy(self._pair_codes[f], "i")
+            for k, v in encode_strings(self._labels[f]).items():
+                sections[f"{prefix}.{f}.labels.{k}"] = v
+        return sections
+
+    @classmethod
+    def from_sections(cls, sections: dict, prefix: str) -> "FacetStore":
+        store = cls()
+        for f in FACETS:
+            offsets = sections[f"{prefix}.{f}.labels.offsets"]
+            blob = sections[f"{prefix}.{f}.labels.blob"].tobytes()
+            labels = [blob[offsets[i]:offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+            store._labels[f] = labels
+            store._codes_of[f] = {label: code for code, label in enumerate(labels)}
+            store._pair_docs[f] = to_array(sections[f"{prefix}.{f}.docs"], "i")
+            store._pair_codes[f] = to_array(sections[f"{prefix}.{f}.codes"], "i")
+        return store
@@ -0,0 +1,98 @@
+"""Нечёткий поиск: исправление опечаток в словах запроса и артикулах.
+
+Бэкенды (SEARCH_FUZZY_BACKEND), у обоих один метод search():
+- memory  — слова запроса, которых нет в индексе, заменяются ближайшими словами
+            триграммного словаря индекса (trigram.py), и исправленный запрос
+            идёт в обычный BM25;
+- pg_trgm — если точный поиск ничего не нашёл, запрос уходит в Postgres
+            (`word_similarity` по GIN-индексу products-service, миграция 0005).
+"""
+import os
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import text
+
+from shared.database import async_session_maker
+from .index import SearchIndex, SearchResult
+from .text import STOPWORDS, stem, words
+
+PG_SIMILARITY_THRESHOLD = 0.4
+
+
+def correct_query(index: SearchIndex, query: str) -> Optional[str]:
+    """Запрос с исправленными словами или None, если исправлять нечего."""
+    out, changed = [], False
+    for token in words(query):
+        if token not in STOPWORDS and not index.has_term(stem(token)):
+            best = index.vocabulary.lookup(token, limit=1)
+            if best:
+                token, changed = best[0][0], True
+        out.append(token)
+    return " ".join(out) if changed else None
+
+
+@dataclass
+class FuzzyResult:
+    result: SearchResult
+    corrected: Optional[str] = None
+
+
+class MemoryFuzzySearch:
+    def __init__(self, get_index: Callable[[], SearchIndex]):
+        self._get_index = get_index
+
+    async def search(self, q: str, offset: int, limit: int, **options) -> FuzzyResult:
+        index = self._get_index()
+        corrected = correct_query(index, q)
+        result = index.search(corrected or q, offset=offset, limit=limit, **options)
+        return FuzzyResult(result, corrected)
+
+
+class PgTrigramSearch:
+    SQL = text(
+        """
+        SELECT id, name, category, price,
+               greatest(word_similarity(:q, lower(name)), similarity(:q, lower(coalesce(sku, '')))) AS score,
+               count(*) OVER () AS total
+        FROM products
+        WHERE :q <% lower(name) OR lower(sku) % :q
+        ORDER BY score DESC, id
+        OFFSET :offset LIMIT :limit
+        """
+    )
+
+    def __init__(self, get_index: Callable[[], SearchIndex]):
+        self._get_index = get_index
+
+    async def search(self, q: str, offset: int, limit: int, **options) -> FuzzyResult:
+        result = self._get_index().search(q, offset=offset, limit=limit, **options)
+        if result.total or any((options.get("filters") or {}).values()):
+            # фильтры по фасетам SQL-запрос не знает — нечёткий фолбэк только без них
+            return FuzzyResult(result)
+        async with async_session_maker() as session:
+            # порог действует и для операторов % / <%, которые идут по GIN-индексу
+            await session.execute(text(f"SET LOCAL pg_trgm.similarity_threshold = {PG_SIMILARITY_THRESHOLD}"))
+            await session.execute(text(f"SET LOCAL pg_trgm.word_similarity_threshold = {PG_SIMILARITY_THRESHOLD}"))
+            rows = (await session.execute(self.SQL, {"q": q.lower(), "offset": offset, "limit": limit})).all()
+        items = [
+            {
+                "id": r.id,
+                "name": r.name,
+                "category": r.category,
+                "price": float(r.price) if r.price is not None else None,
+                "score": round(float(r.score), 4),
+            }
+            for r in rows
+        ]
+        return FuzzyResult(SearchResult(total=rows[0].total if rows else 0, items=items))
+
+
+BACKENDS = {"memory": MemoryFuzzySearch, "pg_trgm": PgTrigramSearch}
+
+
+def make_fuzzy_search(get_index: Callable[[], SearchIndex], backend: Optional[str] = None):
+    backend = backend or os.getenv("SEARCH_FUZZY_BACKEND", "memory")
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown SEARCH_FUZZY_BACKEND: {backend}")
+    return BACKENDS[backend](get_index)
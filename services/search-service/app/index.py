@@ -0,0 +1,277 @@
+"""In-process инвертированный индекс каталога с ранжированием BM25.
+
+Постинги терма — два плоских массива (`array`): номера документов и веса
+вхождений. Вес учитывает поле: совпадение в названии важнее, чем в описании
+(упрощённый BM25F). На запросе постинги оборачиваются в NumPy без копирования,
+и очки BM25 считаются векторно для всех документов терма сразу.
+
+Документ (doc) — внутренний номер строки индекса. Обновлённый товар получает
+новый doc, старый помечается удалённым (alive = 0), поэтому постинги только
+дописываются и не перестраиваются.
+"""
+import math
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .facets import FacetStore
+from .storage import Postings, StringColumn, as_numpy, to_array
+from .text import terms_of, tokenize, words
+from .trigram import TrigramIndex
+
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = {"name": 3, "sku": 3, "category": 2, "description": 1}
+MAX_TF = 65535
+# доля документов, после которой очки выгоднее копить в плотном массиве
+DENSE_THRESHOLD = 1 / 8
+
+
+@dataclass
+class SearchResult:
+    total: int
+    items: list = field(default_factory=list)
+    facets: dict = field(default_factory=dict)
+
+
+def _weighted_terms(product: dict) -> tuple[dict, float, set]:
+    tf: dict[str, int] = {}
+    length = 0
+    seen_words = set()
+    for fname, weight in FIELD_WEIGHTS.items():
+        tokens = words(product.get(fname) or "")
+        seen_words.update(tokens)
+        for term in terms_of(tokens):
+            tf[term] = tf.get(term, 0) + weight
+            length += weight
+    return tf, float(length), seen_words
+
+
+class SearchIndex:
+    def __init__(self):
+        self._postings = Postings(("i", "H"))  # терм -> (doc, взвешенный tf)
+        self._doc_of: dict[int, int] = {}
+        self._product_ids = array("q")
+        self._doc_len = array("f")
+        self._alive = bytearray()
+        self._names = StringColumn()
+        self._categories = StringColumn()
+        self._prices = array("d")  # NaN — цены нет
+        self._live = 0
+        self._live_len = 0.0
+        # слова без стемминга — словарь для исправления опечаток (fuzzy.py);
+        # id слов каждого doc — чтобы при удалении товара уменьшить их частоту
+        self.vocabulary = TrigramIndex()
+        self._doc_words = array("i")
+        self._doc_words_end = array("q")
+        self.facets = FacetStore()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, product_id: int) -> bool:
+        return product_id in self._doc_of
+
+    @property
+    def dead_ratio(self) -> float:
+        """Доля удалённых/заменённых doc — по ней решаем, когда пересобрать индекс."""
+        total = len(self._product_ids)
+        return (total - self._live) / total if total else 0.0
+
+    def product_ids(self):
+        return self._doc_of.keys()
+
+    def live_docs(self):
+        """(product_id, name, category) живых товаров — источник фраз для подсказок."""
+        return [(pid, self._names[doc], self._categories[doc]) for pid, doc in self._doc_of.items()]
+
+    # --- запись -----------------------------------------------------------
+
+    def add(self, product: dict):
+        """Добавить или заменить товар (dict с id, name, description, category, price)."""
+        product_id = int(product["id"])
+        self.remove(product_id)
+
+        tf, length, seen_words = _weighted_terms(product)
+        self._doc_words.extend(self.vocabulary.add(word) for word in seen_words)
+        self._doc_words_end.append(len(self._doc_words))
+        doc = len(self._product_ids)
+        for term, count in tf.items():
+            docs, tfs = self._postings.mutable(term)
+            docs.append(doc)
+            tfs.append(min(count, MAX_TF))
+
+        self.facets.add(doc, product)
+        self._doc_of[product_id] = doc
+        self._product_ids.append(product_id)
+        self._doc_len.append(length)
+        self._alive.append(1)
+        self._names.append(product.get("name"))
+        self._categories.append(product.get("category"))
+        price = product.get("price")
+        self._prices.append(float(price) if price is not None else math.nan)
+        self._live += 1
+        self._live_len += length
+
+    def add_many(self, products: Iterable[dict]):
+        for product in products:
+            self.add(product)
+
+    def remove(self, product_id: int):
+        doc = self._doc_of.pop(product_id, None)
+        if doc is None:
+            return
+        self._alive[doc] = 0
+        self._live -= 1
+        self._live_len -= self._doc_len[doc]
+        start = self._doc_words_end[doc - 1] if doc else 0
+        for wid in self._doc_words[start:self._doc_words_end[doc]]:
+            self.vocabulary.discard(wid)
+
+    # --- чтение -----------------------------------------------------------
+
+    def has_term(self, term: str) -> bool:
+        return term in self._postings
+
+    def _score_term(self, postings, n_docs: int, avgdl: float, doc_len: np.ndarray):
+        docs = as_numpy(postings[0], "i")
+        tfs = as_numpy(postings[1], "H").astype(np.float32)
+        df = len(docs)
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = K1 * (1 - B + B * doc_len[docs] / avgdl)
+        return docs, (idf * tfs * (K1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def _accumulate(self, scored: list, total_postings: int, need_hits: bool):
+        """Сложить очки термов по документам -> (docs, scores, число совпавших термов)."""
+        all_docs = np.concatenate([d for d, _ in scored])
+        all_scores = np.concatenate([s for _, s in scored])
+        n = len(self._product_ids)
+        if total_postings > n * DENSE_THRESHOLD:
+            # bincount по всему диапазону doc заметно быстрее np.unique/scatter
+            scores = np.bincount(all_docs, weights=all_scores, minlength=n)
+            docs = np.flatnonzero(scores)  # idf > 0, значит у совпавших doc очки > 0
+            hits = np.bincount(all_docs, minlength=n)[docs] if need_hits else None
+            return docs, scores[docs], hits
+
+        docs, inverse = np.unique(all_docs, return_inverse=True)
+        hits = np.bincount(inverse) if need_hits else None
+        return docs, np.bincount(inverse, weights=all_scores), hits
+
+    def search(
+        self,
+        query: str,
+        offset: int = 0,
+        limit: int = 20,
+        match_all: bool = False,
+        filters: Optional[dict] = None,
+        facets: bool = False,
+    ) -> SearchResult:
+        """filters — фасет -> список значений (OR внутри фасета, AND между фасетами)."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._live:
+            return SearchResult(total=0)
+
+        n_docs = self._live
+        avgdl = self._live_len / n_docs or 1.0
+        doc_len = np.frombuffer(self._doc_len, dtype=np.float32)
+        scored = []
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                if match_all:
+                    return SearchResult(total=0)
+                continue
+            scored.append(self._score_term(postings, n_docs, avgdl, doc_len))
+        if not scored:
+            return SearchResult(total=0)
+
+        docs, scores, hits = self._accumulate(scored, sum(len(d) for d, _ in scored), match_all)
+        keep = np.frombuffer(self._alive, dtype=np.uint8)[docs].astype(bool)
+        if match_all:
+            keep &= hits == len(terms)
+        docs, scores = docs[keep], scores[keep]
+
+        n = len(self._product_ids)
+        passes = {
+            f: self.facets.allowed(f, values, n)[docs]
+            for f, values in (filters or {}).items() if values
+        }
+        counts = {}
+        if facets:
+            for f in self.facets.fields:
+                # фасет считаем без его собственного фильтра
+                others = [p for g, p in passes.items() if g != f]
+                subset = docs[np.logical_and.reduce(others)] if others else docs
+                counts[f] = self.facets.count(f, subset, n)
+        if passes:
+            keep = np.logical_and.reduce(list(passes.values()))
+            docs, scores = docs[keep], scores[keep]
+        return SearchResult(total=int(len(docs)), items=self._page(docs, scores, offset, limit), facets=counts)
+
+    def _page(self, docs: np.ndarray, scores: np.ndarray, offset: int, limit: int) -> list:
+        k = offset + limit
+        if k <= 0 or not len(docs):
+            return []
+        if len(docs) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[top], scores[top]
+        # по убыванию очков, при равенстве — стабильно по doc
+        order = np.lexsort((docs, -scores))[offset:k]
+        return [self._item(int(docs[i]), float(scores[i])) for i in order]
+
+    def _item(self, doc: int, score: Optional[float] = None) -> dict:
+        price = self._prices[doc]
+        item = {
+            "id": self._product_ids[doc],
+            "name": self._names[doc],
+            "category": self._categories[doc],
+            "price": None if math.isnan(price) else price,
+        }
+        if score is not None:
+            item["score"] = round(score, 4)
+        return item
+
+    # --- снапшот (snapshot.py) ----------------------------------------------
+
+    def snapshot_meta(self) -> dict:
+        return {"docs": len(self._product_ids), "live": self._live, "live_len": self._live_len}
+
+    def to_sections(self) -> dict:
+        sections = self._postings.to_sections("postings")
+        sections["docs.product_ids"] = as_numpy(self._product_ids, "q")
+        sections["docs.len"] = as_numpy(self._doc_len, "f")
+        sections["docs.alive"] = np.frombuffer(bytes(self._alive), dtype=np.uint8)
+        sections["docs.prices"] = as_numpy(self._prices, "d")
+        sections["docs.words"] = as_numpy(self._doc_words, "i")
+        sections["docs.words_end"] = as_numpy(self._doc_words_end, "q")
+        sections.update(self._names.to_sections("docs.names"))
+        sections.update(self._categories.to_sections("docs.categories"))
+        sections.update(self.vocabulary.to_sections("vocabulary"))
+        sections.update(self.facets.to_sections("facets"))
+        return sections
+
+    @classmethod
+    def from_sections(cls, sections: dict, meta: dict) -> "SearchIndex":
+        """Индекс поверх секций снапшота: постинги и строки читаются из mmap,
+        копируются только небольшие изменяемые массивы по doc."""
+        index = cls()
+        index._postings = Postings.from_sections(sections, "postings", ("i", "H"))
+        product_ids = sections["docs.product_ids"]
+        alive = sections["docs.alive"]
+        index._product_ids = to_array(product_ids, "q")
+        index._doc_len = to_array(sections["docs.len"], "f")
+        index._alive = bytearray(alive.tobytes())
+        index._prices = to_array(sections["docs.prices"], "d")
+        index._doc_words = to_array(sections["docs.words"], "i")
+        index._doc_words_end = to_array(sections["docs.words_end"], "q")
+        index._names = StringColumn.from_sections(sections, "docs.names")
+        index._categories = StringColumn.from_sections(sections, "docs.categories")
+        live = np.flatnonzero(alive)
+        index._doc_of = dict(zip(product_ids[live].tolist(), live.tolist()))
+        index._live = int(meta["live"])
+        index._live_len = float(meta["live_len"])
+        index.vocabulary = TrigramIndex.from_sections(sections, "vocabulary")
+        index.facets = FacetStore.from_sections(sections, "facets")
+        return index
@@ -1,9 +1,48 @@
+import asyncio
+
 from fastapi import FastAPI
-from .routers import router
+from fastapi.middleware.cors import CORSMiddleware
+
+from .routers import SEARCH_BACKEND, router, start_search_index, change_sync, suggest_refresh_loop
 
 app = FastAPI(title="search-service")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
 app.include_router(router)
 
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.on_event("startup")
+async def on_startup():
+    if SEARCH_BACKEND == "postgres":
+        return  # индекс в памяти не нужен: поиск идёт в products.search_tsv
+    # LISTEN поднимаем до сборки, чтобы не потерять изменения, пришедшие во время неё.
+    change_sync.start()
+    # Снапшот с диска поднимается за миллисекунды; без него индекс большого
+    # каталога строится десятки секунд — не держим старт (и /health) до готовности.
+    app.state.index_task = asyncio.create_task(start_search_index())
+    # подсказки строятся из готового индекса; до него цикл ждёт и пробует снова
+    app.state.suggest_task = asyncio.create_task(suggest_refresh_loop())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await change_sync.stop()
+    if hasattr(app.state, "suggest_task"):
+        app.state.suggest_task.cancel()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8009, reload=True)
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, Numeric, Text, DateTime
+from shared.database import Base
+
+
+class Product(Base):
+    # только чтение: таблицей владеет products-service
+    __tablename__ = "products"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    category = Column(String(100), nullable=True)
+    sku = Column(String(64), nullable=True)
+    price = Column(Numeric, nullable=False)
+    # ставится триггером (products-service, миграция 0004); по нему работает polling
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ProductFitment(Base):
+    # только чтение: таблицей владеет products-service (миграция 0003)
+    __tablename__ = "product_fitments"
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    engine = Column(String(50), nullable=True)
+    model = Column(String(100), nullable=True)
+
+
+# колонки, из которых строится документ индекса (полная загрузка и догоняющие обновления)
+DOC_COLUMNS = (Product.id, Product.name, Product.description, Product.category, Product.sku, Product.price)
+
+
+def product_doc(row, fitment=()) -> dict:
+    """fitment — [(engine, model)] из product_fitments, для фасетов."""
+    return {
+        "id": row.id,
+        "name": row.name,
+        "description": row.description,
+        "category": row.category,
+        "sku": row.sku,
+        "price": row.price,
+        "fitment": fitment,
+    }
@@ -0,0 +1,140 @@
+"""Бэкенд поиска на Postgres FTS (SEARCH_BACKEND=postgres).
+
+Для развёртываний без индекса в памяти: запрос идёт в сгенерированную колонку
+`products.search_tsv` (конфигурация russian, веса полей как в FIELD_WEIGHTS;
+миграция 0006 products-service) по GIN-индексу, ранжирование — `ts_rank_cd`.
+Ответ /api/search/q тот же, что у in-memory индекса, поэтому бэкенды можно
+переключать переменной окружения и сравнивать по `took_ms`.
+
+Фасеты здесь — только категория и ценовой диапазон (GROUP BY по найденным);
+бренд и применимость считает только in-memory индекс.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import text
+
+from shared.database import async_session_maker
+from .facets import BRANDS, PRICE_BANDS
+from .fuzzy import PG_SIMILARITY_THRESHOLD, PgTrigramSearch
+from .index import SearchResult
+
+# match=any: лексемы plainto_tsquery через OR
+_TSQUERY = {
+    False: "replace(plainto_tsquery('russian', :q)::text, '&', '|')::tsquery",
+    True: "plainto_tsquery('russian', :q)",
+}
+_BRAND_CASE = {b.lower(): b for b in BRANDS}
+
+_PRICE_BAND_SQL = "CASE {} END".format(" ".join(
+    f"WHEN p.price >= {low} THEN '{label}'" for low, label in reversed(PRICE_BANDS)
+))
+
+
+def _price_ranges(labels: list) -> list:
+    ranges = []
+    for i, (low, label) in enumerate(PRICE_BANDS):
+        if label in labels:
+            high = PRICE_BANDS[i + 1][0] if i + 1 < len(PRICE_BANDS) else None
+            ranges.append((low, high))
+    return ranges
+
+
+def _filters_sql(filters: dict, skip: Optional[str] = None) -> tuple[list, dict]:
+    where, params = [], {}
+    for field, values in filters.items():
+        if not values or field == skip:
+            continue
+        if field == "category":
+            where.append("p.category = ANY(:f_category)")
+            params["f_category"] = list(values)
+        elif field == "brand":
+            brands = [_BRAND_CASE.get(v.lower(), v) for v in values]
+            where.append("p.name ~* :f_brand")
+            params["f_brand"] = r"\m(%s)\M" % "|".join(re.escape(b) for b in brands)
+        elif field == "price":
+            parts = []
+            for n, (low, high) in enumerate(_price_ranges(values)):
+                params[f"f_price_lo{n}"] = low
+                if high is None:
+                    parts.append(f"p.price >= :f_price_lo{n}")
+                else:
+                    params[f"f_price_hi{n}"] = high
+                    parts.append(f"(p.price >= :f_price_lo{n} AND p.price < :f_price_hi{n})")
+            where.append("(" + (" OR ".join(parts) or "false") + ")")
+        elif field in ("engine", "model"):
+            where.append(
+                f"EXISTS (SELECT 1 FROM product_fitments f WHERE f.product_id = p.id AND f.{field} = ANY(:f_{field}))"
+            )
+            params[f"f_{field}"] = list(values)
+    return where, params
+
+
+class PostgresSearch:
+    def __init__(self):
+        # нечёткий фолбэк — тот же pg_trgm, что у SEARCH_FUZZY_BACKEND=pg_trgm
+        self._fuzzy_sql = PgTrigramSearch.SQL
+
+    async def search(
+        self,
+        q: str,
+        offset: int = 0,
+        limit: int = 20,
+        match_all: bool = False,
+        filters: Optional[dict] = None,
+        facets: bool = False,
+        fuzzy: bool = False,
+    ) -> SearchResult:
+        filters = filters or {}
+        match = f"p.search_tsv @@ {_TSQUERY[match_all]}"
+        where, params = _filters_sql(filters)
+        params.update(q=q, offset=offset, limit=limit)
+        async with async_session_maker() as session:
+            rows = (await session.execute(text(
+                f"""
+                SELECT p.id, p.name, p.category, p.price,
+                       ts_rank_cd(p.search_tsv, {_TSQUERY[match_all]}) AS score,
+                       count(*) OVER () AS total
+                FROM products p
+                WHERE {" AND ".join([match] + where)}
+                ORDER BY score DESC, p.id
+                OFFSET :offset LIMIT :limit
+                """
+            ), params)).all()
+
+            if not rows and fuzzy and not any(filters.values()):
+                await session.execute(text(f"SET LOCAL pg_trgm.similarity_threshold = {PG_SIMILARITY_THRESHOLD}"))
+                await session.execute(text(f"SET LOCAL pg_trgm.word_similarity_threshold = {PG_SIMILARITY_THRESHOLD}"))
+                rows = (await session.execute(
+                    self._fuzzy_sql, {"q": q.lower(), "offset": offset, "limit": limit},
+                )).all()
+
+            counts = {}
+            if facets:
+                for field, expr in (("category", "p.category"), ("price", _PRICE_BAND_SQL)):
+                    # как и в памяти: фасет считается без собственного фильтра
+                    f_where, f_params = _filters_sql(filters, skip=field)
+                    res = await session.execute(text(
+                        f"""
+                        SELECT {expr} AS value, count(*) AS n
+                        FROM products p
+                        WHERE {" AND ".join([match, f"{expr} IS NOT NULL"] + f_where)}
+                        GROUP BY 1
+                        ORDER BY n DESC
+                        """
+                    ), dict(f_params, q=q))
+                    counts[field] = {value: n for value, n in res}
+                order = {label: i for i, (_, label) in enumerate(PRICE_BANDS)}
+                counts["price"] = dict(sorted(counts["price"].items(), key=lambda kv: order[kv[0]]))
+
+        items = [
+            {
+                "id": r.id,
+                "name": r.name,
+                "category": r.category,
+                "price": float(r.price) if r.price is not None else None,
+                "score": round(float(r.score), 4),
+            }
+            for r in rows
+        ]
+        return SearchResult(total=rows[0].total if rows else 0, items=items, facets=counts)
@@ -1,13 +1,235 @@
-from fastapi import APIRouter
+import asyncio
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, text
+
+from shared.database import async_session_maker
+from .fuzzy import make_fuzzy_search
+from .index import SearchIndex
+from .pg_search import PostgresSearch
+from .models import DOC_COLUMNS, Product, product_doc
+from .snapshot import load_snapshot, save_snapshot
+from .suggest import TOP_K, Suggester
+from .sync import ProductChangeSync, fetch_fitments
+from .text import normalize
 
 router = APIRouter(prefix="/api/search", tags=["search"])
 
+LOAD_BATCH_SIZE = 5000
+# memory — свой индекс в процессе; postgres — FTS по products.search_tsv (pg_search.py)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "memory")
+if SEARCH_BACKEND not in ("memory", "postgres"):
+    raise ValueError(f"unknown SEARCH_BACKEND: {SEARCH_BACKEND}")
+# снапшот индекса на диске; пустая строка — не сохранять и не читать
+SNAPSHOT_PATH = os.getenv("SEARCH_SNAPSHOT_PATH", "data/search-index.snap")
+
+# строится на старте (main.on_startup); до готовности поиск отвечает 503
+search_index = SearchIndex()
+index_ready = False
+
+# подсказки пересобираются из индекса раз в SUGGEST_REFRESH_SECONDS
+SUGGEST_REFRESH_SECONDS = 300
+QUERY_LOG_MAX = 200_000
+suggester: Optional[Suggester] = None
+# частота успешных запросов (первая страница с результатами) — вес для подсказок
+query_counts: Counter = Counter()
+
+
+async def load_search_index():
+    """Построить индекс по всей таблице products и подменить текущий."""
+    global search_index, index_ready
+    try:
+        await change_sync.begin_rebuild()
+    except Exception as e:
+        # нет updated_at (миграции не применены) — работаем только через LISTEN
+        print(f"search-service: change polling disabled: {e}")
+    started_at = change_sync.watermark
+    try:
+        index = SearchIndex()
+        async with async_session_maker() as session:
+            stmt = select(*DOC_COLUMNS).order_by(Product.id).execution_options(yield_per=LOAD_BATCH_SIZE)
+            result = await session.stream(stmt)
+            async for partition in result.partitions():
+                fitments = await fetch_fitments(r.id for r in partition)
+                docs = [product_doc(r, fitments.get(r.id, ())) for r in partition]
+                # токенизация CPU-bound — не блокируем event loop
+                await run_in_threadpool(index.add_many, docs)
+        # сохраняем до публикации: пока индекс не живой, его никто не меняет
+        if SNAPSHOT_PATH and started_at is not None:
+            await save_search_snapshot(index, started_at)
+        search_index = index
+        index_ready = True
+    finally:
+        change_sync.end_rebuild()
+    return index
+
+
+async def save_search_snapshot(index: SearchIndex, watermark: datetime):
+    try:
+        started = time.perf_counter()
+        await run_in_threadpool(save_snapshot, index, SNAPSHOT_PATH, {"watermark": watermark.isoformat()})
+        print(f"search-service: snapshot saved to {SNAPSHOT_PATH} in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"search-service: failed to save index snapshot: {e}")
+
+
+async def load_search_snapshot() -> bool:
+    """Поднять индекс из снапшота и догнать изменения с его watermark."""
+    global search_index, index_ready
+    if not SNAPSHOT_PATH or not os.path.exists(SNAPSHOT_PATH):
+        return False
+    try:
+        index, meta = await run_in_threadpool(load_snapshot, SNAPSHOT_PATH)
+        watermark = datetime.fromisoformat(meta["watermark"])
+    except Exception as e:
+        print(f"search-service: ignoring index snapshot {SNAPSHOT_PATH}: {e}")
+        return False
+    search_index = index
+    index_ready = True
+    try:
+        await change_sync.catch_up(watermark)
+    except Exception as e:
+        # watermark уже выставлен — догонит обычный опрос, когда БД ответит
+        print(f"search-service: snapshot catch-up deferred: {e}")
+    return True
+
+
+async def start_search_index():
+    if not await load_search_snapshot():
+        await rebuild_search_index()
+
+
+async def rebuild_search_index():
+    try:
+        await load_search_index()
+    except Exception:
+        import traceback
+        print("search-service: failed to build search index")
+        traceback.print_exc()
+
+
+async def load_purchase_counts() -> dict:
+    """product_id -> продано штук; order_items есть только в общей БД монолита."""
+    try:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                text("SELECT product_id, SUM(quantity) FROM order_items GROUP BY product_id")
+            )
+            return {pid: int(qty) for pid, qty in result}
+    except Exception as e:
+        print(f"search-service: purchase popularity unavailable: {e}")
+        return {}
+
+
+async def load_suggester():
+    global suggester
+    if not index_ready:
+        return None
+    purchases = await load_purchase_counts()
+    products = search_index.live_docs()
+    suggester = await run_in_threadpool(Suggester.build, products, Counter(query_counts), purchases)
+    return suggester
+
+
+async def suggest_refresh_loop():
+    while True:
+        try:
+            await load_suggester()
+        except Exception:
+            import traceback
+            print("search-service: failed to build suggestions")
+            traceback.print_exc()
+        await asyncio.sleep(SUGGEST_REFRESH_SECONDS if suggester is not None else 5)
+
+
+def record_query(q: str):
+    key = " ".join(normalize(q).split())
+    if not key:
+        return
+    query_counts[key] += 1
+    if len(query_counts) > QUERY_LOG_MAX:
+        # оставляем самую частую половину, чтобы журнал не рос без предела
+        keep = query_counts.most_common(QUERY_LOG_MAX // 2)
+        query_counts.clear()
+        query_counts.update(dict(keep))
+
+
+# опечатки: in-memory триграммы или pg_trgm (SEARCH_FUZZY_BACKEND)
+fuzzy_search = make_fuzzy_search(lambda: search_index)
+pg_search = PostgresSearch()
+
+
+# изменения товаров (LISTEN/NOTIFY + опрос updated_at) применяются к текущему индексу
+change_sync = ProductChangeSync(
+    get_index=lambda: search_index if index_ready else None,
+    rebuild=rebuild_search_index,
+)
+
+
 @router.get("/q")
-async def query(q: str):
-    # dummy search (in real implementation call DB or search engine)
-    sample = [
-        {"id": 1, "name": "Tire"},
-        {"id": 2, "name": "Oil"},
-        {"id": 3, "name": "Brake pads"}
-    ]
-    return [p for p in sample if q.lower() in p["name"].lower()]
+async def query(
+    q: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    match: str = Query("any", pattern="^(any|all)$"),
+    fuzzy: bool = True,
+    facets: bool = True,
+    category: Optional[List[str]] = Query(None),
+    brand: Optional[List[str]] = Query(None),
+    price: Optional[List[str]] = Query(None, description="ценовой диапазон: 0-20, 20-50, ..., 500+"),
+    engine: Optional[List[str]] = Query(None),
+    model: Optional[List[str]] = Query(None),
+):
+    if SEARCH_BACKEND == "memory" and not index_ready:
+        raise HTTPException(status_code=503, detail="Search index is building")
+    started = time.perf_counter()
+    options = {
+        "offset": (page - 1) * page_size,
+        "limit": page_size,
+        "match_all": match == "all",
+        "filters": {"category": category, "brand": brand, "price": price, "engine": engine, "model": model},
+        "facets": facets,
+    }
+    corrected = None
+    if SEARCH_BACKEND == "postgres":
+        result = await pg_search.search(q, fuzzy=fuzzy, **options)
+    elif fuzzy:
+        found = await fuzzy_search.search(q, **options)
+        result, corrected = found.result, found.corrected
+    else:
+        result = search_index.search(q, **options)
+    if result.total and page == 1:
+        record_query(corrected or q)
+    return {
+        "query": q,
+        "backend": SEARCH_BACKEND,
+        "corrected": corrected,
+        "total": result.total,
+        "page": page,
+        "page_size": page_size,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        "items": result.items,
+        "facets": result.facets,
+    }
+
+
+@router.get("/suggest")
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=TOP_K),
+):
+    if suggester is None:
+        raise HTTPException(status_code=503, detail="Suggestions are building")
+    started = time.perf_counter()
+    items = suggester.suggest(prefix, limit)
+    return {
+        "prefix": prefix,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        "items": items,
+    }
@@ -0,0 +1,100 @@
+"""Снапшот поискового индекса на диске: версионированный файл под mmap.
+
+Формат (little-endian):
+
+    MAGIC (8 байт) | версия формата u32 | резерв u32 | длина манифеста u64
+    манифест (JSON) | выравнивание до 64 байт | секции
+
+Манифест — метаданные снапшота (watermark, число doc, ...) и таблица секций:
+имя -> смещение от начала данных, dtype и число элементов. Секция — плоский
+массив (постинги, таблицы doc, строки в виде offsets + utf-8 blob).
+
+Загрузка отображает файл целиком (`mmap`, только чтение) и оборачивает секции
+в `np.frombuffer` без копирования: страницы читаются с диска по мере
+обращения, а реплики на одном хосте делят их через page cache. Запись идёт во
+временный файл и `os.replace`, поэтому читатели всегда видят целый снапшот,
+а уже отображённый старый файл остаётся валидным до закрытия.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from .index import SearchIndex
+
+MAGIC = b"VFSEARCH"
+FORMAT_VERSION = 2  # 2: id слов словаря по doc (docs.words)
+ALIGN = 64
+_HEADER = struct.Struct("<8sIIQ")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _align(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+def save_snapshot(index: SearchIndex, path: str, meta: Optional[dict] = None) -> dict:
+    """Записать индекс в path атомарно; возвращает манифест."""
+    sections = index.to_sections()
+    table, offset = {}, 0
+    for name, values in sections.items():
+        values = np.ascontiguousarray(values)
+        sections[name] = values
+        table[name] = {"offset": offset, "dtype": values.dtype.str, "count": int(values.size)}
+        offset = _align(offset + values.nbytes)
+    manifest = {"format": FORMAT_VERSION, "meta": dict(meta or {}, **index.snapshot_meta()), "sections": table}
+    manifest_bytes = json.dumps(manifest, ensure_ascii=False).encode()
+    data_start = _align(_HEADER.size + len(manifest_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".search-index-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(manifest_bytes)))
+            f.write(manifest_bytes)
+            for name, values in sections.items():
+                f.seek(data_start + table[name]["offset"])
+                f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return manifest
+
+
+def load_snapshot(path: str) -> tuple[SearchIndex, dict]:
+    """Отобразить снапшот и собрать индекс поверх него -> (index, meta)."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            raise SnapshotError(f"{path}: truncated header")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, _, manifest_len = _HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path}: not a search index snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"{path}: format {version}, expected {FORMAT_VERSION}")
+    manifest = json.loads(mm[_HEADER.size:_HEADER.size + manifest_len])
+    data_start = _align(_HEADER.size + manifest_len)
+
+    sections = {}
+    for name, entry in manifest["sections"].items():
+        dtype = np.dtype(entry["dtype"])
+        start = data_start + entry["offset"]
+        if start + entry["count"] * dtype.itemsize > size:
+            raise SnapshotError(f"{path}: section {name} is out of bounds")
+        # mmap держится ссылкой из каждого массива и закроется вместе с последним
+        sections[name] = np.frombuffer(mm, dtype=dtype, count=entry["count"], offset=start) \
+            if entry["count"] else np.empty(0, dtype)
+    return SearchIndex.from_sections(sections, manifest["meta"]), manifest["meta"]
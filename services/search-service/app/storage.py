@@ -0,0 +1,188 @@
+"""Хранилища индекса, которые умеют жить поверх снапшота в mmap (snapshot.py).
+
+Снапшот даёт «базу» — плоские NumPy-массивы, смотрящие прямо в отображённый
+файл. Чтение идёт из базы без копирования; первая запись в терм или строку
+копирует её в обычный `array` (copy-on-write), поэтому догоняющие обновления
+после загрузки снапшота работают как раньше.
+
+Секции — dict имя -> ndarray; одна структура пишет и читает свои секции
+под общим префиксом.
+"""
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+import numpy as np
+
+_DTYPES = {"i": np.int32, "H": np.uint16, "I": np.uint32, "q": np.int64, "f": np.float32, "d": np.float64}
+
+
+def to_array(values: np.ndarray, typecode: str) -> array:
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values, dtype=_DTYPES[typecode]).tobytes())
+    return out
+
+
+def as_numpy(values, typecode: str) -> np.ndarray:
+    return np.frombuffer(values, dtype=_DTYPES[typecode]) if len(values) else np.empty(0, _DTYPES[typecode])
+
+
+def encode_strings(values: Iterable[Optional[str]]) -> dict:
+    """Строки -> offsets (n + 1), utf-8 blob и флаги NULL."""
+    blobs, nulls = [], []
+    for value in values:
+        nulls.append(value is None)
+        blobs.append(value.encode() if value is not None else b"")
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in blobs], out=offsets[1:])
+    return {
+        "offsets": offsets,
+        "blob": np.frombuffer(b"".join(blobs), dtype=np.uint8),
+        "nulls": np.array(nulls, dtype=np.uint8),
+    }
+
+
+class _MappedStrings:
+    """Строки из снапшота; декодируются по одной при обращении."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, nulls: Optional[np.ndarray] = None):
+        self._offsets = offsets
+        self._blob = blob
+        self._nulls = nulls
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        if self._nulls is not None and self._nulls[i]:
+            return None
+        return self.raw(i).decode()
+
+
+class _RawKeys:
+    # последовательность utf-8 ключей для bisect: порядок байтов utf-8 = порядок str
+    def __init__(self, strings: _MappedStrings):
+        self._strings = strings
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._strings.raw(i)
+
+
+class StringColumn:
+    """Список строк (или None): база из снапшота + дописанные после загрузки."""
+
+    def __init__(self):
+        self._base: Optional[_MappedStrings] = None
+        self._own: list = []
+
+    def __len__(self) -> int:
+        return (len(self._base) if self._base is not None else 0) + len(self._own)
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        base = len(self._base) if self._base is not None else 0
+        return self._base[i] if i < base else self._own[i - base]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def append(self, value: Optional[str]):
+        self._own.append(value)
+
+    def to_sections(self, prefix: str) -> dict:
+        return {f"{prefix}.{k}": v for k, v in encode_strings(iter(self)).items()}
+
+    @classmethod
+    def from_sections(cls, sections: dict, prefix: str) -> "StringColumn":
+        column = cls()
+        column._base = _MappedStrings(
+            sections[f"{prefix}.offsets"], sections[f"{prefix}.blob"], sections[f"{prefix}.nulls"],
+        )
+        return column
+
+
+class Postings:
+    """Терм -> кортеж параллельных массивов (typecodes задают их типы).
+
+    get() отдаёт массивы только для чтения (array или срез mmap); писать —
+    через mutable(), который при необходимости копирует терм из базы.
+    """
+
+    def __init__(self, typecodes: tuple):
+        self._typecodes = typecodes
+        self._own: dict[str, tuple] = {}
+        self._base_terms: Optional[_MappedStrings] = None
+        self._base_keys: Optional[_RawKeys] = None
+        self._base_offsets: Optional[np.ndarray] = None
+        self._base_columns: tuple = ()
+
+    def _base_find(self, term: str) -> int:
+        if self._base_keys is None:
+            return -1
+        key = term.encode()
+        i = bisect_left(self._base_keys, key)
+        return i if i < len(self._base_keys) and self._base_keys[i] == key else -1
+
+    def _base_slice(self, i: int) -> tuple:
+        start, stop = self._base_offsets[i], self._base_offsets[i + 1]
+        return tuple(column[start:stop] for column in self._base_columns)
+
+    def get(self, term: str) -> Optional[tuple]:
+        postings = self._own.get(term)
+        if postings is not None:
+            return postings
+        i = self._base_find(term)
+        return self._base_slice(i) if i >= 0 else None
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._own or self._base_find(term) >= 0
+
+    def mutable(self, term: str) -> tuple:
+        postings = self._own.get(term)
+        if postings is None:
+            i = self._base_find(term)
+            if i >= 0:
+                postings = tuple(to_array(c, tc) for c, tc in zip(self._base_slice(i), self._typecodes))
+            else:
+                postings = tuple(array(tc) for tc in self._typecodes)
+            self._own[term] = postings
+        return postings
+
+    def terms(self) -> list:
+        terms = set(self._own)
+        if self._base_terms is not None:
+            terms.update(self._base_terms[i] for i in range(len(self._base_terms)))
+        return sorted(terms)
+
+    def to_sections(self, prefix: str) -> dict:
+        terms = self.terms()
+        columns = [[] for _ in self._typecodes]
+        lengths = []
+        for term in terms:
+            postings = self.get(term)
+            lengths.append(len(postings[0]))
+            for out, values, tc in zip(columns, postings, self._typecodes):
+                out.append(as_numpy(values, tc))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        sections = {f"{prefix}.terms.{k}": v for k, v in encode_strings(terms).items()}
+        sections[f"{prefix}.offsets"] = offsets
+        for n, (parts, tc) in enumerate(zip(columns, self._typecodes)):
+            sections[f"{prefix}.col{n}"] = np.concatenate(parts) if parts else np.empty(0, _DTYPES[tc])
+        return sections
+
+    @classmethod
+    def from_sections(cls, sections: dict, prefix: str, typecodes: tuple) -> "Postings":
+        postings = cls(typecodes)
+        postings._base_terms = _MappedStrings(
+            sections[f"{prefix}.terms.offsets"], sections[f"{prefix}.terms.blob"],
+        )
+        postings._base_keys = _RawKeys(postings._base_terms)
+        postings._base_offsets = sections[f"{prefix}.offsets"]
+        postings._base_columns = tuple(sections[f"{prefix}.col{n}"] for n in range(len(typecodes)))
+        return postings
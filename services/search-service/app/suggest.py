@@ -0,0 +1,174 @@
+"""Подсказки по префиксу: сжатый (radix) trie с готовым top-k в каждом узле.
+
+Фразы-кандидаты — названия товаров, категории и популярные поисковые запросы.
+Вес фразы складывается из частоты запроса и числа покупок товара. Фраза
+вставляется в trie с начала каждого из первых WORD_STARTS слов, поэтому
+"колод" находит и "Тормозные колодки передние VAG".
+
+После вставки каждый узел получает top-k id фраз своего поддерева, так что
+запрос — это спуск по префиксу и чтение готового списка, без обхода поддерева.
+В trie попадают только MAX_PHRASES самых весомых фраз: длинный хвост каталога
+находится обычным поиском, а память trie остаётся ограниченной.
+"""
+import heapq
+import os
+from collections import Counter
+from typing import Iterable, Optional
+
+from .text import normalize
+
+TOP_K = 10
+WORD_STARTS = 4
+MAX_PHRASES = int(os.getenv("SUGGEST_MAX_PHRASES", "100000"))
+MAX_PHRASE_LEN = 80
+QUERY_WEIGHT = 5.0
+PURCHASE_WEIGHT = 2.0
+
+
+def _key(text: str) -> str:
+    return " ".join(normalize(text).split())
+
+
+def _common_prefix_len(a: str, b: str) -> int:
+    # двоичный поиск сравнением срезов: сравнение идёт в C, а не посимвольно в Python
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class _Node:
+    __slots__ = ("edges", "ids", "top")
+
+    def __init__(self):
+        self.edges: dict = {}   # первый символ -> (метка ребра, узел)
+        self.ids: list = []     # фразы, заканчивающиеся здесь (только на время сборки)
+        self.top: tuple = ()
+
+
+class Suggester:
+    def __init__(self, phrases: list, weights: list, product_ids: list):
+        # id фразы = её место по убыванию веса: top-k узла — просто k наименьших id
+        order = sorted(range(len(phrases)), key=lambda i: -weights[i])
+        self._phrases = [phrases[i] for i in order]          # отображаемый текст
+        self._product_ids = [product_ids[i] for i in order]  # id товара или None для запросов/категорий
+        self._root = _Node()
+        entries = []
+        for pid, phrase in enumerate(self._phrases):
+            key = _key(phrase)[:MAX_PHRASE_LEN]
+            starts = [0] + [i + 1 for i, ch in enumerate(key) if ch == " "][: WORD_STARTS - 1]
+            entries.extend((key[start:], pid) for start in starts if key[start:])
+        entries.sort()
+        self._build(entries)
+        self._finalize()
+
+    @classmethod
+    def build(
+        cls,
+        products: Iterable[tuple],
+        query_counts: Counter,
+        purchases: Optional[dict] = None,
+        max_phrases: int = MAX_PHRASES,
+    ) -> "Suggester":
+        """products — (product_id, name, category); purchases — product_id -> штук продано."""
+        purchases = purchases or {}
+        weights: dict[str, float] = {}
+        display: dict[str, tuple] = {}
+
+        def add(text, weight, product_id=None):
+            if not text:
+                return
+            key = _key(text)
+            if not key:
+                return
+            weights[key] = weights.get(key, 0.0) + weight
+            if key not in display or (product_id is not None and display[key][1] is None):
+                display[key] = (text.strip(), product_id)
+
+        categories = Counter()
+        for product_id, name, category in products:
+            add(name, 1.0 + PURCHASE_WEIGHT * purchases.get(product_id, 0), product_id)
+            if category:
+                categories[category] += 1
+        for category, count in categories.items():
+            add(category, 1.0 + count ** 0.5)
+        for query, count in query_counts.items():
+            add(query, QUERY_WEIGHT * count)
+
+        best = heapq.nlargest(max_phrases, weights.items(), key=lambda kv: kv[1])
+        return cls(
+            [display[k][0] for k, _ in best],
+            [w for _, w in best],
+            [display[k][1] for k, _ in best],
+        )
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+    def _build(self, entries: list):
+        """Сжатый trie из отсортированных ключей: стек — путь к предыдущему ключу."""
+        stack = [(0, self._root)]  # (глубина в символах, узел)
+        prev = ""
+        for key, pid in entries:
+            lcp = _common_prefix_len(prev, key)
+            popped = None
+            while stack[-1][0] > lcp:
+                popped = stack.pop()
+            depth, node = stack[-1]
+            if depth < lcp:
+                # общий префикс кончается посреди ребра node -> popped: делим ребро
+                child_depth, child = popped
+                mid = _Node()
+                mid.edges[prev[lcp]] = (prev[lcp:child_depth], child)
+                node.edges[prev[depth]] = (prev[depth:lcp], mid)
+                stack.append((lcp, mid))
+                node = mid
+            if len(key) == lcp:
+                node.ids.append(pid)
+            else:
+                leaf = _Node()
+                leaf.ids.append(pid)
+                node.edges[key[lcp]] = (key[lcp:], leaf)
+                stack.append((len(key), leaf))
+            prev = key
+
+    def _finalize(self):
+        # обход в обратном порядке (дети раньше родителей) без рекурсии
+        order, stack = [], [self._root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(child for _, child in node.edges.values())
+        for node in reversed(order):
+            candidates = set(node.ids)
+            for _, child in node.edges.values():
+                candidates.update(child.top)
+            # set: одна фраза может прийти из нескольких позиций слов
+            node.top = tuple(sorted(candidates)[:TOP_K])
+            node.ids = []
+
+    def suggest(self, prefix: str, limit: int = TOP_K) -> list:
+        rest = _key(prefix)
+        if prefix[-1:].isspace() and rest:
+            rest += " "  # "масляный " — ждём следующее слово, а не "масляныйX"
+        node = self._root
+        while rest:
+            edge = node.edges.get(rest[0])
+            if edge is None:
+                return []
+            label, child = edge
+            if rest.startswith(label):
+                rest = rest[len(label):]
+            elif not label.startswith(rest):
+                return []
+            else:
+                rest = ""
+            node = child
+        return [
+            {"text": self._phrases[pid], "product_id": self._product_ids[pid]}
+            for pid in node.top[:limit]
+        ]
@@ -0,0 +1,227 @@
+"""Догоняющее обновление поискового индекса по изменениям товаров.
+
+Основной канал — Postgres LISTEN/NOTIFY: триггер на `products` (миграция
+products-service 0004) шлёт в канал `products_changed` id каждой изменённой
+строки. Id копятся в пачку и через DEBOUNCE_SECONDS перечитываются одним
+запросом; в индексе меняются только постинги этих товаров.
+
+Запасной канал — опрос `updated_at > watermark`: редкий, пока LISTEN жив, и
+частый, если соединение потеряно. Опрос не видит удалений, поэтому раз в
+RECONCILE_EVERY опросов сверяем множество id с таблицей.
+"""
+import asyncio
+import json
+import os
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+import asyncpg
+from sqlalchemy import func, select
+
+from shared.database import DATABASE_URL, async_session_maker
+from .index import SearchIndex
+from .models import DOC_COLUMNS, Product, ProductFitment, product_doc
+
+CHANNEL = "products_changed"
+DEBOUNCE_SECONDS = 0.05
+FETCH_BATCH_SIZE = 1000
+POLL_INTERVAL_LISTENING = float(os.getenv("SEARCH_POLL_INTERVAL", "30"))
+POLL_INTERVAL_FALLBACK = 2.0
+RECONNECT_DELAY = 5.0
+RECONCILE_EVERY = 30
+# updated_at = now() начала транзакции, так что строка может закоммититься
+# позже, чем сдвинулся watermark; перечитываем небольшое окно назад
+POLL_OVERLAP = timedelta(seconds=10)
+# при такой доле мёртвых doc индекс выгоднее пересобрать целиком
+REBUILD_DEAD_RATIO = 0.5
+
+
+_fitments_warned = False
+
+
+async def fetch_fitments(product_ids) -> dict:
+    """product_id -> [(engine, model)]; без таблицы применимости фасеты по ней пусты."""
+    out: dict[int, list] = {}
+    try:
+        async with async_session_maker() as session:
+            res = await session.execute(
+                select(ProductFitment.product_id, ProductFitment.engine, ProductFitment.model)
+                .where(ProductFitment.product_id.in_(list(product_ids)))
+            )
+            for product_id, engine, model in res:
+                out.setdefault(product_id, []).append((engine, model))
+    except Exception as e:
+        global _fitments_warned
+        if not _fitments_warned:
+            _fitments_warned = True
+            print(f"search-service: fitment facets unavailable: {e}")
+    return out
+
+
+class ProductChangeSync:
+    def __init__(
+        self,
+        get_index: Callable[[], Optional[SearchIndex]],
+        rebuild: Callable[[], Awaitable],
+        dsn: str = DATABASE_URL,
+    ):
+        self._get_index = get_index
+        self._rebuild = rebuild
+        self._dsn = dsn.replace("+asyncpg", "")
+        self._pending: set[int] = set()
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self.listening = False
+        # время БД на момент начала последней полной сборки индекса
+        self.watermark: Optional[datetime] = None
+        # id, применённые к старому индексу, пока строится новый
+        self._rebuild_seen: Optional[set] = None
+
+    # --- жизненный цикл ---------------------------------------------------
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._listen_loop()),
+            asyncio.create_task(self._apply_loop()),
+            asyncio.create_task(self._poll_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def catch_up(self, watermark: datetime):
+        """После загрузки снапшота: дочитать изменения и удаления с момента его сборки."""
+        self.watermark = watermark
+        await self._poll_updated()
+        await self._reconcile_deleted()
+
+    def mark(self, product_ids):
+        self._pending.update(product_ids)
+        self._wake.set()
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._rebuild_seen is not None
+
+    async def begin_rebuild(self):
+        """Вызывается перед полной сборкой: запоминаем точку отсчёта для догона."""
+        self._rebuild_seen = set()
+        async with async_session_maker() as session:
+            self.watermark = (await session.execute(select(func.now()))).scalar_one()
+
+    def end_rebuild(self):
+        """После подмены индекса повторяем изменения, случившиеся во время сборки."""
+        seen, self._rebuild_seen = self._rebuild_seen or set(), None
+        self.mark(seen)
+        self._wake.set()
+
+    # --- LISTEN -----------------------------------------------------------
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            self.mark([int(json.loads(payload)["id"])])
+        except (ValueError, KeyError, TypeError):
+            pass
+
+    async def _listen_loop(self):
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self._dsn)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda c: closed.set())
+                await conn.add_listener(CHANNEL, self._on_notify)
+                self.listening = True
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"search-service: LISTEN {CHANNEL} failed: {e}")
+            finally:
+                self.listening = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            # пока соединения нет, изменения подхватывает частый опрос
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    # --- применение изменений ---------------------------------------------
+
+    async def _apply_loop(self):
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(DEBOUNCE_SECONDS)
+            if self._get_index() is None:
+                continue  # индекс ещё строится; id останутся в пачке
+            self._wake.clear()
+            ids, self._pending = self._pending, set()
+            try:
+                await self.refresh(ids)
+            except Exception:
+                self.mark(ids)
+                traceback.print_exc()
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def refresh(self, product_ids):
+        """Перечитать товары по id: существующие — переиндексировать, пропавшие — удалить."""
+        index = self._get_index()
+        ids = sorted(product_ids)
+        if self._rebuild_seen is not None:
+            self._rebuild_seen.update(ids)
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            chunk = ids[start:start + FETCH_BATCH_SIZE]
+            async with async_session_maker() as session:
+                res = await session.execute(
+                    select(*DOC_COLUMNS)
+                    .where(Product.id.in_(chunk))
+                )
+                rows = res.all()
+            fitments = await fetch_fitments(chunk)
+            found = set()
+            for row in rows:
+                index.add(product_doc(row, fitments.get(row.id, ())))
+                found.add(row.id)
+            for product_id in set(chunk) - found:
+                index.remove(product_id)
+
+        if index.dead_ratio > REBUILD_DEAD_RATIO and not self.rebuilding:
+            asyncio.create_task(self._rebuild())
+
+    # --- опрос ------------------------------------------------------------
+
+    async def _poll_loop(self):
+        polls = 0
+        while True:
+            await asyncio.sleep(POLL_INTERVAL_LISTENING if self.listening else POLL_INTERVAL_FALLBACK)
+            if self.watermark is None or self._get_index() is None:
+                continue
+            polls += 1
+            try:
+                await self._poll_updated()
+                if polls % RECONCILE_EVERY == 0:
+                    await self._reconcile_deleted()
+            except Exception as e:
+                print(f"search-service: product poll failed: {e}")
+
+    async def _poll_updated(self):
+        async with async_session_maker() as session:
+            res = await session.execute(
+                select(Product.id, Product.updated_at)
+                .where(Product.updated_at > self.watermark - POLL_OVERLAP)
+                .order_by(Product.updated_at)
+            )
+            rows = res.all()
+        if rows:
+            self.watermark = max(self.watermark, rows[-1].updated_at)
+            self.mark(r.id for r in rows)
+
+    async def _reconcile_deleted(self):
+        async with async_session_maker() as session:
+            result = await session.stream_scalars(select(Product.id).execution_options(yield_per=10000))
+            existing = {product_id async for product_id in result}
+        gone = set(self._get_index().product_ids()) - existing
+        if gone:
+            self.mark(gone)
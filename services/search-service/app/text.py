@@ -0,0 +1,71 @@
+"""Токенизация и стемминг русского / английского текста для поиска.
+
+Стеммер — Snowball (пакет `snowballstemmer`); если его нет, используется
+грубое отсечение типичных окончаний. Стемы кэшируются: словарь каталога
+невелик, а стемминг — самая дорогая часть индексации.
+"""
+import re
+from functools import lru_cache
+
+try:
+    import snowballstemmer
+    _STEMMERS = {"ru": snowballstemmer.stemmer("russian"), "en": snowballstemmer.stemmer("english")}
+except ImportError:  # pragma: no cover - depends on the environment
+    _STEMMERS = None
+
+# слово, число или составной токен: "2.0", "06h-115-561", "1.4/1.8"
+_TOKEN_RE = re.compile(r"[0-9a-zа-я]+(?:[./\-][0-9a-zа-я]+)*")
+_CYRILLIC_RE = re.compile(r"[а-я]")
+_PART_SPLIT_RE = re.compile(r"[./\-]")
+
+STOPWORDS = frozenset(
+    "и в во на с со к ко по для от до из у о об а но или не без при the a an and or of for to in on with by".split()
+)
+
+_RU_ENDINGS = tuple(sorted(
+    "ами ями ого его ому ему ыми ими ой ей ий ый ая яя ое ее ые ие ую юю ах ях ов ев ам ям ом ем а я о е ы и у ю ь".split(),
+    key=len, reverse=True,
+))
+_EN_ENDINGS = ("ing", "ies", "es", "ed", "s")
+
+
+def _fallback_stem(word: str, lang: str) -> str:
+    for ending in (_RU_ENDINGS if lang == "ru" else _EN_ENDINGS):
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[: -len(ending)]
+    return word
+
+
+@lru_cache(maxsize=200_000)
+def stem(word: str) -> str:
+    if not word.isalpha():
+        return word  # номера, объёмы двигателей и артикулы не трогаем
+    lang = "ru" if _CYRILLIC_RE.search(word) else "en"
+    if _STEMMERS is None:
+        return _fallback_stem(word, lang)
+    return _STEMMERS[lang].stemWord(word)
+
+
+def normalize(text: str) -> str:
+    return (text or "").lower().replace("ё", "е")
+
+
+def words(text: str) -> list[str]:
+    """Нормализованные слова без стемминга (для подсказок и нечёткого поиска)."""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def tokenize(text: str) -> list[str]:
+    """Термы для индекса: стемы слов; составной токен даёт себя и свои части."""
+    return terms_of(words(text))
+
+
+def terms_of(tokens: list[str]) -> list[str]:
+    terms = []
+    for token in tokens:
+        if token in STOPWORDS:
+            continue
+        terms.append(stem(token))
+        if not token.isalnum():
+            terms.extend(stem(part) for part in _PART_SPLIT_RE.split(token) if part and part not in STOPWORDS)
+    return terms
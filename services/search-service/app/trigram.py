@@ -0,0 +1,158 @@
+"""Триграммный словарь слов каталога для исправления опечаток.
+
+Для каждого слова хранятся его триграммы ("$колодки$" -> "$ко", "кол", ...),
+постинги триграммы — плоский массив id слов. Кандидаты на исправление — слова,
+у которых с запросом достаточно общих триграмм (одна правка портит не больше
+трёх), отсечённые по длине; дальше ограниченное расстояние Дамерау–Левенштейна
+проверяет только лучшие MAX_CANDIDATES из них.
+
+Частота слова — число живых товаров, где оно встречается: `add` её
+увеличивает, `discard` уменьшает. Слово с нулевой частотой выпадает из
+словаря (не предлагается и не считается известным); его строка и постинги
+остаются до пересборки индекса и переиспользуются, если слово вернётся.
+"""
+from array import array
+from typing import Optional
+
+import numpy as np
+
+from .storage import Postings, StringColumn, as_numpy, to_array
+
+MAX_CANDIDATES = 128
+
+
+def trigrams(word: str) -> set:
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+
+
+def max_distance(word: str) -> int:
+    # короткие слова не исправляем: "ая" -> "ай" чаще ломает, чем чинит
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 6 else 2
+
+
+def edit_distance(a: str, b: str, bound: int) -> int:
+    """Расстояние Дамерау–Левенштейна (OSA) или bound + 1, если оно больше bound."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+            row_min = min(row_min, d)
+        if row_min > bound:
+            return bound + 1  # дальше строка только растёт
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= bound else bound + 1
+
+
+class TrigramIndex:
+    """Словарь слов каталога с постингами триграмм."""
+
+    def __init__(self):
+        self._id: Optional[dict] = {}
+        self._words = StringColumn()
+        self._lengths = array("H")
+        self._counts = array("I")
+        self._grams = Postings(("i",))
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __contains__(self, word: str) -> bool:
+        wid = self._ids().get(word)
+        return wid is not None and self._counts[wid] > 0
+
+    def _ids(self) -> dict:
+        # после загрузки снапшота слово -> id строится при первой записи, не на старте
+        if self._id is None:
+            self._id = {word: wid for wid, word in enumerate(self._words)}
+        return self._id
+
+    def add(self, word: str) -> int:
+        """+1 к частоте слова; вернуть его id (для `discard`)."""
+        ids = self._ids()
+        wid = ids.get(word)
+        if wid is not None:
+            self._counts[wid] += 1
+            return wid
+        wid = ids[word] = len(self._words)
+        self._words.append(word)
+        self._lengths.append(min(len(word), 65535))
+        self._counts.append(1)
+        for gram in trigrams(word):
+            self._grams.mutable(gram)[0].append(wid)
+        return wid
+
+    def discard(self, wid: int):
+        """-1 к частоте слова с id wid (товар со словом удалён или изменён)."""
+        if self._counts[wid] > 0:
+            self._counts[wid] -= 1
+
+    def to_sections(self, prefix: str) -> dict:
+        sections = self._grams.to_sections(f"{prefix}.grams")
+        sections.update(self._words.to_sections(f"{prefix}.words"))
+        sections[f"{prefix}.lengths"] = as_numpy(self._lengths, "H")
+        sections[f"{prefix}.counts"] = as_numpy(self._counts, "I")
+        return sections
+
+    @classmethod
+    def from_sections(cls, sections: dict, prefix: str) -> "TrigramIndex":
+        vocabulary = cls()
+        vocabulary._id = None
+        vocabulary._words = StringColumn.from_sections(sections, f"{prefix}.words")
+        vocabulary._lengths = to_array(sections[f"{prefix}.lengths"], "H")
+        vocabulary._counts = to_array(sections[f"{prefix}.counts"], "I")
+        vocabulary._grams = Postings.from_sections(sections, f"{prefix}.grams", ("i",))
+        return vocabulary
+
+    def lookup(self, word: str, limit: int = 3, max_dist: Optional[int] = None) -> list:
+        """Ближайшие слова словаря: [(word, distance)], по расстоянию, затем по частоте."""
+        bound = max_distance(word) if max_dist is None else max_dist
+        if bound == 0 or not self._words:
+            return []
+        query_grams = trigrams(word)
+        grams = [p for p in map(self._grams.get, query_grams) if p is not None]
+        if not grams:
+            return []
+        shared = np.bincount(
+            np.concatenate([as_numpy(p[0], "i") for p in grams]),
+            minlength=len(self._words),
+        )
+        n_grams = len(query_grams)
+        lengths = np.frombuffer(self._lengths, dtype=np.uint16).astype(np.int32)
+        alive = as_numpy(self._counts, "I") > 0
+        candidates = np.flatnonzero(
+            (shared >= max(1, n_grams - 3 * bound)) & (np.abs(lengths - len(word)) <= bound) & alive
+        )
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = candidates[np.argpartition(-shared[candidates], MAX_CANDIDATES - 1)[:MAX_CANDIDATES]]
+        # от самых похожих по триграммам: как только набрано limit совпадений,
+        # граница сужается до худшего из них, и остальных кандидатов отсекает счётчик
+        candidates = candidates[np.argsort(-shared[candidates], kind="stable")]
+
+        found = []
+        for wid, common in zip(candidates.tolist(), shared[candidates].tolist()):
+            if common < n_grams - 3 * bound:
+                break
+            candidate = self._words[wid]
+            if candidate == word:
+                continue
+            dist = edit_distance(word, candidate, bound)
+            if dist <= bound:
+                found.append((dist, -self._counts[wid], candidate))
+                if len(found) >= limit:
+                    found.sort()
+                    found = found[:limit]
+                    bound = found[-1][0]
+        found.sort()
+        return [(w, d) for d, _, w in found[:limit]]
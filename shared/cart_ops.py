@@ -0,0 +1,20 @@
+"""Свёртка пакета операций корзины (PATCH /api/cart) в план по товарам.
+
+Общая для монолита (app/cart.py) и cart-service: оба принимают одинаковые
+операции add/set/remove и должны применять их одинаково.
+"""
+
+
+def fold_ops(ops) -> dict:
+    """Операции -> product_id: (absolute, quantity); absolute — итоговое количество, иначе прибавка."""
+    plan = {}
+    for op in ops:
+        absolute, quantity = plan.get(op.product_id, (False, 0))
+        if op.op == "add":
+            quantity += op.quantity
+        elif op.op == "set":
+            absolute, quantity = True, op.quantity
+        else:
+            absolute, quantity = True, 0
+        plan[op.product_id] = (absolute, quantity)
+    return plan
@@ -0,0 +1,185 @@
+"""Потоковый импорт прайс-листов поставщиков (CSV / NDJSON).
+
+Файл читается построчно и валидируется пачками по CHUNK_SIZE строк, поэтому
+память не растёт с размером прайса. Валидные строки пачки грузятся через COPY
+во временную staging-таблицу, после чего одним запросом UPSERT_SQL
+переносятся в `products` (ключ — артикул `sku`).
+
+Модуль используется и products-service (`POST /api/products/import`), и
+CLI `scripts/import_catalog.py`, поэтому здесь только stdlib.
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Iterator, Optional, TextIO
+
+FORMATS = ("csv", "ndjson")
+CHUNK_SIZE = 5000
+# сколько ошибок на пачку отдаём клиенту (остальные только считаем)
+MAX_ERRORS_PER_CHUNK = 20
+
+STAGING_TABLE = "products_import_staging"
+STAGING_COLUMNS = ("line", "sku", "name", "description", "price", "category", "image_url", "stock")
+
+# Временная таблица живёт до конца соединения, строки чистятся на каждом COMMIT,
+# так что после каждой пачки staging снова пустая.
+STAGING_DDL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+    line BIGINT NOT NULL,
+    sku VARCHAR(64) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    price NUMERIC(10, 2) NOT NULL,
+    category VARCHAR(100),
+    image_url VARCHAR(255),
+    stock INTEGER NOT NULL
+) ON COMMIT DELETE ROWS
+"""
+
+# Если артикул встречается в пачке несколько раз — побеждает последняя строка.
+# (xmax = 0) истинно только для вставленных строк, так считаем inserted/updated.
+# Каждая смена цены дописывается в product_price_history тем же UPSERT, что и
+# _APPEND_PRICE_SQL монолита (app/shop.py): `prev` видит цены до UPSERT — все CTE
+# работают на одном снимке. Новый товар получает первую точку; у старого товара
+# без истории первой точкой становится прежняя цена.
+UPSERT_SQL = f"""
+WITH prev AS (
+    SELECT id, price FROM products
+    WHERE sku IN (SELECT sku FROM {STAGING_TABLE})
+),
+upserted AS (
+    INSERT INTO products (sku, name, description, price, category, image_url, stock)
+    SELECT DISTINCT ON (sku) sku, name, description, price, category, image_url, stock
+    FROM {STAGING_TABLE}
+    ORDER BY sku, line DESC
+    ON CONFLICT (sku) DO UPDATE SET
+        name = EXCLUDED.name,
+        description = COALESCE(EXCLUDED.description, products.description),
+        price = EXCLUDED.price,
+        category = COALESCE(EXCLUDED.category, products.category),
+        image_url = COALESCE(EXCLUDED.image_url, products.image_url),
+        stock = EXCLUDED.stock
+    RETURNING id, price, (xmax = 0) AS inserted
+),
+price_history AS (
+    INSERT INTO product_price_history AS h
+        (product_id, first_at, first_price, last_at, last_price, at_deltas, price_deltas)
+    SELECT u.id, t.at, (coalesce(p.price, u.price) * 100)::bigint, t.at, (u.price * 100)::bigint,
+           CASE WHEN p.id IS NULL THEN '{{}}'::int[] ELSE '{{0}}'::int[] END,
+           CASE WHEN p.id IS NULL THEN '{{}}'::bigint[]
+                ELSE ARRAY[((u.price - p.price) * 100)::bigint] END
+    FROM upserted u
+    LEFT JOIN prev p ON p.id = u.id
+    CROSS JOIN (SELECT extract(epoch FROM now())::bigint AS at) t
+    WHERE p.id IS NULL OR p.price <> u.price
+    ON CONFLICT (product_id) DO UPDATE SET
+        at_deltas = h.at_deltas || (EXCLUDED.last_at - h.last_at)::int,
+        price_deltas = h.price_deltas || (EXCLUDED.last_price - h.last_price)::bigint,
+        last_at = EXCLUDED.last_at,
+        last_price = EXCLUDED.last_price
+)
+SELECT
+    COUNT(*) FILTER (WHERE inserted) AS inserted,
+    COUNT(*) FILTER (WHERE NOT inserted) AS updated
+FROM upserted
+"""
+
+
+class RowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportBatch:
+    rows: list = field(default_factory=list)      # кортежи в порядке STAGING_COLUMNS
+    errors: list = field(default_factory=list)    # первые MAX_ERRORS_PER_CHUNK ошибок
+    rejected: int = 0
+    last_line: int = 0
+
+
+def _text(raw: dict, key: str, max_len: int, required: bool = False) -> Optional[str]:
+    value = raw.get(key)
+    if value is None:
+        value = ""
+    value = str(value).strip()
+    if not value:
+        if required:
+            raise RowError(f"поле {key} обязательно")
+        return None
+    if len(value) > max_len:
+        raise RowError(f"поле {key} длиннее {max_len} символов")
+    return value
+
+
+def validate_row(line: int, raw: dict) -> tuple:
+    """Проверить строку прайса и вернуть кортеж для staging-таблицы."""
+    if not isinstance(raw, dict):
+        raise RowError("ожидался объект")
+
+    sku = _text(raw, "sku", 64, required=True)
+    name = _text(raw, "name", 255, required=True)
+    description = _text(raw, "description", 10_000)
+    category = _text(raw, "category", 100)
+    image_url = _text(raw, "image_url", 255)
+
+    price_raw = _text(raw, "price", 32, required=True).replace(",", ".")
+    try:
+        price = Decimal(price_raw).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise RowError(f"некорректная цена: {price_raw}")
+    if not price.is_finite() or price < 0 or price >= Decimal("100000000"):
+        raise RowError(f"некорректная цена: {price_raw}")
+
+    stock_raw = _text(raw, "stock", 16)
+    try:
+        stock = int(stock_raw) if stock_raw is not None else 0
+    except ValueError:
+        raise RowError(f"некорректный остаток: {stock_raw}")
+    if stock < 0:
+        raise RowError("остаток не может быть отрицательным")
+
+    return (line, sku, name, description, price, category, image_url, stock)
+
+
+def iter_raw_rows(stream: TextIO, fmt: str) -> Iterator[tuple]:
+    """Отдаёт (номер строки, dict | RowError) без чтения файла целиком."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for raw in reader:
+            yield reader.line_num, raw
+        return
+
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, RowError("некорректный JSON")
+
+
+def iter_batches(stream: TextIO, fmt: str, chunk_size: int = CHUNK_SIZE) -> Iterator[ImportBatch]:
+    """Разбить прайс на провалидированные пачки по chunk_size строк."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported format: {fmt}")
+
+    batch = ImportBatch()
+    seen = 0
+    for line_no, raw in iter_raw_rows(stream, fmt):
+        seen += 1
+        batch.last_line = line_no
+        try:
+            if isinstance(raw, RowError):
+                raise raw
+            batch.rows.append(validate_row(line_no, raw))
+        except RowError as e:
+            batch.rejected += 1
+            if len(batch.errors) < MAX_ERRORS_PER_CHUNK:
+                batch.errors.append({"line": line_no, "error": str(e)})
+        if seen == chunk_size:
+            yield batch
+            batch = ImportBatch()
+            seen = 0
+    if seen:
+        yield batch
@@ -0,0 +1,21 @@
+"""Курсоры keyset-пагинации истории заказов: (created_at, id) <-> непрозрачная строка.
+
+Общие для монолита (app/orders.py) и orders-service: оба листают заказы по
+одному ключу сортировки. Битый курсор — ValueError, вызывающий отвечает 400.
+"""
+import base64
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{order_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except UnicodeDecodeError as e:
+        raise ValueError("invalid cursor") from e
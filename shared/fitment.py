@@ -0,0 +1,274 @@
+"""Применимость запчастей (двигатель / модель / год) и bitmap-индекс по ней.
+
+Строки таблицы `product_fitments` раскладываются в битовые карты: на каждое
+значение поля (engine="2.0 tsi", model="golf", year=2015, category=...) —
+массив uint64, где бит N означает «товар с внутренним номером N подходит».
+Запрос `engine=2.0 TSI AND category=brakes` — это побитовое AND нескольких
+массивов NumPy, без обхода каталога.
+
+Битовые карты знают только «товар подходит к значению поля», но не к какой
+именно строке применимости. Поэтому когда фильтр задан по нескольким полям
+применимости сразу, кандидаты с несколькими строками дополнительно
+проверяются по самим строкам (их немного).
+"""
+import re
+from datetime import date
+from typing import Iterable, Optional
+
+import numpy as np
+
+FITMENT_FIELDS = ("engine", "model", "year")
+INDEX_FIELDS = FITMENT_FIELDS + ("category",)
+YEAR_MIN = 1980
+# NULL в поле строки применимости = «подходит к любому значению»
+ANY = "*"
+
+VAG_MODELS = (
+    "Golf", "Passat", "Polo", "Jetta", "Tiguan", "Touareg", "Touran", "Caddy", "Transporter",
+    "Octavia", "Fabia", "Superb", "Kodiaq", "Karoq", "Rapid", "Yeti",
+    "Leon", "Ibiza", "Ateca", "A3", "A4", "A5", "A6", "Q3", "Q5", "Q7",
+)
+_ENGINE_RE = re.compile(r"(\d\.\d(?:\s*/\s*\d\.\d)*)\s*(TSI|TFSI|TDI|FSI|MPI)\b", re.IGNORECASE)
+_MODEL_RE = re.compile(r"\b(%s)\b" % "|".join(VAG_MODELS), re.IGNORECASE)
+_YEARS_RE = re.compile(r"\b((?:19|20)\d{2})\s*[-–]\s*((?:19|20)\d{2})?")
+
+
+def normalize(value) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+def year_max() -> int:
+    return date.today().year + 1
+
+
+def parse_fitment(name: str) -> list[dict]:
+    """Вытащить применимость из свободного текста названия товара.
+
+    "Воздушный фильтр VAG (1.4/1.8/2.0 TSI)" ->
+    [{"engine": "1.4 TSI", ...}, {"engine": "1.8 TSI", ...}, {"engine": "2.0 TSI", ...}]
+    """
+    engines = []
+    for volumes, family in _ENGINE_RE.findall(name or ""):
+        for volume in volumes.split("/"):
+            engines.append(f"{volume.strip()} {family.upper()}")
+    models = [m for m in VAG_MODELS if any(m.lower() == found.lower() for found in _MODEL_RE.findall(name or ""))]
+    year_from = year_to = None
+    m = _YEARS_RE.search(name or "")
+    if m:
+        year_from = int(m.group(1))
+        year_to = int(m.group(2)) if m.group(2) else None
+
+    if not engines and not models and year_from is None:
+        return []
+    return [
+        {"engine": engine, "model": model, "year_from": year_from, "year_to": year_to}
+        for engine in (engines or [None])
+        for model in (models or [None])
+    ]
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(words)
+    return np.unpackbits(words.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+
+def _row_keys(row: dict) -> set:
+    keys = set()
+    for field in ("engine", "model"):
+        value = row.get(field)
+        keys.add((field, normalize(value) if value else ANY))
+    year_from, year_to = row.get("year_from"), row.get("year_to")
+    if year_from is None and year_to is None:
+        keys.add(("year", ANY))
+    else:
+        lo = max(year_from or YEAR_MIN, YEAR_MIN)
+        hi = min(year_to or year_max(), year_max())
+        keys.update(("year", y) for y in range(lo, hi + 1))
+    return keys
+
+
+def _row_matches(row: dict, filters: dict) -> bool:
+    for field in ("engine", "model"):
+        wanted = filters.get(field)
+        if wanted and row.get(field) and normalize(row[field]) not in wanted:
+            return False
+    years = filters.get("year")
+    if years:
+        lo = row.get("year_from") or YEAR_MIN
+        hi = row.get("year_to") or year_max()
+        if not any(lo <= y <= hi for y in years):
+            return False
+    return True
+
+
+class FitmentIndex:
+    """Битовые карты поверх внутренних номеров товаров (doc id)."""
+
+    def __init__(self, capacity: int = 1024):
+        self._capacity = max(64, -(-capacity // 64) * 64)
+        self._doc_of: dict[int, int] = {}
+        self._product_ids = np.full(self._capacity, -1, dtype=np.int64)
+        self._alive = self._empty()
+        self._bitmaps: dict[tuple, np.ndarray] = {}
+        self._doc_keys: list[set] = []
+        self._doc_rows: list[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._doc_of)
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros(self._capacity // 64, dtype=np.uint64)
+
+    def _grow(self):
+        old_words = self._capacity // 64
+        self._capacity *= 2
+        pad = self._capacity // 64 - old_words
+        for key, words in self._bitmaps.items():
+            self._bitmaps[key] = np.concatenate([words, np.zeros(pad, dtype=np.uint64)])
+        self._alive = np.concatenate([self._alive, np.zeros(pad, dtype=np.uint64)])
+        self._product_ids = np.concatenate([self._product_ids, np.full(self._capacity - len(self._product_ids), -1, dtype=np.int64)])
+
+    def _set_bit(self, words: np.ndarray, doc: int, on: bool = True):
+        mask = np.uint64(1) << np.uint64(doc & 63)
+        if on:
+            words[doc >> 6] |= mask
+        else:
+            words[doc >> 6] &= ~mask
+
+    def _doc(self, product_id: int) -> int:
+        doc = self._doc_of.get(product_id)
+        if doc is None:
+            doc = len(self._doc_keys)
+            if doc >= self._capacity:
+                self._grow()
+            self._doc_of[product_id] = doc
+            self._product_ids[doc] = product_id
+            self._doc_keys.append(set())
+            self._doc_rows.append(())
+        return doc
+
+    def bulk_load(self, items: Iterable[tuple]):
+        """Построить индекс с нуля из (product_id, category, rows) — на порядок быстрее replace()."""
+        docs_by_key: dict[tuple, list] = {}
+        for product_id, category, rows in items:
+            doc = self._doc(product_id)
+            rows = tuple(dict(r) for r in rows)
+            keys = set()
+            for row in rows:
+                keys |= _row_keys(row)
+            if category:
+                keys.add(("category", normalize(category)))
+            for key in keys:
+                docs_by_key.setdefault(key, []).append(doc)
+            self._doc_keys[doc] = keys
+            self._doc_rows[doc] = rows
+
+        def pack(docs) -> np.ndarray:
+            bits = np.zeros(self._capacity, dtype=bool)
+            bits[np.asarray(docs, dtype=np.int64)] = True
+            return np.packbits(bits, bitorder="little").view(np.uint64)
+
+        self._bitmaps = {key: pack(docs) for key, docs in docs_by_key.items()}
+        self._alive = pack(list(self._doc_of.values()))
+
+    def replace(self, product_id: int, category: Optional[str], rows: Iterable[dict]):
+        """Заменить применимость одного товара (точечное обновление после изменений)."""
+        doc = self._doc(product_id)
+        rows = tuple(dict(r) for r in rows)
+        keys = set()
+        for row in rows:
+            keys |= _row_keys(row)
+        if category:
+            keys.add(("category", normalize(category)))
+
+        for key in self._doc_keys[doc] - keys:
+            self._set_bit(self._bitmaps[key], doc, False)
+        for key in keys - self._doc_keys[doc]:
+            words = self._bitmaps.get(key)
+            if words is None:
+                words = self._bitmaps[key] = self._empty()
+            self._set_bit(words, doc)
+        self._doc_keys[doc] = keys
+        self._doc_rows[doc] = rows
+        self._set_bit(self._alive, doc)
+
+    def remove(self, product_id: int):
+        doc = self._doc_of.get(product_id)
+        if doc is None:
+            return
+        for key in self._doc_keys[doc]:
+            self._set_bit(self._bitmaps[key], doc, False)
+        self._doc_keys[doc] = set()
+        self._doc_rows[doc] = ()
+        self._set_bit(self._alive, doc, False)
+
+    def _field_bitmap(self, field: str, values: list) -> np.ndarray:
+        # значения одного поля объединяются через OR; строки с NULL подходят к любому
+        acc = self._empty()
+        keys = [(field, v) for v in values]
+        if field != "category":
+            keys.append((field, ANY))
+        for key in keys:
+            words = self._bitmaps.get(key)
+            if words is not None:
+                np.bitwise_or(acc, words, out=acc)
+        return acc
+
+    def _docs(self, words: np.ndarray, limit: Optional[int] = None) -> np.ndarray:
+        # распаковываем только ненулевые слова (и только первые limit бит)
+        nz = np.flatnonzero(words)
+        if limit is not None and len(nz):
+            cut = int(np.searchsorted(np.cumsum(_popcount(words[nz])), limit)) + 1
+            nz = nz[:cut]
+        bits = np.flatnonzero(np.unpackbits(words[nz].view(np.uint8), bitorder="little"))
+        docs = nz[bits >> 6] * 64 + (bits & 63)
+        return docs[:limit] if limit is not None else docs
+
+    def _match(self, filters: dict) -> tuple:
+        wanted = {}
+        for field, value in filters.items():
+            if field not in INDEX_FIELDS:
+                raise ValueError(f"unknown fitment field: {field}")
+            if value is None or value == [] or value == "":
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            wanted[field] = [int(v) for v in values] if field == "year" else [normalize(v) for v in values]
+
+        acc = self._alive.copy()
+        for field, values in wanted.items():
+            np.bitwise_and(acc, self._field_bitmap(field, values), out=acc)
+        verify = sum(1 for f in FITMENT_FIELDS if f in wanted) > 1
+        return acc, wanted, verify
+
+    def _verified(self, docs: np.ndarray, wanted: dict) -> np.ndarray:
+        return np.array(
+            [d for d in docs if len(self._doc_rows[d]) <= 1 or any(_row_matches(r, wanted) for r in self._doc_rows[d])],
+            dtype=np.int64,
+        )
+
+    def query(self, limit: Optional[int] = None, **filters) -> np.ndarray:
+        """id товаров под фильтр: поля из INDEX_FIELDS, значение — одно или список."""
+        acc, wanted, verify = self._match(filters)
+        if verify:
+            docs = self._verified(self._docs(acc), wanted)[:limit]
+        else:
+            docs = self._docs(acc, limit)
+        return self._product_ids[docs]
+
+    def count(self, **filters) -> int:
+        acc, wanted, verify = self._match(filters)
+        if verify:
+            return len(self._verified(self._docs(acc), wanted))
+        return int(_popcount(acc).sum())
+
+    def values(self, field: str) -> dict:
+        """Значение поля -> сколько живых товаров с ним (для фильтров в UI)."""
+        out = {}
+        for (f, value), words in self._bitmaps.items():
+            if f != field or value == ANY:
+                continue
+            count = int(_popcount(np.bitwise_and(words, self._alive)).sum())
+            if count:
+                out[value] = count
+        return out
@@ -0,0 +1,199 @@
+"""Денормализованная модель чтения заказов (CQRS) для профиля, истории и дашбордов.
+
+Две таблицы:
+
+* `order_summaries` — строка на заказ: статус, сумма, валюта, число позиций;
+  ключ (source, order_id), потому что заказы ведут две реализации — монолит
+  (`shop`, app/orders.py) и orders-service (`orders`) — с независимыми id;
+* `user_order_stats` — агрегаты пользователя: число заказов, потраченная сумма
+  (заказы в статусах SPEND_STATUSES, без конвертации валют) и последний заказ.
+
+Запись — в той же транзакции, что и изменение заказа, инкрементально:
+`order_created_stmt` при создании, `status_changed_stmt` при смене статуса.
+Оба — один запрос с data-modifying CTE; повтор создания ничего не удваивает
+(ON CONFLICT DO NOTHING по сводке), повтор того же статуса — no-op.
+Заказы монолита без сводки (созданные до модели чтения) догружаются на
+старте `backfill_shop_summaries`; полная пересборка из нормализованных
+таблиц — scripts/rebuild_order_read_model.py.
+"""
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Index, Integer, MetaData, Numeric, PrimaryKeyConstraint,
+    String, Table, and_, case, func, literal, or_, select, text, update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+SOURCE_SHOP = "shop"
+SOURCE_ORDERS = "orders"
+# статусы, в которых заказ оплачен и входит в lifetime_spend
+SPEND_STATUSES = ("paid", "shipped", "delivered")
+
+metadata = MetaData()
+
+order_summaries = Table(
+    "order_summaries", metadata,
+    Column("source", String(16), nullable=False),
+    Column("order_id", BigInteger, nullable=False),
+    Column("user_id", Integer, nullable=False),
+    Column("status", String(50), nullable=False),
+    Column("amount", Numeric(12, 2), nullable=False, server_default="0"),
+    Column("currency", String(10)),
+    Column("items_count", Integer, nullable=False, server_default="0"),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    PrimaryKeyConstraint("source", "order_id", name="pk_order_summaries"),
+    # история пользователя: keyset по (created_at, order_id)
+    Index("ix_order_summaries_user_created", "user_id", "created_at", "order_id"),
+)
+
+user_order_stats = Table(
+    "user_order_stats", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("order_count", Integer, nullable=False, server_default="0"),
+    Column("lifetime_spend", Numeric(14, 2), nullable=False, server_default="0"),
+    Column("last_order_source", String(16)),
+    Column("last_order_id", BigInteger),
+    Column("last_order_at", DateTime(timezone=True)),
+    Column("last_order_status", String(50)),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+
+def _spend(status, amount):
+    return case((status.in_(SPEND_STATUSES), amount), else_=0)
+
+
+def order_created_stmt(source: str, order_id: int, user_id: int, status: str, amount, currency,
+                       items_count: int, created_at):
+    """Сводка заказа + агрегаты пользователя одним запросом."""
+    summary = (
+        pg_insert(order_summaries)
+        .values(
+            source=source, order_id=order_id, user_id=user_id, status=status,
+            amount=amount or 0, currency=currency, items_count=items_count, created_at=created_at,
+        )
+        .on_conflict_do_nothing()
+        .returning(*order_summaries.c)
+        .cte("summary")
+    )
+    ins = pg_insert(user_order_stats).from_select(
+        ["user_id", "order_count", "lifetime_spend",
+         "last_order_source", "last_order_id", "last_order_at", "last_order_status"],
+        select(
+            summary.c.user_id, literal(1), _spend(summary.c.status, summary.c.amount),
+            summary.c.source, summary.c.order_id, summary.c.created_at, summary.c.status,
+        ),
+    )
+    stats, new = user_order_stats.c, ins.excluded
+    newer = or_(stats.last_order_at.is_(None), new.last_order_at >= stats.last_order_at)
+    return ins.on_conflict_do_update(
+        index_elements=[stats.user_id],
+        set_={
+            "order_count": stats.order_count + 1,
+            "lifetime_spend": stats.lifetime_spend + new.lifetime_spend,
+            "last_order_source": case((newer, new.last_order_source), else_=stats.last_order_source),
+            "last_order_id": case((newer, new.last_order_id), else_=stats.last_order_id),
+            "last_order_at": case((newer, new.last_order_at), else_=stats.last_order_at),
+            "last_order_status": case((newer, new.last_order_status), else_=stats.last_order_status),
+            "updated_at": func.now(),
+        },
+    ).add_cte(summary)
+
+
+def status_changed_stmt(source: str, order_id: int, status: str):
+    """Новый статус в сводке и поправка агрегатов на разницу «старый -> новый»."""
+    # Строка сводки блокируется до UPDATE: конкурентная смена статуса того же
+    # заказа ждёт здесь и затем видит уже новый статус, а не тот же устаревший —
+    # иначе обе прошли бы проверку `!= status` и применили разницу дважды.
+    locked = (
+        select(order_summaries.c.status.label("old_status"))
+        .where(order_summaries.c.source == source, order_summaries.c.order_id == order_id)
+        .with_for_update()
+        .cte("locked")
+        .prefix_with("MATERIALIZED")
+    )
+    changed = (
+        update(order_summaries)
+        .where(
+            order_summaries.c.source == source,
+            order_summaries.c.order_id == order_id,
+            locked.c.old_status != status,
+        )
+        .values(status=status, updated_at=func.now())
+        .returning(order_summaries.c.user_id, order_summaries.c.amount, locked.c.old_status)
+        .cte("changed")
+    )
+    stats = user_order_stats.c
+    is_last = and_(stats.last_order_source == source, stats.last_order_id == order_id)
+    return (
+        update(user_order_stats)
+        .where(stats.user_id == changed.c.user_id)
+        .values(
+            lifetime_spend=stats.lifetime_spend
+            + _spend(literal(status), changed.c.amount)
+            - _spend(changed.c.old_status, changed.c.amount),
+            last_order_status=case((is_last, status), else_=stats.last_order_status),
+            updated_at=func.now(),
+        )
+        .add_cte(locked, changed)
+    )
+
+
+# Сводки для заказов монолита, у которых их ещё нет; повторный запуск — no-op.
+_MISSING_SHOP_SUMMARIES_SQL = text(f"""
+    INSERT INTO order_summaries (source, order_id, user_id, status, amount, currency, items_count, created_at)
+    SELECT '{SOURCE_SHOP}', o.id, o.user_id, o.status, o.total_price, NULL,
+           (SELECT count(*) FROM order_items i WHERE i.order_id = o.id), coalesce(o.created_at, now())
+    FROM orders o
+    WHERE o.user_id IS NOT NULL
+    ON CONFLICT (source, order_id) DO NOTHING
+    RETURNING user_id
+""")
+
+# Агрегаты заданных пользователей заново из всех их сводок.
+_RECOMPUTE_STATS_SQL = text("""
+    INSERT INTO user_order_stats (user_id, order_count, lifetime_spend,
+                                  last_order_source, last_order_id, last_order_at, last_order_status)
+    SELECT DISTINCT ON (user_id) user_id,
+           count(*) OVER w,
+           sum(CASE WHEN status = ANY(:spend) THEN amount ELSE 0 END) OVER w,
+           source, order_id, created_at, status
+    FROM order_summaries
+    WHERE user_id = ANY(:users)
+    WINDOW w AS (PARTITION BY user_id)
+    ORDER BY user_id, created_at DESC, order_id DESC
+    ON CONFLICT (user_id) DO UPDATE SET
+        order_count = EXCLUDED.order_count,
+        lifetime_spend = EXCLUDED.lifetime_spend,
+        last_order_source = EXCLUDED.last_order_source,
+        last_order_id = EXCLUDED.last_order_id,
+        last_order_at = EXCLUDED.last_order_at,
+        last_order_status = EXCLUDED.last_order_status,
+        updated_at = now()
+""")
+
+
+async def backfill_shop_summaries(conn) -> int:
+    """Догрузить сводки заказов монолита и пересчитать агрегаты их владельцев."""
+    users = sorted({row.user_id for row in await conn.execute(_MISSING_SHOP_SUMMARIES_SQL)})
+    if users:
+        await conn.execute(_RECOMPUTE_STATS_SQL, {"users": users, "spend": list(SPEND_STATUSES)})
+    return len(users)
+
+
+def user_stats_stmt(user_id: int):
+    return select(user_order_stats).where(user_order_stats.c.user_id == user_id)
+
+
+def stats_out(row) -> dict:
+    if row is None:
+        return {"order_count": 0, "lifetime_spend": "0.00", "last_order": None}
+    return {
+        "order_count": row.order_count,
+        "lifetime_spend": str(row.lifetime_spend),
+        "last_order": None if row.last_order_id is None else {
+            "source": row.last_order_source,
+            "id": row.last_order_id,
+            "created_at": row.last_order_at,
+            "status": row.last_order_status,
+        },
+    }
@@ -0,0 +1,90 @@
+"""Кэш проверенных принципалов: токен -> пользователь без JWT-декода и SELECT.
+
+Зависимости аутентификации (app/auth.py, auth-service) на каждый запрос
+декодируют JWT и ищут пользователя по email из `sub`. Кэш хранит результат
+по самому токену:
+
+* запись живёт не дольше PRINCIPAL_CACHE_TTL секунд и никогда не дольше `exp`
+  токена — просроченный токен из кэша не достать;
+* размер ограничен PRINCIPAL_CACHE_SIZE, вытесняется давно не использованная
+  запись (LRU);
+* UPDATE/DELETE пользователя через ORM сбрасывает все его записи
+  (`watch_user_changes`); bulk-UPDATE в обход ORM и изменения из других
+  процессов видны не позже чем через TTL.
+
+Кэш — на процесс, без блокировок: методы не делают await и в asyncio атомарны.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from sqlalchemy import event, inspect
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+
+class PrincipalCache:
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        # token -> (expires_at, subject, principal); порядок — от давно использованных к свежим
+        self._entries: "OrderedDict[str, tuple[float, str, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Any]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, _, principal = entry
+        if expires_at <= self._clock():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return principal
+
+    def put(self, token: str, subject: str, principal: Any, exp: Optional[float] = None):
+        now = self._clock()
+        expires_at = now + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now or self.maxsize <= 0:
+            return
+        self._entries[token] = (expires_at, subject, principal)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate_subject(self, subject: str):
+        stale = [token for token, (_, s, _) in self._entries.items() if s == subject]
+        for token in stale:
+            del self._entries[token]
+
+    def invalidate_where(self, predicate):
+        stale = [token for token, (_, _, principal) in self._entries.items() if predicate(principal)]
+        for token in stale:
+            del self._entries[token]
+
+    def clear(self):
+        self._entries.clear()
+
+
+def watch_user_changes(cache: PrincipalCache, user_model, subject_attr: str = "email"):
+    """Сбрасывать записи пользователя при изменении или удалении через ORM."""
+    def same_user(identity):
+        def predicate(principal):
+            state = inspect(principal, raiseerr=False)
+            return state is not None and state.mapper.class_ is user_model and state.identity == identity
+        return predicate
+
+    def invalidate(mapper, connection, target):
+        cache.invalidate_subject(getattr(target, subject_attr))
+        # по первичному ключу — чтобы при смене email ушли и записи со старым subject
+        cache.invalidate_where(same_user(inspect(target).identity))
+
+    event.listen(user_model, "after_update", invalidate)
+    event.listen(user_model, "after_delete", invalidate)
@@ -0,0 +1,112 @@
+"""Ресайз картинок товаров в WebP/JPEG-варианты.
+
+Исходник один раз режется на варианты из VARIANTS и сохраняется на диск под
+именем из хэша содержимого: `<sha256[:16]>-<variant>.<ext>`. Имя меняется
+вместе с содержимым, поэтому файлы можно отдавать с `Cache-Control: immutable`,
+а повторная загрузка той же картинки ничего не пересчитывает.
+
+Pillow — опциональная зависимость: без неё `build_variants` бросает
+ImagesUnavailable, а `variant_url` продолжает работать.
+"""
+import hashlib
+import io
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - depends on the environment
+    Image = None
+    ImageOps = None
+
+MEDIA_ROOT = Path(os.getenv("PRODUCT_IMAGES_DIR", "media/products"))
+MEDIA_URL = os.getenv("PRODUCT_IMAGES_URL", "/media/products")
+MAX_SOURCE_BYTES = 15 * 1024 * 1024
+
+# вариант -> максимальная сторона в пикселях
+VARIANTS = {
+    "thumb": 400,   # сетка каталога
+    "card": 800,    # карточка товара
+    "full": 1600,   # просмотр/zoom
+}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+FILENAME_RE = re.compile(r"^[0-9a-f]{16}-(%s)\.(%s)$" % ("|".join(VARIANTS), "|".join(FORMATS)))
+_STORED_URL_RE = re.compile(r"/([0-9a-f]{16})-full\.jpg$")
+
+
+class ImagesUnavailable(RuntimeError):
+    pass
+
+
+def _filename(digest: str, variant: str, ext: str) -> str:
+    return f"{digest}-{variant}.{ext}"
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def build_variants(data: bytes, root: Path = MEDIA_ROOT) -> str:
+    """Сгенерировать все варианты для исходника и вернуть URL, который пишем в image_url.
+
+    Блокирующая (CPU + диск) — из async-кода вызывать через threadpool.
+    """
+    if Image is None:
+        raise ImagesUnavailable("Pillow is not installed")
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError("image is too large")
+
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    root.mkdir(parents=True, exist_ok=True)
+    missing = [
+        (variant, ext)
+        for variant in VARIANTS
+        for ext in FORMATS
+        if not (root / _filename(digest, variant, ext)).exists()
+    ]
+    if missing:
+        try:
+            src = Image.open(io.BytesIO(data))
+            src = ImageOps.exif_transpose(src).convert("RGB")
+        except Exception as e:
+            raise ValueError(f"not an image: {e}")
+        for variant, ext in missing:
+            img = src.copy()
+            img.thumbnail((VARIANTS[variant], VARIANTS[variant]), Image.LANCZOS)
+            fmt, opts = FORMATS[ext]
+            out = io.BytesIO()
+            img.save(out, fmt, **opts)
+            _write_atomic(root / _filename(digest, variant, ext), out.getvalue())
+
+    return f"{MEDIA_URL}/{_filename(digest, 'full', 'jpg')}"
+
+
+def variant_url(image_url: Optional[str], variant: str, ext: str = "jpg") -> Optional[str]:
+    """URL нужного варианта для image_url товара.
+
+    Для внешних/старых URL (не прошедших через build_variants) возвращает
+    image_url как есть.
+    """
+    if not image_url:
+        return None
+    m = _STORED_URL_RE.search(image_url)
+    if not m:
+        return image_url
+    return f"{MEDIA_URL}/{_filename(m.group(1), variant, ext)}"
+
+
+def variant_urls(image_url: Optional[str]) -> Optional[dict]:
+    if not image_url:
+        return None
+    return {
+        variant: {ext: variant_url(image_url, variant, ext) for ext in FORMATS}
+        for variant in VARIANTS
+    }
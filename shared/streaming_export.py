@@ -0,0 +1,67 @@
+"""Потоковая выгрузка таблиц в NDJSON / CSV.
+
+Строки читаются серверным курсором (`AsyncSession.stream` + `yield_per`) и
+отдаются пачками, так что память не зависит от размера выгрузки, а первый
+байт уходит клиенту сразу после первой пачки.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+from shared.database import async_session_maker
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_BATCH_SIZE = 1000
+
+_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+async def iter_export(stmt, fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    """Выполнить stmt серверным курсором и отдавать строки пачками в формате fmt."""
+    # своя сессия: генератор живёт дольше, чем зависимость get_session запроса
+    async with async_session_maker() as session:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(columns)
+            yield buf.getvalue()
+
+        async for partition in result.partitions():
+            if fmt == "csv":
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+                writer.writerows(
+                    [_jsonable(v) for v in row] for row in partition
+                )
+                yield buf.getvalue()
+            else:
+                yield "".join(
+                    json.dumps({c: _jsonable(v) for c, v in zip(columns, row)}, ensure_ascii=False) + "\n"
+                    for row in partition
+                )
+
+
+def export_response(stmt, fmt: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        iter_export(stmt, fmt),
+        media_type=_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
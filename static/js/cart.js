@@ -22,7 +22,10 @@
     try{ return JSON.parse(localStorage.getItem('cart')||'[]') }catch(e){ return [] }
   }
 
-  function saveCart(cart){ localStorage.setItem('cart', JSON.stringify(cart)) }
+  function saveCart(cart){
+    localStorage.setItem('cart', JSON.stringify(cart))
+    if (window.vfUI && window.vfUI.syncCart) window.vfUI.syncCart()
+  }
 
   function renderCart(){
     const itemsEl = document.getElementById('items')
@@ -92,8 +95,9 @@
     }
     })
 
-    // initial render
+    // initial render, then again with items added on other devices (cart-service copy)
     renderCart()
+    if (window.vfUI && window.vfUI.pullCart) window.vfUI.pullCart().then(renderCart)
 
     // ensure header counter initialized
     if (window.vfUI && typeof window.vfUI.updateCartCount === 'function') window.vfUI.updateCartCount()
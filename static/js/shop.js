@@ -2,11 +2,16 @@
 (async function(){
   const out = document.getElementById('products')
 
-  function productsUrl(){
+  function apiBase(){
     const host = window.location.hostname
-    return (host && host !== 'localhost') ? '/api/products' : 'http://localhost:8002/api/products'
+    return (host && host !== 'localhost') ? '' : 'http://localhost:8002'
   }
 
+  function productsUrl(){ return apiBase() + '/api/products' }
+
+  // варианты картинок отдаёт products-service (/media/products/...)
+  function mediaUrl(url){ return (url && url.startsWith('/media/')) ? apiBase() + url : url }
+
   async function fetchProducts(){
     try{
       const r = await fetch(productsUrl())
@@ -22,7 +27,10 @@
     try{ return JSON.parse(localStorage.getItem('cart')||'[]') }catch(e){ return [] }
   }
 
-  function saveCart(cart){ localStorage.setItem('cart', JSON.stringify(cart)) }
+  function saveCart(cart){
+    localStorage.setItem('cart', JSON.stringify(cart))
+    if (window.vfUI && window.vfUI.syncCart) window.vfUI.syncCart()
+  }
 
   function addToCart(product){
     const cart = loadCart()
@@ -45,9 +53,13 @@
   products.forEach(p=>{
     const card = document.createElement('div')
     card.className = 'card product-card'
-    const imgSrc = p.image || '/static/img/product-placeholder-1.svg'
+    const imgSrc = mediaUrl(p.image) || '/static/img/product-placeholder-1.svg'
+    const webpSrc = mediaUrl(p.image_webp)
     card.innerHTML = `
-      <img class="product-thumb" src="${imgSrc}" alt="${p.name} thumbnail" />
+      <picture>
+        ${webpSrc && webpSrc !== imgSrc ? `<source type="image/webp" srcset="${webpSrc}" />` : ''}
+        <img class="product-thumb" src="${imgSrc}" alt="${p.name} thumbnail" loading="lazy" decoding="async" />
+      </picture>
       <h3 class="product-title">${p.name}</h3>
       <div class="product-desc">${(p.description||'').slice(0,160)}</div>
       <div class="product-price">Цена: ${Number(p.price).toFixed(2)} USD</div>
@@ -55,8 +55,106 @@
     }
   }
 
+  // push the localStorage cart to cart-service as one PATCH (debounced).
+  // base_version is the server version this copy was last synced with; if the
+  // cart changed elsewhere (another tab/device) the server answers 409, and we
+  // merge its items under ours and retry instead of overwriting them.
+  let _syncTimer = null
+  const SYNC_RETRIES = 2
+
+  function cartUrl(){
+    const host = window.location.hostname
+    return (host && host !== 'localhost') ? '/api/cart' : 'http://localhost:8003/api/cart'
+  }
+
+  function _snapshot(cart){
+    return cart.map(it=> ({ product_id: it.product_id, quantity: parseInt(it.quantity||0)||0 }))
+  }
+
+  async function _mergeServerCart(token){
+    const res = await fetch(cartUrl(), { headers: { 'Authorization': 'Bearer ' + token } })
+    if (!res.ok) return null
+    const state = await res.json()
+    const cart = getCart()
+    const local = new Set(cart.map(it=> it.product_id))
+    const added = state.items.filter(it=> !local.has(it.product_id))
+    // cart-service keeps only ids and quantities: names and prices come from the catalog
+    const products = await Promise.all(added.map(it=>
+      fetch('/api/products/' + it.product_id).then(r=> r.ok ? r.json() : {}).catch(()=> ({}))
+    ))
+    added.forEach((it, i)=>{
+      cart.push({ product_id: it.product_id, quantity: it.quantity, name: products[i].name, price: products[i].price })
+    })
+    localStorage.setItem('cart', JSON.stringify(cart))
+    localStorage.setItem('cart_version', String(state.version))
+    updateCartCount()
+    return cart
+  }
+
+  async function _pushCart(token){
+    let cart = getCart()
+    for (let attempt = 0; attempt <= SYNC_RETRIES; attempt++){
+      const res = await fetch(cartUrl(), {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json', 'Authorization': 'Bearer ' + token },
+        body: JSON.stringify({
+          snapshot: _snapshot(cart),
+          base_version: Number(localStorage.getItem('cart_version') || 0),
+        })
+      })
+      if (res.ok){
+        const state = await res.json()
+        localStorage.setItem('cart_version', String(state.version))
+        return
+      }
+      const err = await res.json().catch(()=> ({}))
+      if (res.status === 409){
+        if (err.detail && err.detail.version !== undefined) localStorage.setItem('cart_version', String(err.detail.version))
+        cart = await _mergeServerCart(token)
+        if (!cart) return
+        continue
+      }
+      if (res.status === 400) toast((err.detail && err.detail.message) || 'Не удалось обновить корзину')
+      return
+    }
+  }
+
+  function syncCart(){
+    clearTimeout(_syncTimer)
+    _syncTimer = setTimeout(async ()=>{
+      const token = getToken()
+      if (!token) return
+      try{ await _pushCart(token) }catch(e){ /* offline: next change will retry */ }
+    }, 400)
+  }
+
+  // server copy merged into the local cart (pages call it on load); local cart when logged out or offline
+  async function pullCart(){
+    const token = getToken()
+    if (!token) return getCart()
+    try{ return (await _mergeServerCart(token)) || getCart() }catch(e){ return getCart() }
+  }
+
+  // empty the cart locally and on the server right away (after a placed order)
+  async function clearCart(){
+    clearTimeout(_syncTimer)
+    localStorage.setItem('cart', '[]')
+    updateCartCount()
+    const token = getToken()
+    if (!token) return
+    try{
+      // no base_version: the order is placed, whatever the server copy holds goes too
+      const res = await fetch(cartUrl(), {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json', 'Authorization': 'Bearer ' + token },
+        body: JSON.stringify({ snapshot: [] })
+      })
+      if (res.ok) localStorage.setItem('cart_version', String((await res.json()).version))
+    }catch(e){ /* offline: the server copy is merged back on the next visit */ }
+  }
+
   // expose helpers globally
-  window.vfUI = { updateCartCount, toast, updateAuthUI, getToken, clearToken }
+  window.vfUI = { updateCartCount, toast, updateAuthUI, getToken, clearToken, syncCart, pullCart, clearCart }
   // auto-run on load
   function _onReady(){ updateCartCount(); updateAuthUI() }
   if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', _onReady)
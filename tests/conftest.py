@@ -0,0 +1,24 @@
+"""Общие помощники тестов.
+
+services/*/app — namespace-пакеты с тем же именем, что и монолит `app`,
+поэтому приложение сервиса подключается под отдельным именем:
+`service_module("search-service", "index")` -> модуль `search_app.index`.
+"""
+import importlib
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# монолит `app` и `shared` импортируются из корня репозитория и при запуске `pytest` без `-m`
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def service_module(service: str, module: str):
+    alias = service.split("-")[0] + "_app"
+    if alias not in sys.modules:
+        pkg = types.ModuleType(alias)
+        pkg.__path__ = [str(ROOT / "services" / service / "app")]
+        sys.modules[alias] = pkg
+    return importlib.import_module(f"{alias}.{module}")
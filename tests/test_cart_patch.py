@@ -0,0 +1,81 @@
+import uuid
+
+import httpx
+import pytest
+
+from app.cart import fold_ops
+from app.schemas import CartOperation
+
+
+def ops(*items):
+    return [CartOperation(op=op, product_id=pid, quantity=q) for op, pid, q in items]
+
+
+def test_adds_accumulate():
+    assert fold_ops(ops(("add", 1, 2), ("add", 1, 3), ("add", 2, 1))) == {1: (False, 5), 2: (False, 1)}
+
+
+def test_set_and_remove_are_absolute():
+    plan = fold_ops(ops(("add", 1, 2), ("set", 1, 4), ("add", 1, 1), ("add", 2, 1), ("remove", 2, 1)))
+    assert plan == {1: (True, 5), 2: (True, 0)}
+
+
+# --- endpoint: PATCH /api/cart against a running monolith -------------------
+
+SHOP_URL = "http://localhost:8000"
+
+
+def shop_available() -> bool:
+    try:
+        httpx.get(f"{SHOP_URL}/api/products", timeout=2.0)
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture
+def shopper():
+    """Fresh user (empty cart, version 0) and two products with stock."""
+    email = f"cart-{uuid.uuid4().hex[:12]}@example.com"
+    r = httpx.post(f"{SHOP_URL}/api/auth/register",
+                   json={"email": email, "full_name": "Cart Test", "password": "password123"}, timeout=10.0)
+    assert r.status_code == 201, r.text
+    r = httpx.post(f"{SHOP_URL}/api/auth/login", json={"email": email, "password": "password123"}, timeout=10.0)
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    products = [p for p in httpx.get(f"{SHOP_URL}/api/products", timeout=10.0).json() if p["stock"] >= 2]
+    if len(products) < 2:
+        pytest.skip("need two products with stock >= 2")
+    return headers, products[0]["id"], products[1]["id"]
+
+
+def patch(headers, snapshot, base_version):
+    return httpx.patch(f"{SHOP_URL}/api/cart", headers=headers, timeout=10.0,
+                       json={"snapshot": snapshot, "base_version": base_version})
+
+
+@pytest.mark.skipif(not shop_available(), reason="monolith not reachable on localhost:8000")
+def test_snapshot_replaces_server_cart(shopper):
+    headers, p1, p2 = shopper
+    r = patch(headers, [{"product_id": p1, "quantity": 2}], 0)
+    assert r.status_code == 200, r.text
+    assert r.json()["version"] == 1
+
+    r = patch(headers, [{"product_id": p2, "quantity": 1}], 1)
+    assert r.status_code == 200, r.text
+    state = r.json()
+    assert state["version"] == 2
+    assert [(it["product_id"], it["quantity"]) for it in state["items"]] == [(p2, 1)]
+
+
+@pytest.mark.skipif(not shop_available(), reason="monolith not reachable on localhost:8000")
+def test_stale_snapshot_is_rejected_with_current_version(shopper):
+    headers, p1, p2 = shopper
+    assert patch(headers, [{"product_id": p1, "quantity": 1}], 0).status_code == 200
+    # another tab changed the cart meanwhile
+    assert patch(headers, [{"product_id": p1, "quantity": 1}, {"product_id": p2, "quantity": 1}], 1).status_code == 200
+
+    r = patch(headers, [], 1)
+    assert r.status_code == 409
+    assert r.json()["detail"]["version"] == 2
+    items = httpx.get(f"{SHOP_URL}/api/cart", headers=headers, timeout=10.0).json()
+    assert sorted(it["product_id"] for it in items) == sorted([p1, p2])
@@ -0,0 +1,146 @@
+import asyncio
+
+from conftest import service_module
+
+store_mod = service_module("cart-service", "store")
+
+
+def make_store(persisted=None):
+    persisted = persisted or {}
+
+    async def loader(owner):
+        return {str(p): str(q) for p, q in persisted.get(owner, {}).items()}
+
+    return store_mod.CartStore(store_mod.MemoryRedis(), loader=loader)
+
+
+def test_mutations_and_write_behind_flush():
+    async def run():
+        store = make_store({"a@x": {7: 2}})
+        flushed = []
+
+        async def persist(carts):
+            flushed.append(carts)
+
+        flusher = store_mod.CartFlusher(store, persist=persist)
+        assert await store.add("a@x", 1, 2) == 2
+        assert await store.add("a@x", 1, 3) == 5
+        assert await store.set("a@x", 2, 1) == 1
+        assert await store.remove("a@x", 2)
+        assert await store.get("a@x") == {1: 5, 7: 2}
+
+        assert await flusher.flush() == 1
+        # снимок несёт версию: четыре изменения после загрузки
+        assert flushed == [{"a@x": (4, {1: 5, 7: 2})}]
+        # нет изменений — нечего сбрасывать
+        assert await flusher.flush() == 0
+
+        await store.clear("a@x")
+        await flusher.flush()
+        assert flushed[-1] == {"a@x": (5, {})}
+        assert await store.get("a@x") == {}
+
+    asyncio.run(run())
+
+
+def test_failed_flush_requeues_owners():
+    async def run():
+        store = make_store()
+
+        async def persist(carts):
+            raise RuntimeError("db down")
+
+        await store.add("b@x", 3, 1)
+        try:
+            await store_mod.CartFlusher(store, persist=persist).flush()
+        except RuntimeError:
+            pass
+        assert await store.redis.sismember(store_mod.DIRTY_KEY, "b@x")
+
+    asyncio.run(run())
+
+
+def test_concurrent_first_requests_load_once():
+    async def run():
+        calls = []
+
+        async def loader(owner):
+            calls.append(owner)
+            await asyncio.sleep(0.05)
+            return {"7": "2"}
+
+        store = store_mod.CartStore(store_mod.MemoryRedis(), loader=loader)
+        # без блокировки вторая загрузка вернула бы удалённую строку 7
+        await asyncio.gather(store.remove("c@x", 7), store.add("c@x", 1, 1))
+        assert calls == ["c@x"]
+        assert await store.get("c@x") == {1: 1}
+
+    asyncio.run(run())
+
+
+def test_stale_snapshot_of_a_slower_flusher_does_not_win():
+    async def run():
+        store = make_store()
+        db = {}
+        popped = asyncio.Event()
+
+        def persist_into_db(delay=None):
+            async def persist(carts):
+                if delay is not None:
+                    popped.set()
+                    await delay.wait()
+                # правило persist_carts: снимок пишется, только если он новее сохранённого
+                for owner, (version, items) in carts.items():
+                    if version > db.get(owner, (0, None))[0]:
+                        db[owner] = (version, items)
+            return persist
+
+        resume = asyncio.Event()
+        await store.add("d@x", 1, 1)
+        # флашер A забрал владельца, прочитал v1 и завис перед коммитом
+        slow = asyncio.create_task(store_mod.CartFlusher(store, persist=persist_into_db(resume)).flush())
+        await popped.wait()
+        await store.add("d@x", 2, 1)
+        # флашер B сбросил свежий снимок раньше
+        await store_mod.CartFlusher(store, persist=persist_into_db()).flush()
+        resume.set()
+        await slow
+        assert db["d@x"] == (2, {1: 1, 2: 1})
+
+    asyncio.run(run())
+
+
+def test_persisted_version_is_restored_on_load():
+    async def run():
+        async def loader(owner):
+            return {"7": "2", store_mod.VERSION_FIELD: "41"}
+
+        store = store_mod.CartStore(store_mod.MemoryRedis(), loader=loader)
+        await store.add("e@x", 1, 1)
+        assert await store.get("e@x") == {1: 1, 7: 2}
+        version, _ = store_mod.split_version(await store.redis.hgetall(store_mod.cart_key("e@x")))
+        assert version == 42
+
+    asyncio.run(run())
+
+
+def test_patch_checks_base_version_and_replaces_snapshot(monkeypatch):
+    from fastapi.testclient import TestClient
+    from shared.auth_utils import create_access_token
+
+    routers = service_module("cart-service", "routers")
+    monkeypatch.setattr(routers, "store", make_store())
+    app = service_module("cart-service", "main").app
+    client = TestClient(app)
+    auth = {"Authorization": "Bearer " + create_access_token({"sub": "f@x"})}
+
+    r = client.patch("/api/cart", headers=auth, json={"ops": [{"op": "add", "product_id": 1, "quantity": 2}]})
+    assert r.status_code == 200 and r.json() == {"items": [{"product_id": 1, "quantity": 2}], "count": 2, "version": 1}
+
+    # копия клиента основана на версии 0 — сервер не даёт её затереть
+    stale = client.patch("/api/cart", headers=auth, json={"snapshot": [{"product_id": 5, "quantity": 1}], "base_version": 0})
+    assert stale.status_code == 409 and stale.json()["detail"]["version"] == 1
+
+    r = client.patch("/api/cart", headers=auth, json={"snapshot": [{"product_id": 5, "quantity": 1}], "base_version": 1})
+    assert r.json()["items"] == [{"product_id": 5, "quantity": 1}] and r.json()["version"] == 2
+    assert client.get("/api/cart", headers=auth).json()["version"] == 2
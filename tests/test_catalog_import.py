@@ -0,0 +1,33 @@
+import io
+from decimal import Decimal
+
+from shared.catalog_import import iter_batches
+
+
+def test_csv_batches_validate_and_chunk():
+    data = (
+        "sku,name,price,stock,description\n"
+        "VAG-1,Воздушный фильтр,\"19,90\",5,\"многострочное\nописание\"\n"
+        "VAG-2,Свеча,12.5,,\n"
+        ",Без артикула,1,1,\n"
+        "VAG-3,Колодки,-1,1,\n"
+    )
+    batches = list(iter_batches(io.StringIO(data), "csv", chunk_size=2))
+
+    assert len(batches) == 2
+    rows = [r for b in batches for r in b.rows]
+    assert [r[1] for r in rows] == ["VAG-1", "VAG-2"]
+    assert rows[0][4] == Decimal("19.90")
+    assert rows[0][3] == "многострочное\nописание"
+    assert rows[1][7] == 0
+    assert sum(b.rejected for b in batches) == 2
+    assert [e["line"] for e in batches[1].errors] == [5, 6]
+
+
+def test_ndjson_bad_lines_are_rejected():
+    data = '{"sku": "A", "name": "a", "price": 1}\nnot json\n\n{"sku": "B", "name": "b", "price": 2.5, "stock": 3}\n'
+    (batch,) = list(iter_batches(io.StringIO(data), "ndjson"))
+
+    assert [r[0] for r in batch.rows] == [1, 4]
+    assert batch.rejected == 1
+    assert batch.errors[0]["line"] == 2
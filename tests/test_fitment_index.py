@@ -0,0 +1,61 @@
+from shared.fitment import FitmentIndex, parse_fitment
+
+
+def test_parse_fitment_from_product_name():
+    rows = parse_fitment("Воздушный фильтр VAG (1.4/1.8/2.0 TSI)")
+    assert [r["engine"] for r in rows] == ["1.4 TSI", "1.8 TSI", "2.0 TSI"]
+    assert parse_fitment("Термостат VAG (оригинал)") == []
+
+
+def test_bitmap_query_intersects_fields():
+    index = FitmentIndex(capacity=64)
+    index.replace(1, "Фильтры", parse_fitment("Воздушный фильтр VAG (1.4/1.8/2.0 TSI)"))
+    index.replace(2, "Тормоза", [{"engine": "2.0 TSI", "model": "Golf", "year_from": 2012, "year_to": 2019}])
+    index.replace(3, "Тормоза", [])  # без применимости: не подходит ни под какой двигатель
+    index.replace(4, "Тормоза", [{"engine": None, "model": "Passat"}])  # любой двигатель Passat
+    # больше capacity — индекс должен расшириться
+    for pid in range(100, 300):
+        index.replace(pid, "Масла", [{"engine": "1.6 TDI"}])
+
+    assert sorted(index.query(engine="2.0 tsi")) == [1, 2, 4]
+    assert sorted(index.query(engine="2.0 TSI", category="тормоза")) == [2, 4]
+    assert sorted(index.query(engine="2.0 TSI", model="Golf", year=2015)) == [1, 2]
+    assert sorted(index.query(engine="2.0 TSI", model="Golf", year=2021)) == [1]
+    assert len(index.query(engine="1.6 TDI")) == 201  # 200 масел + Passat (любой двигатель)
+
+
+def test_multi_row_fitments_are_verified_per_row():
+    index = FitmentIndex()
+    index.replace(1, None, [{"engine": "2.0 TSI", "model": "Golf"}, {"engine": "1.4 TSI", "model": "Polo"}])
+
+    assert list(index.query(engine="2.0 TSI", model="Golf")) == [1]
+    assert list(index.query(engine="2.0 TSI", model="Polo")) == []
+
+    index.remove(1)
+    assert list(index.query(engine="2.0 TSI")) == []
+
+
+def test_bulk_load_matches_incremental_replace():
+    items = [
+        (10, "Тормоза", [{"engine": "2.0 TSI", "year_from": 2015}]),
+        (11, "Фильтры", [{"engine": "1.4 TSI"}]),
+        (12, "Тормоза", []),
+    ]
+    bulk = FitmentIndex(capacity=1)
+    bulk.bulk_load(items)
+    incremental = FitmentIndex(capacity=1)
+    for product_id, category, rows in items:
+        incremental.replace(product_id, category, rows)
+
+    for filters in ({"engine": "2.0 TSI"}, {"category": "тормоза"}, {"year": 2016}, {"year": 2010}):
+        assert sorted(bulk.query(**filters)) == sorted(incremental.query(**filters))
+    assert bulk.values("category") == {"тормоза": 2, "фильтры": 1}
+
+
+def test_query_limit_and_count():
+    index = FitmentIndex()
+    index.bulk_load((pid, "Масла", [{"engine": "1.6 TDI"}]) for pid in range(500))
+
+    assert index.count(engine="1.6 TDI") == 500
+    assert list(index.query(limit=3, engine="1.6 TDI")) == [0, 1, 2]
+    assert list(index.query(limit=3, engine="1.6 TDI", model="Golf")) == [0, 1, 2]
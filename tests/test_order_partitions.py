@@ -0,0 +1,39 @@
+import asyncio
+from datetime import date
+
+from conftest import service_module
+
+partitions = service_module("orders-service", "partitions")
+
+
+def test_future_partitions_cross_year():
+    months = partitions.partitions_to_create(date(2026, 11, 15), ahead=2)
+    assert [partitions.partition_name(m) for m in months] == ["orders_p202611", "orders_p202612", "orders_p202701"]
+    assert "TO ('2027-01-01 00:00:00+00')" in partitions.create_partition_sql(date(2026, 12, 1))
+
+
+def test_only_cold_partitions_are_archived():
+    names = ["orders_p202410", "orders_p202411", "orders_p202309", "orders_legacy"]
+    assert partitions.partitions_to_archive(names, date(2026, 11, 3), hot_months=24) == ["orders_p202309", "orders_p202410"]
+
+
+class RecordingConn:
+    def __init__(self, rows):
+        self.rows, self.executed = rows, []
+
+    async def fetch(self, sql):
+        return self.rows
+
+    async def execute(self, sql):
+        self.executed.append(sql)
+
+
+def test_interrupted_detach_is_finalized_first():
+    conn = RecordingConn([
+        {"relname": "orders_p202309", "inhdetachpending": False},
+        {"relname": "orders_p202310", "inhdetachpending": True},
+    ])
+    done = asyncio.run(partitions.archive_partitions(conn, date(2026, 11, 3)))
+    assert done == ["orders_p202310", "orders_p202309"]
+    assert conn.executed[0] == "ALTER TABLE orders DETACH PARTITION orders_p202310 FINALIZE"
+    assert "ALTER TABLE orders DETACH PARTITION orders_p202309 CONCURRENTLY" in conn.executed
@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+import pytest
+
+from conftest import service_module
+
+quotes = service_module("orders-service", "quotes")
+
+
+class Item:
+    def __init__(self, product_id, quantity):
+        self.product_id, self.quantity = product_id, quantity
+
+
+def test_items_are_merged_and_priced():
+    key = quotes.item_key([Item(2, 1), Item(1, 2), Item(2, 2)])
+    assert key == [[1, 2], [2, 3]]
+    lines, total, available = quotes.price_lines(
+        key, {1: Decimal("10.50"), 2: Decimal("1.10")}, {1: 5, 2: 2}
+    )
+    assert total == Decimal("24.30")
+    assert not available
+    assert [line["available"] for line in lines] == [True, False]
+
+
+def test_quote_round_trip_expiry_and_tampering():
+    token, exp = quotes.sign_quote(7, [[1, 2]], Decimal("21.00"), "USD", now=1000)
+    claims = quotes.verify_quote(token, now=1000)
+    assert claims == {"user_id": 7, "items": [[1, 2]], "total": "21.00", "currency": "USD", "exp": exp}
+
+    with pytest.raises(quotes.QuoteError):
+        quotes.verify_quote(token, now=exp)
+    body, signature = token.split(".")
+    forged = quotes._b64encode(quotes._b64decode(body).replace(b"21.00", b"01.00"))
+    with pytest.raises(quotes.QuoteError):
+        quotes.verify_quote(f"{forged}.{signature}", now=1000)
+
+
+def test_garbage_quote_is_a_quote_error():
+    token, _ = quotes.sign_quote(7, [[1, 2]], Decimal("21.00"), "USD", now=1000)
+    body = token.split(".")[0]
+    for garbage in (f"{body}.подпись", "котировка.x", "no-dot", ""):
+        with pytest.raises(quotes.QuoteError):
+            quotes.verify_quote(garbage, now=1000)
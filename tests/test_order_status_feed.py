@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import service_module
+
+status_feed = service_module("orders-service", "status_feed")
+
+
+def test_notify_is_fanned_out_to_that_users_subscribers_only():
+    async def run():
+        feed = status_feed.StatusFeed()
+        a1, a2, b = feed.subscribe(1), feed.subscribe(1), feed.subscribe(2)
+        feed._on_notify(None, 0, status_feed.CHANNEL, json.dumps({"order_id": 7, "user_id": 1, "status": "paid"}))
+        assert a1.get_nowait() == a2.get_nowait() == ("status", {"order_id": 7, "user_id": 1, "status": "paid"})
+        assert b.empty()
+        feed.unsubscribe(1, a1)
+        feed.unsubscribe(1, a2)
+        assert feed.subscriber_count == 1
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_keeps_newest_events():
+    async def run():
+        feed = status_feed.StatusFeed()
+        q = feed.subscribe(1)
+        for n in range(status_feed.QUEUE_SIZE + 5):
+            feed.publish(1, "status", {"n": n})
+        assert q.qsize() == status_feed.QUEUE_SIZE
+        assert q.get_nowait()[1] == {"n": 5}
+
+    asyncio.run(run())
+
+
+def test_event_stream_requires_a_token():
+    from fastapi import HTTPException
+    from starlette.requests import Request
+
+    routers = service_module("orders-service", "routers")
+    request = Request({"type": "http", "headers": []})
+    for token in (None, "not-a-jwt"):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(routers.stream_owner(1, request, token))
+        assert exc.value.status_code == 401
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.shop import _decode_history
+
+
+def ts(day: int) -> datetime:
+    return datetime(2026, 1, day, tzinfo=timezone.utc)
+
+
+# points: day 1 -> 10.00, day 5 -> 12.00, day 9 -> 11.50
+HISTORY = SimpleNamespace(
+    first_at=int(ts(1).timestamp()), first_price=1000,
+    at_deltas=[4 * 86400, 4 * 86400], price_deltas=[200, -50],
+)
+
+
+def test_full_history():
+    points = _decode_history(HISTORY, None, None)
+    assert [(p["at"].day, p["price"]) for p in points] == [(1, "10.00"), (5, "12.00"), (9, "11.50")]
+
+
+def test_range_starts_with_price_in_effect_at_since():
+    points = _decode_history(HISTORY, ts(3), ts(6))
+    assert [(p["at"], p["price"]) for p in points] == [(ts(3), "10.00"), (ts(5), "12.00")]
+
+    # no change inside the range: still one point with the current price
+    points = _decode_history(HISTORY, ts(10), None)
+    assert [(p["at"], p["price"]) for p in points] == [(ts(10), "11.50")]
+
+    # since on an existing point: no synthetic duplicate
+    points = _decode_history(HISTORY, ts(5), None)
+    assert [p["at"].day for p in points] == [5, 9]
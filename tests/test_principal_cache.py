@@ -0,0 +1,67 @@
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from shared.principal_cache import PrincipalCache, watch_user_changes
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_never_outlive_token_exp_or_ttl():
+    clock = Clock()
+    cache = PrincipalCache(maxsize=10, ttl=60, clock=clock)
+    cache.put("short", "a@x", "A", exp=1010)
+    cache.put("long", "b@x", "B", exp=5000)
+    cache.put("expired", "c@x", "C", exp=999)
+    assert cache.get("short") == "A" and cache.get("long") == "B"
+    assert cache.get("expired") is None
+
+    clock.now = 1010
+    assert cache.get("short") is None
+    assert cache.get("long") == "B"
+    clock.now = 1060
+    assert cache.get("long") is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction_and_subject_invalidation():
+    cache = PrincipalCache(maxsize=2, ttl=60, clock=Clock())
+    cache.put("t1", "a@x", "A1")
+    cache.put("t2", "b@x", "B")
+    cache.get("t1")
+    cache.put("t3", "a@x", "A3")
+    assert cache.get("t2") is None  # least recently used
+    cache.invalidate_subject("a@x")
+    assert len(cache) == 0
+
+
+def test_orm_update_invalidates_old_and_new_email():
+    Base = declarative_base()
+
+    class User(Base):
+        __tablename__ = "users"
+        id = Column(Integer, primary_key=True)
+        email = Column(String, nullable=False)
+
+    cache = PrincipalCache(maxsize=10, ttl=60, clock=Clock())
+    watch_user_changes(cache, User)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email="old@x")
+        session.add(user)
+        session.commit()
+        cache.put("token", "old@x", user)
+        user.email = "new@x"
+        session.commit()
+        assert cache.get("token") is None
+
+        cache.put("token2", "new@x", user)
+        session.delete(user)
+        session.commit()
+        assert cache.get("token2") is None
@@ -0,0 +1,246 @@
+import asyncio
+
+import pytest
+
+from conftest import service_module
+
+index_mod = service_module("search-service", "index")
+text_mod = service_module("search-service", "text")
+suggest_mod = service_module("search-service", "suggest")
+trigram_mod = service_module("search-service", "trigram")
+snapshot_mod = service_module("search-service", "snapshot")
+
+CATALOG = [
+    {"id": 1, "name": "Воздушный фильтр VAG (1.4/1.8/2.0 TSI)", "category": "Фильтры", "price": 19.9,
+     "description": "Оригинальный воздушный фильтр для двигателей VAG TSI."},
+    {"id": 2, "name": "Тормозные колодки передние VAG", "category": "Тормоза", "price": 54.99,
+     "description": "Комплект передних тормозных колодок для моделей Volkswagen/Skoda/Seat."},
+    {"id": 3, "name": "Масляный фильтр VAG (оригинал)", "category": "Фильтры", "price": 9.99,
+     "description": "Эффективная фильтрация масла."},
+    {"id": 4, "name": "Brake pads front Golf", "category": "Brakes", "price": 40,
+     "description": "Front brake pads"},
+]
+
+
+def build():
+    index = index_mod.SearchIndex()
+    index.add_many(CATALOG)
+    return index
+
+
+def test_tokenize_stems_russian_and_english_and_keeps_numbers():
+    terms = text_mod.tokenize("Тормозные колодки, brake pads 2.0 TSI")
+    assert text_mod.stem("колодка") in terms
+    assert text_mod.stem("pad") in terms
+    assert "2.0" in terms and "tsi" in terms
+
+
+def test_bm25_ranks_name_matches_and_paginates():
+    index = build()
+
+    result = index.search("фильтр")
+    assert result.total == 2
+    assert {i["id"] for i in result.items} == {1, 3}
+
+    result = index.search("тормозная колодка")
+    assert result.items[0]["id"] == 2
+
+    page = index.search("vag", offset=1, limit=1)
+    assert page.total == 3 and len(page.items) == 1
+
+
+def test_match_all_and_updates():
+    index = build()
+    assert index.search("фильтр масла", match_all=True).total == 1
+
+    index.add({"id": 3, "name": "Свеча зажигания", "category": "Зажигание", "price": 12.5})
+    assert {i["id"] for i in index.search("фильтр").items} == {1}
+    assert index.search("свеча").items[0]["id"] == 3
+
+    index.remove(1)
+    assert index.search("фильтр").total == 0
+    assert len(index) == 3
+
+
+def test_suggest_ranks_completions_by_popularity():
+    from collections import Counter
+
+    index = build()
+    suggester = suggest_mod.Suggester.build(
+        index.live_docs(), Counter({"масляный фильтр": 3}), purchases={1: 10},
+    )
+    items = suggester.suggest("фил")  # совпадение с началом любого слова фразы
+    texts = [i["text"] for i in items]
+    assert texts[0] == "Воздушный фильтр VAG (1.4/1.8/2.0 TSI)"  # 10 покупок
+    assert "масляный фильтр" in texts and "Фильтры" in texts
+    assert items[0]["product_id"] == 1
+
+    assert [i["text"] for i in suggester.suggest("Тормозные  КОЛ")] == ["Тормозные колодки передние VAG"]
+    assert suggester.suggest("масляный ")[0]["text"] == "масляный фильтр"
+    assert suggester.suggest("xyz") == []
+    assert len(suggester.suggest("b", limit=1)) == 1
+
+
+def test_edit_distance_is_bounded_and_counts_transpositions():
+    assert trigram_mod.edit_distance("колотки", "колодки", 2) == 1
+    assert trigram_mod.edit_distance("06h-115-516", "06h-115-561", 2) == 1  # перестановка
+    assert trigram_mod.edit_distance("фильтр", "колодки", 2) == 3  # bound + 1
+
+
+def test_trigram_lookup_fixes_typos_in_words_and_part_numbers():
+    index = build()
+    index.add({"id": 5, "name": "Помпа", "sku": "06H-121-026", "category": "Охлаждение", "price": 80})
+    vocab = index.vocabulary
+    assert vocab.lookup("колотки")[0] == ("колодки", 1)
+    assert vocab.lookup("06h-121-062")[0] == ("06h-121-026", 1)
+    assert vocab.lookup("vag") == []  # короткие слова не исправляем
+
+    fuzzy_mod = service_module("search-service", "fuzzy")
+    assert fuzzy_mod.correct_query(index, "тормозные колотки") == "тормозные колодки"
+    assert fuzzy_mod.correct_query(index, "тормозные колодки") is None
+    assert index.search("06H-121-026").items[0]["id"] == 5
+
+
+def test_vocabulary_forgets_words_of_edited_and_deleted_products():
+    index = build()
+    index.add({"id": 5, "name": "Помпа Bosch", "category": "Охлаждение", "price": 80})
+    assert index.vocabulary.lookup("помпаа") == [("помпа", 1)]
+
+    index.add({"id": 5, "name": "Насос Bosch", "category": "Охлаждение", "price": 80})
+    assert "помпа" not in index.vocabulary
+    assert index.vocabulary.lookup("помпаа") == []
+    assert "охлаждение" in index.vocabulary  # осталось в новой версии товара
+
+    index.remove(5)
+    assert "охлаждение" not in index.vocabulary
+    fuzzy_mod = service_module("search-service", "fuzzy")
+    assert fuzzy_mod.correct_query(index, "насосс") is None
+
+    # слово снова в каталоге — снова предлагается
+    index.add({"id": 6, "name": "Помпа VAG", "category": None, "price": 70})
+    assert index.vocabulary.lookup("помпаа") == [("помпа", 1)]
+
+
+def test_facet_counts_ignore_own_filter_and_follow_updates():
+    index = build()
+    index.add({"id": 5, "name": "Колодки тормозные Brembo Golf", "category": "Тормоза", "price": 120,
+               "fitment": [("2.0 TSI", "Golf"), ("1.4 TSI", "Golf")]})
+    result = index.search("колодки brake", facets=True)
+    assert result.facets["category"] == {"Тормоза": 2, "Brakes": 1}
+    assert result.facets["brand"] == {"VAG": 1, "Brembo": 1}
+    assert result.facets["price"] == {"20-50": 1, "50-100": 1, "100-250": 1}
+    assert result.facets["engine"] == {"1.4 TSI": 1, "2.0 TSI": 1}
+
+    filtered = index.search("колодки brake", filters={"category": ["Тормоза"]}, facets=True)
+    assert filtered.total == 2
+    assert filtered.facets["category"]["Brakes"] == 1  # собственный фильтр не сужает фасет
+    assert filtered.facets["brand"] == {"VAG": 1, "Brembo": 1}
+
+    index.add({"id": 5, "name": "Колодки тормозные Brembo Golf", "category": "Тормоза", "price": 30})
+    result = index.search("колодки", filters={"price": ["20-50"]}, facets=True)
+    assert [i["id"] for i in result.items] == [5]  # 2 стоит 54.99
+    assert result.facets["engine"] == {}
+
+
+def test_snapshot_round_trip_serves_from_mmap_and_accepts_updates(tmp_path):
+    index = build()
+    index.add({"id": 5, "name": "Помпа Bosch", "sku": "06H-121-026", "category": None, "price": None,
+               "fitment": [("2.0 TSI", "Golf")]})
+    index.remove(3)
+    path = tmp_path / "index.snap"
+    snapshot_mod.save_snapshot(index, str(path), {"watermark": "2026-01-01T00:00:00+00:00"})
+
+    loaded, meta = snapshot_mod.load_snapshot(str(path))
+    assert meta["watermark"] == "2026-01-01T00:00:00+00:00"
+    assert len(loaded) == len(index) == 4 and 3 not in loaded
+    for q in ("фильтр", "колодки brake", "06h-121-026"):
+        a, b = index.search(q, facets=True), loaded.search(q, facets=True)
+        assert (a.total, a.items, a.facets) == (b.total, b.items, b.facets)
+    assert loaded.search("помпа").items[0]["price"] is None
+    assert loaded.vocabulary.lookup("колотки")[0] == ("колодки", 1)
+
+    # запись поверх снапшота: терм копируется из mmap, файл не меняется
+    loaded.add({"id": 2, "name": "Колодки тормозные задние", "category": "Тормоза", "price": 10})
+    assert loaded.search("задние").items[0]["id"] == 2
+    assert snapshot_mod.load_snapshot(str(path))[0].search("задние").total == 0
+
+    path.write_bytes(b"garbage" * 10)
+    with pytest.raises(snapshot_mod.SnapshotError):
+        snapshot_mod.load_snapshot(str(path))
+
+
+def test_postgres_backend_translates_facet_filters_to_sql():
+    pg_mod = service_module("search-service", "pg_search")
+    where, params = pg_mod._filters_sql(
+        {"category": ["Тормоза"], "price": ["20-50", "500+"], "brand": ["bosch"], "engine": None},
+        skip="category",
+    )
+    assert where == [
+        "(p.price >= :f_price_lo0 AND p.price < :f_price_hi0) OR p.price >= :f_price_lo1".join("()"),
+        "p.name ~* :f_brand",
+    ]
+    assert (params["f_price_lo0"], params["f_price_hi0"], params["f_price_lo1"]) == (20, 50, 500)
+    assert params["f_brand"] == r"\m(Bosch)\M"
+
+
+def test_postgres_backend_filters_and_facets_match_memory_index(monkeypatch):
+    """Тот же каталог в Postgres: фильтры и счётчики фасетов совпадают с индексом в памяти."""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from shared.database import DATABASE_URL
+
+    pg_mod = service_module("search-service", "pg_search")
+    cases = [
+        ("vag", {"category": ["Фильтры"]}),
+        ("vag", {"price": ["0-20", "50-100"]}),
+        ("фильтр", {"brand": ["VAG"], "price": ["0-20"]}),
+        ("колодки", {"category": ["Тормоза", "Brakes"]}),
+    ]
+
+    async def run():
+        engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+        try:
+            try:
+                conn = await asyncio.wait_for(engine.connect(), timeout=3)
+            except Exception:
+                return None
+            async with conn:
+                # временная таблица из pg_temp заслоняет products в search_path
+                await conn.execute(text(
+                    """
+                    CREATE TEMP TABLE products (
+                        id integer PRIMARY KEY, name text, sku text, category text,
+                        description text, price numeric(10, 2),
+                        search_tsv tsvector GENERATED ALWAYS AS (
+                            setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+                            setweight(to_tsvector('russian', coalesce(sku, '')), 'A') ||
+                            setweight(to_tsvector('russian', coalesce(category, '')), 'B') ||
+                            setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+                        ) STORED
+                    )
+                    """
+                ))
+                await conn.execute(
+                    text("INSERT INTO products (id, name, category, description, price) "
+                         "VALUES (:id, :name, :category, :description, :price)"),
+                    CATALOG,
+                )
+                monkeypatch.setattr(pg_mod, "async_session_maker", lambda: AsyncSession(bind=conn))
+                backend = pg_mod.PostgresSearch()
+                return [await backend.search(q, filters=f, facets=True) for q, f in cases]
+        finally:
+            await engine.dispose()
+
+    results = asyncio.run(run())
+    if results is None:
+        pytest.skip("Postgres is not reachable at DATABASE_URL")
+
+    index = build()
+    for (q, filters), got in zip(cases, results):
+        want = index.search(q, filters=filters, facets=True)
+        assert got.total == want.total, (q, filters)
+        assert {i["id"] for i in got.items} == {i["id"] for i in want.items}, (q, filters)
+        for field in ("category", "price"):
+            assert got.facets[field] == want.facets[field], (q, filters, field)